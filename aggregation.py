@@ -0,0 +1,173 @@
+"""
+Parallel Partial Aggregation
+============================
+
+Group-by counts and sums over the memory-mapped column store written at
+ingest (see PARTITIONED STORAGE in app.py).
+
+Every column is a contiguous .npy file in row_id order. Worker processes map
+the files read-only, so all of them share one copy of the data through the OS
+page cache, and a task only needs a row range plus the file paths:
+
+1. The requested row ranges are split into chunks of chunk_rows rows
+2. Each chunk computes a partial aggregate: unique group codes with their
+   row count and the sum of every value column
+3. Partials are merged by summing counts and sums per group code
+
+Small inputs are aggregated in-process, since pool round-trips would cost
+more than the work itself.
+
+The worker functions live in this module rather than in app.py so worker
+processes can run them without the Streamlit runtime.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+import multiprocessing
+
+import numpy as np
+
+# Per-process cache of mapped column files, for one dataset version at a time
+_MAPPED: Dict[str, np.ndarray] = {}
+_mapped_version: Optional[str] = None
+
+# A partial aggregate: (group codes, row counts, {value column: sums})
+Partial = Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]
+
+
+def _column(path: str, version: Optional[str]) -> np.ndarray:
+    """Memory-map a column file once per process and dataset version."""
+    global _mapped_version
+    if version != _mapped_version:
+        # Unmap the previous version so its deleted files can be reclaimed
+        _MAPPED.clear()
+        _mapped_version = version
+    column = _MAPPED.get(path)
+    if column is None:
+        column = np.load(path, mmap_mode='r')
+        _MAPPED[path] = column
+    return column
+
+
+def partial_aggregate(task: Dict[str, Any]) -> Partial:
+    """
+    Aggregate one row range of the column store.
+
+    Args:
+        task: {'lo', 'hi'}: row range; 'key_paths' / 'cardinalities': code
+            columns to group by and their number of codes; 'value_paths':
+            {name: path} of columns to sum; 'version': dataset version the
+            files belong to
+
+    Returns:
+        (group codes, row counts, {value column: sums}), codes being the
+        np.ravel_multi_index of the key codes
+    """
+    lo, hi, version = task['lo'], task['hi'], task['version']
+    keys = [np.asarray(_column(path, version)[lo:hi], dtype=np.int64) for path in task['key_paths']]
+
+    mask = np.ones(hi - lo, dtype=bool)
+    for key in keys:
+        # Negative codes mark missing values
+        mask &= key >= 0
+
+    if keys:
+        combined = np.ravel_multi_index([key[mask] for key in keys], task['cardinalities'])
+    else:
+        combined = np.zeros(int(mask.sum()), dtype=np.int64)
+    codes, inverse = np.unique(combined, return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(codes))
+    sums = {
+        name: np.bincount(inverse, weights=np.asarray(_column(path, version)[lo:hi])[mask], minlength=len(codes))
+        for name, path in task['value_paths'].items()
+    }
+    return codes, counts, sums
+
+
+def merge_partials(partials: List[Partial], value_names: List[str]) -> Partial:
+    """Combine partial aggregates by summing counts and sums per group code."""
+    partials = [partial for partial in partials if len(partial[0]) > 0]
+    if not partials:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64), {name: np.array([]) for name in value_names}
+
+    all_codes = np.concatenate([partial[0] for partial in partials])
+    codes, inverse = np.unique(all_codes, return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate([partial[1] for partial in partials]),
+                         minlength=len(codes)).astype(np.int64)
+    sums = {
+        name: np.bincount(inverse, weights=np.concatenate([partial[2][name] for partial in partials]),
+                          minlength=len(codes))
+        for name in value_names
+    }
+    return codes, counts, sums
+
+
+class AggregationExecutor:
+    """
+    Fans partial aggregates of row-range chunks out to a process pool.
+
+    The pool is created on first use and reused; workers keep their column
+    files mapped between tasks.
+    """
+
+    def __init__(self, workers: Optional[int] = None, chunk_rows: int = 250_000,
+                 parallel_min_rows: int = 500_000):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_rows = chunk_rows
+        self.parallel_min_rows = parallel_min_rows
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Never fork: the parent is a threaded Streamlit server, and a forked
+            # child inherits whatever locks its other threads held. Forkserver
+            # workers start from a clean server process with this module and numpy
+            # preloaded; spawn is the fallback where forkserver is unavailable
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload(['numpy', __name__])
+            else:
+                context = multiprocessing.get_context('spawn')
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self._pool
+
+    def aggregate(self, row_ranges: List[Tuple[int, int]], key_paths: List[str], cardinalities: List[int],
+                  value_paths: Dict[str, str], version: Optional[str] = None) -> Partial:
+        """
+        Group rows of the given ranges by the key columns and sum the value columns.
+
+        Args:
+            row_ranges: (lo, hi) row ranges to aggregate
+            key_paths: Code column files to group by (negative codes are skipped)
+            cardinalities: Number of codes of each key column
+            value_paths: {name: path} of float columns to sum
+            version: Dataset version of the files (workers remap on change)
+
+        Returns:
+            Merged (group codes, row counts, {value column: sums})
+        """
+        tasks = []
+        for lo, hi in row_ranges:
+            for chunk_lo in range(lo, hi, self.chunk_rows):
+                tasks.append({
+                    'lo': chunk_lo,
+                    'hi': min(hi, chunk_lo + self.chunk_rows),
+                    'key_paths': key_paths,
+                    'cardinalities': cardinalities,
+                    'value_paths': value_paths,
+                    'version': version,
+                })
+
+        total_rows = sum(hi - lo for lo, hi in row_ranges)
+        if self.workers > 1 and len(tasks) > 1 and total_rows >= self.parallel_min_rows:
+            partials = list(self._get_pool().map(partial_aggregate, tasks))
+        else:
+            partials = [partial_aggregate(task) for task in tasks]
+        return merge_partials(partials, list(value_paths))
+
+    def shutdown(self) -> None:
+        """Stop the worker pool (a new one starts on the next parallel aggregate)."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
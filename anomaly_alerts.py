@@ -0,0 +1,121 @@
+"""
+Brand Signal Anomaly Alerts
+===========================
+
+Batch job that ingests new source rows and reports anomalies in the daily
+brand signals (sentiment index, mention volume, engagement, share of voice),
+for cron jobs and pipelines that cannot watch the dashboard.
+
+USAGE:
+------
+    python anomaly_alerts.py                      # alerts on the last scored day
+    python anomaly_alerts.py --days 7 --json      # last week, one JSON object per line
+    python anomaly_alerts.py --brand Nike --fail-on-alert
+
+Scoring is the dashboard's (see ANOMALY DETECTION in app.py): detector state
+is persisted next to the partitions, so each run only feeds the days that
+arrived since the previous run, whether it came from this job, the dashboard
+or the metrics API.
+
+Sources that could not be loaded (missing files, parse errors) are listed on
+stderr and the exit status is 2, so a broken feed is not mistaken for a quiet
+day. Otherwise, with --fail-on-alert the exit status is 1 when anything was
+flagged in the reported range, so schedulers can notify on failure.
+"""
+
+import argparse
+import json
+import sys
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import streamlit.config
+import streamlit.logger
+
+# app calls st.* outside a Streamlit session; its bare-mode warnings are noise
+# here. Parse the config now, as `streamlit run` would with flags, so the
+# first st.* call does not re-parse it and reset the log level
+streamlit.logger.set_log_level('error')
+streamlit.config.get_config_options(force_reparse=True, options_from_flags={
+    'logger.level': 'error',
+    'global.showWarningOnDirectExecution': False,
+})
+
+import app
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Days reported when --days is not given (the last scored day only)
+DEFAULT_REPORT_DAYS = 1
+
+# Exit statuses: something flagged (with --fail-on-alert), a source failed to load
+EXIT_ALERTS = 1
+EXIT_SOURCE_ERRORS = 2
+
+
+# ============================================================================
+# REPORTING
+# ============================================================================
+
+def select_alerts(anomalies: Dict[str, Any], days: int, brand: Optional[str] = None) -> pd.DataFrame:
+    """Alerts of the last `days` scored days, optionally for one brand, newest first."""
+    alerts = anomalies['alerts']
+    if anomalies['last_day'] is None or alerts.empty:
+        return alerts
+    alerts = alerts[alerts['day'] > anomalies['last_day'] - timedelta(days=days)]
+    if brand is not None:
+        alerts = alerts[alerts['brand'] == brand]
+    return alerts.sort_values(['day', 'brand', 'metric'], ascending=[False, True, True], kind='stable')
+
+
+def source_errors(manifest: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """ingest_report entries of the sources the last ingest could not load."""
+    return [entry for entry in manifest.get('ingest_report', []) if entry.get('error')]
+
+
+def format_alert(alert: pd.Series) -> str:
+    """One human-readable line per alert."""
+    return (
+        f"{alert['day']:%Y-%m-%d}  {alert['brand']}  {app.ANOMALY_METRICS[alert['metric']]} "
+        f"{alert['direction']}: {alert['value']:,.1f} (expected {alert['expected']:,.1f}, "
+        f"EWMA z {alert['ewma_z']:+.1f}, robust z {alert['robust_z']:+.1f})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report anomalies in daily brand signals")
+    parser.add_argument('--days', type=int, default=DEFAULT_REPORT_DAYS,
+                        help="report alerts of the last N scored days")
+    parser.add_argument('--brand', help="only report this brand")
+    parser.add_argument('--json', action='store_true', help="print one JSON object per alert")
+    parser.add_argument('--fail-on-alert', action='store_true', help="exit with status 1 if anything was flagged")
+    args = parser.parse_args()
+
+    manifest = app.build_partitions(app.DATA_SOURCES)
+    app.refresh_artifact_cache(manifest)
+    anomalies = app.detect_anomalies(manifest)
+    alerts = select_alerts(anomalies, args.days, args.brand)
+
+    for _, alert in alerts.iterrows():
+        if args.json:
+            print(json.dumps({**alert.to_dict(), 'day': f"{alert['day']:%Y-%m-%d}"}))
+        else:
+            print(format_alert(alert))
+
+    last_day = f"{anomalies['last_day']:%Y-%m-%d}" if anomalies['last_day'] is not None else "n/a"
+    print(f"{len(alerts)} alerts across {anomalies['series']:,} series (scored through {last_day})", file=sys.stderr)
+
+    errors = source_errors(manifest)
+    for entry in errors:
+        print(f"source not loaded: {entry['path']}: {entry['error']}", file=sys.stderr)
+    if errors:
+        sys.exit(EXIT_SOURCE_ERRORS)
+    if args.fail_on_alert and len(alerts) > 0:
+        sys.exit(EXIT_ALERTS)
+
+
+if __name__ == "__main__":
+    main()
@@ -27,7 +27,7 @@ Core columns expected in both CSV and JSON sources:
 - Engagement, Views, Estimated Views (numeric): Engagement metrics
 - Hashtags (str): Social hashtags
 - Custom Categories (str): Custom tags
-- brand (str): Brand name (added if missing)
+- brand (str): Brand name (from the source config, a Brand column or Input Name)
 
 SENTIMENT INDEX CALCULATION:
 ----------------------------
@@ -57,31 +57,306 @@ HOW TO ADD/REMOVE DATA SOURCES:
 Edit the DATA_SOURCES list below:
 - For CSV: {"path": "yourfile.csv", "type": "csv", "brand": "BrandName"}
 - For JSON: {"path": "yourfile.json", "type": "json", "brand": "BrandName"}
+- For JSON Lines (NDJSON): {"path": "yourfile.jsonl", "type": "jsonl", "brand": "BrandName"}
+- CSV and JSON Lines files may be gzip or zstd compressed (.gz / .zst, or
+  "compression": "gzip" / "zstd" in the config; zstd needs the zstandard package)
 - JSON can have:
   1. A "brand" field per record (use "brand": None in config)
   2. Multiple brands in one file (inferred from data)
   3. Single-brand file (specify "brand": "BrandName")
 - Brand name fallback: config → filename → "Unknown"
 
+SCHEMA NORMALIZATION:
+---------------------
+Every source (and every chunk of a streamed one) is emitted in one canonical
+layout: the CANONICAL_SCHEMA columns in schema order with fixed dtypes
+(float64 metrics, DATE_DTYPE dates, Arrow strings, nullable boolean flags),
+followed by any source-specific columns such as Meltwater's Title. Each
+distinct source header is resolved once into a cached normalization plan
+(normalization_plan: column mapping, target kinds, whether brand comes from
+Input Name); columns a source lacks are added with their defaults (Source
+and Country "Unknown", Reach/Engagement/Views/Estimated Views/AVE 0, else
+missing). Frames from CSV, JSON and Meltwater then concatenate as a plain
+append, without all-NaN object columns or dtype upcasts, and prepare_data
+only adds computed fields.
+
+STREAMING SOURCES:
+------------------
+CSV and JSON Lines sources (compressed or not) are read SOURCE_CHUNK_ROWS
+rows at a time (env: BRAND_SOURCE_CHUNK_ROWS); each chunk is normalized and
+deduplicated on its own and kept in its compact (Arrow string) form, so the
+raw text of a file is never held whole. A partition build buffers chunks
+only up to BUILD_SEGMENT_ROWS rows (env: BRAND_BUILD_SEGMENT_ROWS) and then
+writes them out as one row_id segment, so its peak memory does not grow
+with the size of the sources. A compressed file is decompressed by a
+background thread into a queue of DECOMPRESS_QUEUE_BLOCKS blocks that the
+parser reads from, so decompression overlaps with parsing at a bounded
+buffer size. Uncompressed CSV and JSON Lines sources can also take appends
+incrementally (see INCREMENTAL INGEST).
+
+PARTITIONED STORAGE:
+--------------------
+Ingested data is persisted under PARTITION_DIR as one Parquet file per
+brand and calendar month, plus a manifest.json describing every partition
+(row count, date bounds, Engagement/Reach sums):
+- Partitions are rebuilt only when a source file changes (size/mtime)
+- A brand + date range load reads only the overlapping partitions
+- Cross-brand totals (share of voice, health score normalizers) come from
+  the manifest, so no other brand's rows are read
+- COLUMN_STORE_COLUMNS (Reach, Engagement, Views, AVE, Social Echo, ...) are
+  stored once as contiguous float64 .npy arrays in row_id order and opened
+  with np.load(mmap_mode='r'): Streamlit worker processes share the OS page
+  cache instead of each decoding a private copy, and a brand/date window that
+  is one contiguous row range is attached to the frame as a zero-copy view
+- LAZY_TEXT_COLUMNS (Headline, Opening Text, Hit Sentence, URL, ...) are
+  written to a separate "<month>.text.parquet" per partition. Brand/date
+  loads return only the analytics columns; fetch_rows reads the text files
+  by row_id for the Mention Search and Mentions Explorer tables
+- Each brand also gets an inverted index over Headline / Opening Text /
+  Hit Sentence, used by the Mention Search section, and precomputed sort
+  orders (Date, Reach, Engagement) used by the Mentions Explorer
+- A build writes its rows as row_id segments of at most BUILD_SEGMENT_ROWS
+  rows (the first at the top of the version directory, later ones under
+  segment=<n>/), each with its own brand/month files and column store
+  arrays; appends add one more segment each
+- Builds hold an exclusive lock on BUILD_LOCK_FILE, so concurrent server
+  processes build each dataset version once; the manifest is swapped in
+  atomically and the version it replaces is deleted only at the next build,
+  after readers have moved on
+
+DEDUPLICATION:
+--------------
+The same article often appears in several exports (JSON and CSV, or several
+Input Name searches). Ingest keeps only the first copy per brand, keyed
+by a 64-bit hash of the normalized URL (scheme, www., fragment and tracking
+parameters removed) or, without a URL, of headline + publication day. The
+seen-set is a sorted uint64 array (8 bytes per mention) shared across
+sources; each chunk's keys are looked up by binary search and only its new
+keys are merged in. Duplicate counts per source are shown in the sidebar.
+
+APPROXIMATE TOP-K (SKETCHES):
+-----------------------------
+With "Approximate top-K" enabled in the sidebar, top keywords, hashtags,
+sources and influencers come from fixed-size sketches built at ingest per
+brand per day and merged over the selected range, instead of value_counts
+over every token:
+- Space-Saving (SKETCH_CAPACITY counters): each reported count overestimates
+  the true count by at most N / SKETCH_CAPACITY, where N is the number of
+  tokens in the range; any term with count > N / SKETCH_CAPACITY is reported
+- HyperLogLog (2^HLL_PRECISION registers): distinct sources/influencers with
+  a standard error of 1.04 / sqrt(2^HLL_PRECISION) (about 3.3%)
+Both merge losslessly across days, so memory does not depend on vocabulary.
+
+ARROW STRINGS:
+--------------
+With ARROW_STRINGS (env: BRAND_ARROW_STRINGS, default on) every text column
+is converted to string[pyarrow] as soon as a source is read (CSV text
+columns are parsed straight into it), and Parquet partitions are read back
+into the same dtype. Text then lives in contiguous Arrow buffers instead of
+one Python object per cell, and string work (Sentiment lowercasing, Input
+Name brand split) runs as Arrow compute kernels.
+
+TIME SERIES RESOLUTION:
+-----------------------
+The Sentiment Index and Trend Velocity charts bucket by day, week or month,
+picking the finest resolution whose bucket count fits CHART_MAX_POINTS. If
+that is still too many points (e.g. monthly over decades), the series is
+downsampled with Largest-Triangle-Three-Buckets, which keeps peaks and dips.
+Trend Velocity is the change between consecutive buckets at that resolution.
+
+CHART PAYLOAD BUDGET:
+---------------------
+Every chart goes through render_chart, which:
+- drops the Plotly template (Streamlit's theme replaces it in the browser)
+- downcasts numeric arrays (float32/small ints as typed arrays on plotly>=6,
+  4 significant digits as JSON on older plotly)
+- measures the JSON bytes, and if a chart would exceed what is left of
+  CHART_PAGE_BUDGET_KB (env: BRAND_CHART_BUDGET_KB), downsamples its line
+  traces with LTTB to fit
+Pies are capped at PIE_MAX_SLICES with an "Other" slice. Bytes per chart
+are listed in the sidebar "Chart payload" expander.
+
+AGGREGATION EXECUTOR:
+---------------------
+Channel, country and daily aggregates are computed from the column store
+rather than with DataFrame group-bys. At ingest, Source and Country are
+also stored as int32 code arrays (and Date as a day number) in row_id order.
+A brand/date window is a set of contiguous row ranges, which
+aggregate_window splits into chunks. Worker processes (AGG_WORKERS, env:
+BRAND_AGG_WORKERS) count rows and sum values per group code in each chunk,
+reading the memory-mapped files, so the columns sit in shared memory once
+instead of being pickled to every worker. The partial results are then
+summed. Windows smaller than AGG_PARALLEL_MIN_ROWS rows are aggregated
+in-process.
+
+CACHE WARM-UP:
+--------------
+The first script run after a deploy or dataset rebuild starts a background
+thread that caches the default DEFAULT_WINDOW_DAYS window of every brand:
+rows, metrics, channel/country/day aggregates and search index. The default
+brand goes first, then the rest by mention count. Progress is shown in the
+sidebar and written to PARTITION_DIR/warmup.json ("ready": true when done),
+which a readiness probe can check. Disable with BRAND_WARMUP=0.
+
+PROGRESSIVE SAMPLING:
+---------------------
+A window of at least SAMPLE_MIN_ROWS mentions (env: BRAND_SAMPLE_MIN_ROWS)
+whose rows are not cached yet is first rendered from a sample of about
+SAMPLE_TARGET_ROWS rows, stratified by day and source: the strata sizes are
+counted from the key code arrays, each stratum is sampled at the same rate
+(at least SAMPLE_MIN_PER_STRATUM rows) and sampled rows carry the weight
+N_h / n_h. Sentiment index, averages and reach are stratified estimates
+with 95% confidence intervals; mention counts, share of voice and the
+per-day and per-source mention counts stay exact. The exact window is
+computed in a background thread meanwhile, and the page reruns with exact
+values once it is cached; until then an "approximate" badge shows the
+sample size and intervals.
+
+PROGRESSIVE RENDERING:
+----------------------
+main() lays out every section as a "Loading ..." placeholder before computing
+anything, and a RenderScheduler fills them. Section inputs (window rows,
+metrics, each aggregate, sketches, anomalies, ...) are computed on
+RENDER_WORKERS threads (env: BRAND_RENDER_WORKERS), in submission order.
+The script thread fills the KPI row first, then the Live Metrics numbers,
+which only need the window metrics (the health trend and the sketch-based
+parts beside them are separate sections). The remaining sections follow in
+page order, except that a section whose inputs are still running is filled
+after the ones that are ready.
+
+ANOMALY DETECTION:
+------------------
+Every brand's daily sentiment index, mention volume, engagement and share of
+voice are scored by AnomalyDetector, which keeps per-series EWMA mean and
+variance plus a ring buffer of the last ANOMALY_WINDOW_DAYS values for a
+robust (median/MAD) z-score. All series update together in one vectorized
+step per day, and the state is persisted per dataset version, so new days
+are scored from their own rows without replaying history. The newest day is
+held back while it is still today (its mentions are still arriving), so a
+partial day never reads as a drop. A day is flagged when both z-scores
+reach ANOMALY_Z_THRESHOLD (env: BRAND_ANOMALY_Z). Alerts are shown in the
+Signal Alerts panel and reported by the batch job anomaly_alerts.py.
+
+HEALTH SCORE HISTORY:
+---------------------
+health_score_history applies the Marketing Health Score formula to every
+brand and day (or week) at once from the per-brand daily aggregates, with
+the cross-brand engagement and reach normalizers taken per period. The
+trend for the selected brand and range is drawn under the Health Score KPI.
+
+THEME CO-OCCURRENCE:
+--------------------
+At ingest each brand also gets a sparse mention × theme presence matrix
+(hashtags prefixed with '#', plus Keywords / Key Phrases), rows in date
+order. For a brand/date window the row slices are stacked and C = XᵀX
+gives co-mention counts for every theme pair in one sparse product; the
+Theme Associations section ranks the themes of a selected one by lift
+(N · count(a, b) / (count(a) · count(b))). Needs scipy.
+
+The Distinctive Keywords view treats each brand as one document of a sparse
+brand × theme matrix (mentions per theme) and scores it with TF-IDF for all
+brands at once, so themes shared by every brand drop out. Computed once per
+dataset version.
+
+GEOGRAPHIC DRILLDOWN:
+---------------------
+The Geographic Sentiment chart drills down GEO_LEVELS (Country → Subregion
+→ State → City): clicking a bar shows the places inside it and the
+breadcrumb above the chart goes back up. At ingest each brand gets a geo
+rollup: the place tree (each place's name and parent) and its mention
+count, sentiment_score sum and Reach sum per finest-level place and day,
+in date order. A brand/date window sums its slice of cells with np.bincount
+and rolls them up through the parent links once (cached per window as
+'geo_hierarchy'), so every click is a dictionary lookup. Places with no
+value at a level show as "Unknown" only when something below them is known.
+
+ARTIFACT CACHE:
+---------------
+Derived artifacts share one in-process LRU cache bounded by CACHE_BUDGET_MB
+(env: BRAND_CACHE_BUDGET_MB). Entries are tagged with a kind ('data',
+'metrics', ...) and the dataset version; when the partitions are rebuilt all
+entries for older versions are dropped. Bytes, entries, hit rate and
+evictions are shown in the sidebar "Cache" expander.
+
+With DISK_CACHE (env: BRAND_DISK_CACHE, default on), DISK_CACHE_KINDS
+(metrics, aggregates) are also written under PARTITION_DIR/<version>/cache/,
+in a subdirectory per DISK_CACHE_REVISION so entries computed by older code
+are never served. Writes are atomic (temporary file, then rename) and each
+entry carries a SHA-256 checksum. After a restart, entries are read back
+lazily on first use; a corrupt entry is deleted and recomputed. Together with the on-disk
+partitions, search indexes and sketches, a restarted server recomputes
+nothing that was already computed for the current dataset version. The
+manifest is reused only if every file it lists exists.
+
+INCREMENTAL INGEST:
+-------------------
+When CSV or JSON Lines sources only had rows appended since the last build
+(same size and mtime for the others, unchanged bytes before the previous
+end), only the new rows are read, deduplicated against the persisted
+mention keys and written as one more row_id segment: their own brand/month
+partitions, column store and key code arrays under the new version
+directory, while the manifest keeps referencing the files of earlier
+versions. Only brands that received rows get a merged search index,
+sketches, theme matrix and geo rollup. Cached aggregates of those
+brands are updated by adding an aggregate over the new rows, and cached
+windows of other brands are kept, so a refresh costs time proportional to
+the new rows. A configured file that is still missing does not count as a
+change. Any other source change, or APPEND_MAX_SEGMENTS appended segments,
+triggers a full rebuild.
+
 FUTURE API INTEGRATION:
 -----------------------
 To adapt for API data:
 1. Create load_from_api() function that returns pd.DataFrame
 2. Add {"type": "api", "endpoint": "url", "brand": "X"} to DATA_SOURCES
-3. Modify load_data() to handle "api" type
+3. Modify iter_source_chunks() to handle "api" type
 4. Normalize API response to match expected schema
 5. Cache with @st.cache_data for performance
 """
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import pandas as pd
 import numpy as np
+import plotly
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Callable, Hashable, Iterator
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 import json
+import contextlib
+import functools
+import gzip
+import hashlib
+import heapq
+import io
+import pyarrow as pa
+import pyarrow.parquet as pq
+import scipy.sparse as sp
+import os
+import math
+import pickle
+import queue
+import re
+import shutil
+import sys
+import threading
+import time
 from pathlib import Path
+try:
+    import fcntl
+except ImportError:  # Windows: builds are not serialized across processes
+    fcntl = None
+
+from aggregation import AggregationExecutor, merge_partials
+
+# Column-store columns are read-only memory-mapped views (see attach_column_store);
+# with copy-on-write, writing to a derived frame copies instead of failing on the
+# mapping. Always on from pandas 3, where the option is deprecated.
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.options.mode.copy_on_write = True
 
 # ============================================================================
 # CONFIGURATION - EDIT THIS SECTION TO ADD/REMOVE DATA SOURCES
@@ -91,6 +366,91 @@ from pathlib import Path
 CSV_DIR = "data/csv"
 JSON_DIR = "data/json"
 
+# Ingested data is persisted here as brand/month Parquet partitions
+PARTITION_DIR = "data/partitions"
+
+# Drop the same article when it appears in several exports / Input Name searches
+DEDUPLICATE_MENTIONS = True
+
+# Sketch sizes for approximate top-K and distinct counts (see APPROXIMATE TOP-K)
+SKETCH_CAPACITY = 100
+HLL_PRECISION = 10
+# Rows whose terms are exploded at a time while building a brand's sketches
+SKETCH_CHUNK_ROWS = 50_000
+
+# Numeric metric columns stored as memory-mapped arrays instead of inside the partitions
+COLUMN_STORE_COLUMNS = [
+    'Reach', 'Desktop Reach', 'Mobile Reach', 'Engagement', 'Views', 'Estimated Views', 'AVE',
+    'Twitter Social Echo', 'Facebook Social Echo', 'Reddit Social Echo', 'Total Social Echo',
+    'sentiment_score',
+]
+
+# Large text fields only needed for drilldowns; stored beside the partitions and
+# fetched by row_id instead of being held in the resident frame
+LAZY_TEXT_COLUMNS = [
+    'Headline', 'Title', 'Opening Text', 'Hit Sentence', 'URL', 'User Profile Url', 'Custom Categories',
+]
+
+# CSV and JSON Lines sources are parsed in chunks of SOURCE_CHUNK_ROWS rows
+# (see STREAMING SOURCES), compressed ones decompressed ahead of the parser in
+# blocks of DECOMPRESS_BLOCK_BYTES with at most DECOMPRESS_QUEUE_BLOCKS blocks buffered
+SOURCE_CHUNK_ROWS = int(os.environ.get("BRAND_SOURCE_CHUNK_ROWS", "50000"))
+# A partition build buffers at most this many rows before writing them out as
+# one row_id segment, which bounds its memory whatever the size of the sources
+BUILD_SEGMENT_ROWS = int(os.environ.get("BRAND_BUILD_SEGMENT_ROWS", "1000000"))
+DECOMPRESS_BLOCK_BYTES = 1 << 20
+DECOMPRESS_QUEUE_BLOCKS = 8
+
+# Hold text columns as Arrow-backed strings (string[pyarrow]) from reader to prepared
+# frame instead of one Python str object per cell
+ARROW_STRINGS = os.environ.get("BRAND_ARROW_STRINGS", "1") == "1"
+
+# Upper bound on points per time-series chart (see TIME SERIES RESOLUTION)
+CHART_MAX_POINTS = 120
+
+# Page-wide budget for serialized chart JSON, and category caps for proportion charts
+CHART_PAGE_BUDGET_KB = int(os.environ.get("BRAND_CHART_BUDGET_KB", "512"))
+PIE_MAX_SLICES = 5
+
+# Worker processes for channel/country/day aggregation, and the window size (rows)
+# below which aggregation stays in-process (see AGGREGATION EXECUTOR)
+AGG_WORKERS = int(os.environ.get("BRAND_AGG_WORKERS", str(os.cpu_count() or 1)))
+AGG_PARALLEL_MIN_ROWS = int(os.environ.get("BRAND_AGG_PARALLEL_MIN_ROWS", "500000"))
+
+# Default sidebar date window, also the window pre-computed for every brand at startup
+DEFAULT_WINDOW_DAYS = 90
+WARMUP_ENABLED = os.environ.get("BRAND_WARMUP", "1") == "1"
+
+# Windows of at least SAMPLE_MIN_ROWS uncached rows render from a stratified
+# sample first (see PROGRESSIVE SAMPLING): target sample size, minimum rows per
+# day/source stratum, and how often the page checks for the exact values
+SAMPLE_MIN_ROWS = int(os.environ.get("BRAND_SAMPLE_MIN_ROWS", "2000000"))
+SAMPLE_TARGET_ROWS = 50_000
+SAMPLE_MIN_PER_STRATUM = 5
+SAMPLE_REFRESH_SECONDS = 2
+
+# Threads computing page section inputs (window rows, metrics, aggregates, ...)
+# while earlier sections render (see PROGRESSIVE RENDERING)
+RENDER_WORKERS = int(os.environ.get("BRAND_RENDER_WORKERS", "4"))
+
+# Anomaly detection on daily brand signals (see ANOMALY DETECTION): EWMA
+# half-life, robust z-score window, |z| threshold for both scores, days of
+# history before a series is scored, and the scale floor relative to its level
+ANOMALY_HALFLIFE_DAYS = 7.0
+ANOMALY_WINDOW_DAYS = 28
+ANOMALY_Z_THRESHOLD = float(os.environ.get("BRAND_ANOMALY_Z", "3.5"))
+ANOMALY_MIN_HISTORY = 7
+ANOMALY_MIN_RELATIVE_SCALE = 0.1
+# Most recent alerts listed in the dashboard's Signal Alerts panel
+ANOMALY_PANEL_ROWS = 20
+
+# Memory budget shared by every cached artifact (data windows, metrics, figures, ...)
+CACHE_BUDGET_MB = int(os.environ.get("BRAND_CACHE_BUDGET_MB", "512"))
+
+# Also keep small derived artifacts (metrics, aggregates) on disk next to the
+# partitions so a restarted server starts warm (see ARTIFACT CACHE)
+DISK_CACHE = os.environ.get("BRAND_DISK_CACHE", "1") == "1"
+
 DATA_SOURCES = [
     # CSV files (place all CSV files in data/csv/)
     {
@@ -348,27 +708,435 @@ def transform_meltwater_data(meltwater_records: List[Dict]) -> pd.DataFrame:
     return pd.DataFrame(transformed_rows)
 
 
-@st.cache_data(ttl=3600)
-def load_data(sources: List[Dict[str, Any]]) -> pd.DataFrame:
+ARROW_STRING_DTYPE = pd.StringDtype("pyarrow")
+
+
+def read_parquet_file(path: Path, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read a Parquet file, mapping strings to ARROW_STRING_DTYPE when ARROW_STRINGS is on."""
+    table = pq.read_table(path, columns=columns)
+    if not ARROW_STRINGS:
+        return table.to_pandas()
+    string_types = {pa.string(): ARROW_STRING_DTYPE, pa.large_string(): ARROW_STRING_DTYPE}
+    return table.to_pandas(types_mapper=string_types.get)
+
+
+def _normalize_urls(urls: pd.Series) -> pd.Series:
+    """Normalize URLs so trivially different links to one article compare equal."""
+    normalized = urls.fillna('').astype(str).str.strip().str.lower()
+    normalized = normalized.str.replace(r'^[a-z][a-z0-9+.-]*://', '', regex=True)
+    normalized = normalized.str.replace(r'^www\.', '', regex=True)
+    normalized = normalized.str.replace(r'#.*$', '', regex=True)
+    normalized = normalized.str.replace(r'(?:utm_[a-z_]+|fbclid|gclid)=[^&]*&?', '', regex=True)
+    return normalized.str.rstrip('?&/')
+
+
+def mention_keys(df: pd.DataFrame) -> tuple:
+    """
+    Hash each row to a 64-bit mention key for deduplication.
+    
+    The key is the brand plus the normalized URL, falling back to the
+    normalized headline and publication day when there is no URL.
+    
+    Returns:
+        (keys, valid) - uint64 key per row and a mask of rows that had a URL
+        or headline to key on
+    """
+    key = pd.Series('', index=df.index, dtype=object)
+    if 'URL' in df.columns:
+        key = 'url:' + _normalize_urls(df['URL'])
+        key = key.where(key != 'url:', '')
+    
+    headline_cols = [col for col in ['Headline', 'Title'] if col in df.columns]
+    if headline_cols:
+        # Sources without a Headline (Meltwater) have a Title instead
+        headline = df[headline_cols[0]]
+        for col in headline_cols[1:]:
+            headline = headline.fillna(df[col])
+        headline = headline.fillna('').astype(str).str.strip().str.lower().str.replace(r'\s+', ' ', regex=True)
+        if 'Date' in df.columns:
+            day = pd.to_datetime(df['Date'], errors='coerce').dt.strftime('%Y-%m-%d').fillna('')
+        else:
+            day = pd.Series('', index=df.index)
+        fallback = ('text:' + headline + '|' + day).where(headline != '', '')
+        key = key.where(key != '', fallback)
+    
+    # Same article for two different brands is two mentions
+    if 'brand' in df.columns:
+        scope = df['brand'].fillna('').astype(str)
+    elif 'Input Name' in df.columns:
+        scope = df['Input Name'].fillna('').astype(str).str.split(' + ', regex=False).str[0]
+    else:
+        scope = pd.Series('', index=df.index)
+    
+    valid = (key != '').to_numpy()
+    keys = pd.util.hash_array((scope + '\x1f' + key).to_numpy(dtype=object))
+    return keys, valid
+
+
+def drop_duplicate_mentions(df: pd.DataFrame, seen: np.ndarray) -> tuple:
     """
-    Load and combine data from multiple CSV and JSON sources.
+    Drop rows already seen in this source or an earlier one.
     
     Args:
-        sources: List of source configurations with 'path', 'type', and 'brand'
+        df: Rows of one source (after brand assignment)
+        seen: Sorted uint64 keys of every mention kept so far
         
     Returns:
-        Combined DataFrame with normalized schema and brand column
+        (deduplicated DataFrame, updated seen keys, number of duplicates dropped)
     """
-    all_dfs = []
+    keys, valid = mention_keys(df)
+    duplicate = np.zeros(len(df), dtype=bool)
+    if valid.any():
+        # Only the chunk is sorted; seen is binary-searched and the chunk's new
+        # keys are merged in at their positions, so seen is never re-sorted
+        unique, first = np.unique(keys[valid], return_index=True)
+        positions = np.searchsorted(seen, unique)
+        known = positions < len(seen)
+        known[known] = seen[positions[known]] == unique[known]
+        kept = np.zeros(int(valid.sum()), dtype=bool)
+        kept[first[~known]] = True
+        duplicate[valid] = ~kept
+        seen = np.insert(seen, positions[~known], unique[~known])
+    return df[~duplicate].reset_index(drop=True), seen, int(duplicate.sum())
+
+
+# Canonical layout every source is emitted in (see SCHEMA NORMALIZATION):
+# column -> (kind, default for missing values). Kinds are 'date' (DATE_DTYPE),
+# 'number' (float64), 'flag' (nullable boolean) and 'text' (string[pyarrow],
+# or object without ARROW_STRINGS).
+CANONICAL_SCHEMA = {
+    'Date': ('date', None),
+    'Headline': ('text', None),
+    'URL': ('text', None),
+    'Opening Text': ('text', None),
+    'Hit Sentence': ('text', None),
+    'Source': ('text', 'Unknown'),
+    'Influencer': ('text', None),
+    'Country': ('text', 'Unknown'),
+    'Subregion': ('text', None),
+    'Language': ('text', None),
+    'Reach': ('number', 0.0),
+    'Desktop Reach': ('number', None),
+    'Mobile Reach': ('number', None),
+    'Twitter Social Echo': ('number', None),
+    'Facebook Social Echo': ('number', None),
+    'Reddit Social Echo': ('number', None),
+    'Earned Traffic': ('number', None),
+    'National Viewership': ('number', None),
+    'AVE': ('number', 0.0),
+    'Sentiment': ('text', None),
+    'Key Phrases': ('text', None),
+    'Input Name': ('text', None),
+    'Keywords': ('text', None),
+    'Document Tags': ('text', None),
+    'Hidden': ('flag', None),
+    'Tweet Id': ('text', None),
+    'Twitter Id': ('text', None),
+    'State': ('text', None),
+    'City': ('text', None),
+    'Engagement': ('number', 0.0),
+    'User Profile Url': ('text', None),
+    'Hashtags': ('text', None),
+    'Views': ('number', 0.0),
+    'Estimated Views': ('number', 0.0),
+    'Summarization Disabled': ('flag', None),
+    'Custom Categories': ('text', None),
+    'brand': ('text', None),
+}
+
+# Source-specific columns outside CANONICAL_SCHEMA that are still numeric
+EXTRA_NUMBER_COLUMNS = {'Total Social Echo'}
+
+DATE_DTYPE = np.dtype('datetime64[us]')
+_FLAG_VALUES = {'true': True, 'false': False, '1': True, '0': False, 'yes': True, 'no': False}
+
+
+def text_dtype():
+    """Dtype of canonical text columns."""
+    return ARROW_STRING_DTYPE if ARROW_STRINGS else object
+
+
+def source_read_dtypes() -> Dict[str, Any]:
+    """
+    Parse-time dtypes for read_csv: text columns are read straight into their
+    canonical dtype (IDs keep their digits instead of becoming floats).
+    """
+    dtype = ARROW_STRING_DTYPE if ARROW_STRINGS else str
+    return {col: dtype for col, (kind, _) in CANONICAL_SCHEMA.items() if kind in ('text', 'date')}
+
+
+@functools.lru_cache(maxsize=256)
+def normalization_plan(columns: tuple) -> Dict[str, Any]:
+    """
+    Resolve a source schema into its normalization plan, once per distinct header.
     
-    for source in sources:
+    Args:
+        columns: Column names exactly as read from the source
+        
+    Returns:
+        Plan with 'mapping' (canonical or extra column -> raw column),
+        'kinds' (column -> kind, for every output column in order) and
+        'derive_brand' (brand comes from Input Name). Shared between calls;
+        do not modify.
+    """
+    mapping = {}
+    for raw in columns:
+        name = str(raw).strip()
+        if name == 'Brand':
+            name = 'brand'
+        # First occurrence wins if stripping makes two headers collide
+        mapping.setdefault(name, raw)
+    
+    kinds = {col: kind for col, (kind, _) in CANONICAL_SCHEMA.items()}
+    for name in mapping:
+        if name not in kinds:
+            kinds[name] = 'number' if name in EXTRA_NUMBER_COLUMNS else 'extra'
+    return {
+        'mapping': mapping,
+        'kinds': kinds,
+        'derive_brand': 'brand' not in mapping and 'Input Name' in mapping,
+    }
+
+
+def _coerce_column(values: pd.Series, kind: str, default: Any) -> pd.Series:
+    """Cast one column to its canonical dtype, filling missing values with default."""
+    if kind == 'date':
+        values = pd.to_datetime(values, errors='coerce')
+        if values.dt.tz is not None:
+            values = values.dt.tz_convert(None)
+        return values.astype(DATE_DTYPE)
+    if kind == 'number':
+        values = pd.to_numeric(values, errors='coerce').astype(np.float64)
+        return values if default is None else values.fillna(default)
+    if kind == 'flag':
+        if pd.api.types.is_bool_dtype(values):
+            return values.astype('boolean')
+        text = values.astype(object).map(lambda v: str(v).strip().lower(), na_action='ignore')
+        return text.map(_FLAG_VALUES).astype('boolean')
+    if kind == 'text':
+        if values.dtype != text_dtype():
+            if not (isinstance(values.dtype, pd.StringDtype)
+                    or pd.api.types.infer_dtype(values, skipna=True) in ('string', 'empty')):
+                values = values.astype(object).map(str, na_action='ignore')
+            values = values.astype(text_dtype())
+        return values if default is None else values.fillna(default)
+    # Extra columns keep their parsed values; all-text ones become Arrow strings
+    if ARROW_STRINGS and (values.dtype == object or isinstance(values.dtype, pd.StringDtype)) \
+            and pd.api.types.infer_dtype(values, skipna=True) in ('string', 'empty'):
+        return values.astype(ARROW_STRING_DTYPE)
+    return values
+
+
+def _default_column(kind: str, default: Any, index: pd.Index) -> pd.Series:
+    """A canonical column a source does not have, in its canonical dtype."""
+    if kind == 'date':
+        return pd.Series(pd.NaT, index=index, dtype=DATE_DTYPE)
+    if kind == 'number':
+        return pd.Series(np.nan if default is None else default, index=index, dtype=np.float64)
+    if kind == 'flag':
+        return pd.Series(pd.NA, index=index, dtype='boolean')
+    return pd.Series(pd.NA if default is None else default, index=index, dtype=text_dtype())
+
+
+def normalize_source_frame(df: pd.DataFrame, brand_name: Optional[str]) -> pd.DataFrame:
+    """
+    Emit freshly read source rows in the canonical typed layout.
+    
+    The source's normalization_plan renames its columns, casts each to its
+    CANONICAL_SCHEMA dtype and adds the canonical columns it lacks with their
+    defaults, so frames from any source concatenate without dtype changes.
+    Columns outside the schema follow the canonical ones.
+    
+    Args:
+        df: Rows as read from one source
+        brand_name: Brand from the source config, or None to keep the data's
+            own brand column or derive it from Input Name
+        
+    Returns:
+        DataFrame with CANONICAL_SCHEMA columns first, in schema order
+    """
+    plan = normalization_plan(tuple(df.columns))
+    mapping = plan['mapping']
+    index = pd.RangeIndex(len(df))
+    
+    columns = {}
+    for col, kind in plan['kinds'].items():
+        default = CANONICAL_SCHEMA[col][1] if col in CANONICAL_SCHEMA else None
+        if col in mapping:
+            columns[col] = _coerce_column(df[mapping[col]].reset_index(drop=True), kind, default)
+        else:
+            columns[col] = _default_column(kind, default, index)
+    
+    if brand_name:
+        columns['brand'] = pd.Series(brand_name, index=index, dtype=text_dtype())
+    elif plan['derive_brand']:
+        # Brand from patterns like "Microsoft + AI" -> "Microsoft"
+        columns['brand'] = columns['Input Name'].str.replace(r'(?s) \+ .*$', '', regex=True)
+    return pd.DataFrame(columns, index=index)
+
+
+# Compression of a source by file suffix when its config has no 'compression'
+SOURCE_COMPRESSIONS = {'.gz': 'gzip', '.gzip': 'gzip', '.zst': 'zstd', '.zstd': 'zstd'}
+
+
+def source_compression(source: Dict[str, Any]) -> Optional[str]:
+    """Compression of a source file ('gzip', 'zstd' or None), from its config or file suffix."""
+    if 'compression' in source:
+        return source['compression']
+    return SOURCE_COMPRESSIONS.get(Path(source['path']).suffix.lower())
+
+
+def is_streamed_source(source: Dict[str, Any]) -> bool:
+    """Whether a source is read in chunks: CSV and JSON Lines, compressed or not."""
+    return source['type'] in ('csv', 'jsonl')
+
+
+def _open_decompressed(path: str, compression: str):
+    """Open a compressed file as a binary stream of its decompressed bytes."""
+    if compression == 'gzip':
+        return gzip.open(path, 'rb')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("zstd sources need the zstandard package (pip install zstandard)") from e
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+class DecompressedStream(io.RawIOBase):
+    """
+    Read-only stream of a compressed file, decompressed ahead of the reader.
+    
+    A background thread decompresses DECOMPRESS_BLOCK_BYTES blocks into a
+    queue holding at most DECOMPRESS_QUEUE_BLOCKS of them, so the parser
+    works on one block while the next ones are decompressed (zlib and zstd
+    release the GIL) and buffered memory stays bounded.
+    """
+    
+    def __init__(self, path: str, compression: str):
+        super().__init__()
+        self._queue: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=DECOMPRESS_QUEUE_BLOCKS)
+        self._block = memoryview(b'')
+        self._eof = False
+        self._error: Optional[BaseException] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._decompress, args=(path, compression),
+                                        name=f"decompress-{Path(path).name}", daemon=True)
+        self._thread.start()
+    
+    def _put(self, block: Optional[bytes]) -> None:
+        # Give up once the reader has closed the stream
+        while not self._stop.is_set():
+            try:
+                self._queue.put(block, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+    
+    def _decompress(self, path: str, compression: str) -> None:
+        try:
+            with _open_decompressed(path, compression) as f:
+                while not self._stop.is_set():
+                    block = f.read(DECOMPRESS_BLOCK_BYTES)
+                    if not block:
+                        break
+                    self._put(block)
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._put(None)
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        while not self._block:
+            if self._eof:
+                return 0
+            block = self._queue.get()
+            if block is None:
+                self._eof = True
+                if self._error is not None:
+                    raise self._error
+                return 0
+            self._block = memoryview(block)
+        n = min(len(buffer), len(self._block))
+        buffer[:n] = self._block[:n]
+        self._block = self._block[n:]
+        return n
+    
+    def close(self) -> None:
+        self._stop.set()
+        super().close()
+
+
+def read_source_chunks(source: Dict[str, Any], chunk_rows: int = SOURCE_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Parse a CSV or JSON Lines source in chunks of chunk_rows rows.
+    
+    Compressed files are read through a DecompressedStream. JSON values are
+    kept as parsed (no date or dtype inference), like CSV cells before
+    prepare_data.
+    
+    Args:
+        source: Source config ('path', 'type' of 'csv' or 'jsonl', optional 'compression')
+        chunk_rows: Rows per chunk
+        
+    Yields:
+        One DataFrame per chunk
+    """
+    compression = source_compression(source)
+    raw = DecompressedStream(source['path'], compression) if compression else open(source['path'], 'rb')
+    with io.BufferedReader(raw, buffer_size=DECOMPRESS_BLOCK_BYTES) as stream:
+        if source['type'] == 'csv':
+            reader = pd.read_csv(stream, chunksize=chunk_rows, dtype=source_read_dtypes())
+        else:
+            text = io.TextIOWrapper(stream, encoding='utf-8')
+            reader = pd.read_json(text, lines=True, chunksize=chunk_rows, dtype=False, convert_dates=False)
+        with reader:
+            yield from reader
+
+
+def _failed_source(path: str, error: str) -> Dict[str, Any]:
+    """ingest_report entry of a source that could not be loaded."""
+    return {'path': path, 'rows': 0, 'duplicates': 0, 'error': error}
+
+
+def iter_source_chunks(sources: List[Dict[str, Any]], state: Dict[str, Any],
+                       failed: Optional[Dict[int, str]] = None) -> Iterator[tuple]:
+    """
+    Read sources one after the other as normalized, deduplicated chunks.
+    
+    Args:
+        sources: List of source configurations with 'path', 'type', and 'brand'
+        state: Updated in place: 'ingest_report' gets each source's row and
+            duplicate counts (or its 'error') once the source is done, and
+            'mention_keys' holds the sorted keys of the rows of completed sources
+        failed: {source position: error} of sources to report as failed without reading them
+        
+    Yields:
+        (source position, chunk) for each chunk in the canonical layout, then
+        (source position, None) once the source is done. A source that fails
+        part-way contributes no rows: its report entry has an 'error' and the
+        caller drops the chunks it already received.
+    """
+    state.setdefault('ingest_report', [])
+    state.setdefault('mention_keys', np.array([], dtype=np.uint64))
+    ingest_report = state['ingest_report']
+    
+    for position, source in enumerate(sources):
         path = source['path']
         source_type = source['type']
         brand_name = source.get('brand')
+        if failed and position in failed:
+            ingest_report.append(_failed_source(path, failed[position]))
+            yield position, None
+            continue
         
         try:
-            if source_type == 'csv':
-                df = pd.read_csv(path)
+            if is_streamed_source(source):
+                chunks = read_source_chunks(source)
             elif source_type == 'json':
                 # Try direct JSON read first
                 try:
@@ -381,6 +1149,7 @@ def load_data(sources: List[Dict[str, Any]]) -> pd.DataFrame:
                         df = pd.DataFrame(data)
                     else:
                         df = pd.json_normalize(data)
+                chunks = [df]
             elif source_type == 'meltwater':
                 # Load Meltwater API format and transform
                 with open(path, 'r', encoding='utf-8') as f:
@@ -388,45 +1157,79 @@ def load_data(sources: List[Dict[str, Any]]) -> pd.DataFrame:
                 
                 # Meltwater data is typically an object with 'documents' array
                 if isinstance(meltwater_data, dict) and 'documents' in meltwater_data:
-                    df = transform_meltwater_data(meltwater_data['documents'])
+                    chunks = [transform_meltwater_data(meltwater_data['documents'])]
                 elif isinstance(meltwater_data, list):
-                    df = transform_meltwater_data(meltwater_data)
+                    chunks = [transform_meltwater_data(meltwater_data)]
                 else:
                     st.warning(f"Unexpected Meltwater format in {path}")
+                    ingest_report.append(_failed_source(path, "unexpected Meltwater format"))
+                    yield position, None
                     continue
             else:
                 st.warning(f"Unknown source type: {source_type} for {path}")
+                ingest_report.append(_failed_source(path, f"unknown source type: {source_type}"))
+                yield position, None
                 continue
             
-            # Normalize column names (strip whitespace, handle case)
-            df.columns = df.columns.str.strip()
+            # Mention keys are committed only once the whole source is read
+            source_seen = state['mention_keys']
+            rows = duplicates = 0
+            for df in chunks:
+                df = normalize_source_frame(df, brand_name)
+                if DEDUPLICATE_MENTIONS:
+                    df, source_seen, chunk_duplicates = drop_duplicate_mentions(df, source_seen)
+                    duplicates += chunk_duplicates
+                rows += len(df)
+                yield position, df
             
-            # Handle brand column based on config
-            if 'Brand' in df.columns:
-                df.rename(columns={'Brand': 'brand'}, inplace=True)
-            
-            # Only set brand if brand_name is explicitly specified in config
-            # If brand_name is None, leave brand column alone (will be extracted later in prepare_data)
-            if brand_name:
-                df['brand'] = brand_name
-            elif 'brand' not in df.columns:
-                # If no brand column exists and brand_name is None, 
-                # don't infer - let prepare_data handle it
-                pass
-            
-            all_dfs.append(df)
+            state['mention_keys'] = source_seen
+            ingest_report.append({'path': path, 'rows': rows, 'duplicates': duplicates})
             
         except FileNotFoundError:
             st.warning(f"File not found: {path}")
+            ingest_report.append(_failed_source(path, "file not found"))
         except Exception as e:
             st.error(f"Error loading {path}: {str(e)}")
+            ingest_report.append(_failed_source(path, str(e)))
+        yield position, None
+
+
+def load_data(sources: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Load and combine data from multiple CSV, JSON and JSON Lines sources.
+    
+    This holds every row in one frame; partition builds stream the chunks
+    into segments instead (see stream_partitions).
+    
+    Args:
+        sources: List of source configurations with 'path', 'type', and 'brand'
+        
+    Returns:
+        Combined DataFrame in the canonical layout (CANONICAL_SCHEMA columns,
+        then any source-specific ones). Per-source row and duplicate counts
+        are in attrs['ingest_report'] (with an 'error' for sources that could
+        not be loaded), and the sorted mention keys of the kept rows in
+        attrs['mention_keys'].
+    """
+    state: Dict[str, Any] = {}
+    all_dfs = []
+    source_dfs = []
+    for _, df in iter_source_chunks(sources, state):
+        if df is not None:
+            source_dfs.append(df)
+            continue
+        if not state['ingest_report'][-1].get('error'):
+            all_dfs.extend(source_dfs)
+        source_dfs = []
     
     if not all_dfs:
         # Return empty DataFrame with expected schema
-        return pd.DataFrame(columns=['Date', 'brand', 'Sentiment', 'Source', 'Engagement'])
+        return normalize_source_frame(pd.DataFrame(), None)
     
-    # Combine all dataframes
+    # Every frame has the canonical layout, so this is a plain append
     combined_df = pd.concat(all_dfs, ignore_index=True)
+    combined_df.attrs['ingest_report'] = state['ingest_report']
+    combined_df.attrs['mention_keys'] = state['mention_keys']
     
     return combined_df
 
@@ -435,49 +1238,26 @@ def prepare_data(df: pd.DataFrame) -> pd.DataFrame:
     """
     Prepare and clean the data for analysis.
     
+    Column types and defaults are already applied per source by
+    normalize_source_frame; this adds the computed fields.
+    
     Args:
-        df: Raw DataFrame
+        df: Rows in the canonical layout (see load_data)
         
     Returns:
-        Cleaned DataFrame with computed fields
+        DataFrame with computed fields
     """
     if df.empty:
         return df
     
-    # Parse Date column
-    if 'Date' in df.columns:
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-    
-    # Add numeric sentiment score
-    sentiment_map = {
-        'positive': 1,
-        'neutral': 0,
-        'negative': -1,
-        'unknown': 0
-    }
-    
-    if 'Sentiment' in df.columns:
-        df['sentiment_score'] = df['Sentiment'].str.lower().map(sentiment_map).fillna(0)
-    else:
-        df['sentiment_score'] = 0
-    
-    # Ensure numeric columns
-    numeric_cols = ['Reach', 'Engagement', 'Views', 'Estimated Views', 'AVE']
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-    
-    # Fill missing values for key columns
-    if 'Source' in df.columns:
-        df['Source'] = df['Source'].fillna('Unknown')
-    
-    if 'Country' in df.columns:
-        df['Country'] = df['Country'].fillna('Unknown')
-    
-    # Extract brand from 'Input Name' column if 'brand' column doesn't exist
-    if 'brand' not in df.columns and 'Input Name' in df.columns:
-        # Extract brand name from patterns like "Microsoft + AI" -> "Microsoft"
-        df['brand'] = df['Input Name'].str.split(' + ').str[0]
+    # Add numeric sentiment score (positive = 1, negative = -1, neutral/unknown/other = 0)
+    sentiment = df['Sentiment'].str.lower()
+    df['sentiment_score'] = np.select(
+        [sentiment.eq('positive').fillna(False).to_numpy(dtype=bool),
+         sentiment.eq('negative').fillna(False).to_numpy(dtype=bool)],
+        [1.0, -1.0],
+        default=0.0
+    )
     
     return df
 
@@ -490,13 +1270,13 @@ def get_brand_list(df: pd.DataFrame) -> List[str]:
     return ['No brands found']
 
 
-def compute_metrics(df_brand: pd.DataFrame, df_all: pd.DataFrame) -> Dict[str, Any]:
+def compute_metrics(df_brand: pd.DataFrame, df_totals: pd.DataFrame) -> Dict[str, Any]:
     """
     Compute key metrics for a specific brand.
     
     Args:
         df_brand: Filtered DataFrame for selected brand
-        df_all: Full DataFrame with all brands
+        df_totals: Per-partition totals for all brands (see partition_totals)
         
     Returns:
         Dictionary of computed metrics
@@ -511,7 +1291,7 @@ def compute_metrics(df_brand: pd.DataFrame, df_all: pd.DataFrame) -> Dict[str, A
         metrics['sentiment_index'] = 50
     
     # Share of Voice (%)
-    total_mentions = len(df_all)
+    total_mentions = int(df_totals['rows'].sum()) if len(df_totals) > 0 else 0
     brand_mentions = len(df_brand)
     metrics['share_of_voice'] = (brand_mentions / total_mentions * 100) if total_mentions > 0 else 0
     
@@ -541,54 +1321,3663 @@ def compute_metrics(df_brand: pd.DataFrame, df_all: pd.DataFrame) -> Dict[str, A
     # Average Engagement
     metrics['avg_engagement'] = df_brand['Engagement'].mean() if 'Engagement' in df_brand.columns and len(df_brand) > 0 else 0
     
-    # Marketing Health Score (composite: 0-100)
-    # Formula: 0.4 * sentiment_index + 0.3 * normalized_engagement + 0.3 * normalized_reach
-    if len(df_brand) > 0 and len(df_all) > 0:
-        # Calculate average engagement and reach across all brands for fair comparison
-        all_brands_avg_engagement = df_all['Engagement'].mean() if 'Engagement' in df_all.columns else 1
-        all_brands_avg_reach = df_all['Reach'].mean() if 'Reach' in df_all.columns else 1
-        
-        # Normalize brand's avg engagement against overall avg (capped at 100)
-        norm_engagement = min(100, (metrics['avg_engagement'] / all_brands_avg_engagement * 100)) if all_brands_avg_engagement > 0 else 0
-        
-        # Calculate average reach per mention for the brand
-        brand_avg_reach = (metrics['total_reach'] / metrics['total_mentions']) if metrics['total_mentions'] > 0 else 0
-        # Normalize brand's avg reach against overall avg (capped at 100)
-        norm_reach = min(100, (brand_avg_reach / all_brands_avg_reach * 100)) if all_brands_avg_reach > 0 else 0
-        
-        metrics['health_score'] = (0.4 * metrics['sentiment_index'] + 
-                                   0.3 * norm_engagement + 
-                                   0.3 * norm_reach)
-    else:
-        metrics['health_score'] = 0
+    metrics['health_score'] = health_score(metrics, df_totals)
     
     return metrics
 
 
+def health_score(metrics: Dict[str, Any], df_totals: pd.DataFrame) -> float:
+    """
+    Marketing Health Score (composite: 0-100) of a window's metrics.
+    
+    Formula: 0.4 * sentiment_index + 0.3 * normalized_engagement + 0.3 * normalized_reach
+    """
+    total_mentions = int(df_totals['rows'].sum()) if len(df_totals) > 0 else 0
+    if metrics['total_mentions'] == 0 or total_mentions == 0:
+        return 0
+    
+    # Calculate average engagement and reach across all brands for fair comparison
+    all_brands_avg_engagement = df_totals['Engagement'].sum() / total_mentions if 'Engagement' in df_totals.columns else 1
+    all_brands_avg_reach = df_totals['Reach'].sum() / total_mentions if 'Reach' in df_totals.columns else 1
+    
+    # Normalize brand's avg engagement against overall avg (capped at 100)
+    norm_engagement = min(100, (metrics['avg_engagement'] / all_brands_avg_engagement * 100)) if all_brands_avg_engagement > 0 else 0
+    
+    # Calculate average reach per mention for the brand
+    brand_avg_reach = metrics['total_reach'] / metrics['total_mentions']
+    # Normalize brand's avg reach against overall avg (capped at 100)
+    norm_reach = min(100, (brand_avg_reach / all_brands_avg_reach * 100)) if all_brands_avg_reach > 0 else 0
+    
+    return (0.4 * metrics['sentiment_index'] + 
+            0.3 * norm_engagement + 
+            0.3 * norm_reach)
+
+
 # ============================================================================
-# UI RENDERING FUNCTIONS
+# PARTITIONED STORAGE
 # ============================================================================
 
-def render_sidebar(brand_list: List[str]) -> Dict[str, Any]:
+MANIFEST_FILE = "manifest.json"
+# Held exclusively while a process builds or appends, so builds never interleave
+BUILD_LOCK_FILE = "build.lock"
+# Bump when the on-disk layout changes so existing partitions are rebuilt
+STORAGE_FORMAT = 15
+UNDATED_PARTITION = "undated"
+
+# Bytes checked at the previous end of a source file to recognize appended rows
+SOURCE_TAIL_BYTES = 65536
+# Appended row batches kept as separate segments before a full rebuild compacts them
+APPEND_MAX_SEGMENTS = 8
+# Source types whose appends are detected (uncompressed files only)
+APPENDABLE_SOURCE_TYPES = {'csv', 'jsonl'}
+
+# Group-by columns stored as int32 code arrays beside the column store
+KEY_CODE_COLUMNS = ['Source', 'Country']
+
+# Columns whose per-partition sums are kept in the manifest for cross-brand totals
+PARTITION_SUM_COLUMNS = ['Engagement', 'Reach']
+
+
+def _source_signature(sources: List[Dict[str, Any]]) -> str:
+    """Hash source configs and file stats so partitions rebuild only on change."""
+    hasher = hashlib.sha1(f"format={STORAGE_FORMAT}\n".encode('utf-8'))
+    for source in sources:
+        path = source['path']
+        try:
+            stat = os.stat(path)
+            file_state = f"{stat.st_size}:{stat.st_mtime_ns}"
+        except OSError:
+            file_state = "missing"
+        compression = f"|{source['compression']}" if 'compression' in source else ""
+        hasher.update(f"{path}|{source['type']}|{source.get('brand')}{compression}|{file_state}\n".encode('utf-8'))
+    return hasher.hexdigest()[:16]
+
+
+def _partition_slug(value: str) -> str:
+    """Make a brand name safe to use as a directory name."""
+    return ''.join(c if c.isalnum() or c in '-_' else '_' for c in value) or '_'
+
+
+def _parquet_safe(df: pd.DataFrame) -> pd.DataFrame:
+    """Stringify mixed-type object columns so Parquet can store them."""
+    for col in df.columns:
+        if df[col].dtype == object:
+            values = df[col]
+            mixed = values.notna() & ~values.map(lambda v: isinstance(v, str))
+            if mixed.any():
+                df[col] = values.where(~mixed, values.astype(str))
+    return df
+
+
+def read_manifest(partition_dir: str = PARTITION_DIR) -> Optional[Dict[str, Any]]:
+    """Read the partition manifest, or None if nothing has been ingested yet."""
+    try:
+        with open(Path(partition_dir) / MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _sort_for_partitions(df: pd.DataFrame, row_start: int = 0) -> tuple:
     """
-    Render sidebar with navigation and filters.
+    Sort rows by brand then Date (undated last) and number them from row_start.
     
     Returns:
-        Dictionary of selected filter values
+        (sorted DataFrame with a row_id column, brand per row, month per row)
     """
-    with st.sidebar:
-        st.markdown("<h1 style='text-align: center; margin-left: 0; margin-right: 0;'>Brand ⚡ Brand</h1>", unsafe_allow_html=True)
-        st.markdown("---")
-        
-        # Brand selector - moved above navigation
-        st.markdown("### Brand Selection")
-        selected_brand = st.selectbox(
-            "Select Brand",
-            options=brand_list,
-            key="brand_selector"
-        )
+    brands = df['brand'].fillna('') if 'brand' in df.columns else pd.Series('', index=df.index)
+    if 'Date' in df.columns:
+        months = df['Date'].dt.strftime('%Y-%m').fillna(UNDATED_PARTITION)
+        sort_keys = [brands.rename('_brand'), df['Date']]
+    else:
+        months = pd.Series(UNDATED_PARTITION, index=df.index)
+        sort_keys = [brands.rename('_brand')]
+    
+    sort_frame = pd.concat(sort_keys, axis=1)
+    order = sort_frame.sort_values(list(sort_frame.columns), kind='stable', na_position='last').index
+    df = df.loc[order].reset_index(drop=True)
+    brands = brands.loc[order].reset_index(drop=True)
+    months = months.loc[order].reset_index(drop=True)
+    df['row_id'] = np.arange(row_start, row_start + len(df), dtype=np.int64)
+    return df, brands, months
+
+
+def _write_column_segment(df: pd.DataFrame, version_dir: Path, root: Path, store_cols: List[str],
+                          key_codes: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Write the column store and key code arrays of one row_id segment.
+    
+    key_codes holds the Source/Country categories and day origin of earlier
+    segments and is updated in place: new values are appended to the
+    categories, so codes mean the same in every segment.
+    
+    Returns:
+        Segment entry: row_start, rows and the file of each column and key
+    """
+    segment = {'row_start': int(df['row_id'].iloc[0]), 'rows': int(len(df)), 'columns': {}, 'codes': {}}
+    for col in store_cols:
+        column_path = version_dir / "columns" / f"{_partition_slug(col)}.npy"
+        column_path.parent.mkdir(exist_ok=True)
+        values = pd.to_numeric(df[col], errors='coerce') if col in df.columns else pd.Series(np.nan, index=df.index)
+        np.save(column_path, values.to_numpy(dtype=np.float64))
+        segment['columns'][col] = str(column_path.relative_to(root))
+    
+    code_dir = version_dir / "codes"
+    for col in KEY_CODE_COLUMNS:
+        if col not in df.columns:
+            continue
+        values = df[col].astype(str).where(df[col].notna())
+        spec = key_codes.setdefault(col, {'categories': []})
+        known = set(spec['categories'])
+        spec['categories'] = spec['categories'] + sorted(set(values.dropna()) - known)
+        code_dir.mkdir(exist_ok=True)
+        code_path = code_dir / f"{_partition_slug(col)}.npy"
+        np.save(code_path, pd.Categorical(values, categories=spec['categories']).codes.astype(np.int32))
+        segment['codes'][col] = str(code_path.relative_to(root))
+    if 'Date' in df.columns and df['Date'].notna().any():
+        days = df['Date'].dt.normalize()
+        spec = key_codes.setdefault('day', {'origin': days.min().isoformat(), 'days': 0})
+        day_codes = ((days - pd.Timestamp(spec['origin'])) // pd.Timedelta(days=1)).fillna(-1).to_numpy(dtype=np.int32)
+        spec['days'] = max(spec['days'], int(day_codes.max()) + 1)
+        code_dir.mkdir(exist_ok=True)
+        code_path = code_dir / "day.npy"
+        np.save(code_path, day_codes)
+        segment['codes']['day'] = str(code_path.relative_to(root))
+    return segment
+
+
+def _write_partition_files(df: pd.DataFrame, brands: pd.Series, months: pd.Series, version_dir: Path,
+                           root: Path, store_cols: List[str], text_cols: List[str]) -> List[Dict[str, Any]]:
+    """Write the brand/month row and text files of sorted rows; returns their manifest entries."""
+    partitions = []
+    for (brand, month), part in df.groupby([brands, months], sort=False):
+        brand_dir = version_dir / f"brand={_partition_slug(brand)}"
+        brand_dir.mkdir(exist_ok=True)
+        file_path = brand_dir / f"month={month}.parquet"
+        text_path = brand_dir / f"month={month}.text.parquet"
+        _parquet_safe(part.drop(columns=store_cols + text_cols).reset_index(drop=True)).to_parquet(file_path, index=False)
+        _parquet_safe(part[['row_id'] + text_cols].reset_index(drop=True)).to_parquet(text_path, index=False)
         
-        st.markdown("---")
+        dated = month != UNDATED_PARTITION
+        partitions.append({
+            'brand': brand or None,
+            'month': month,
+            'path': str(file_path.relative_to(root)),
+            'text_path': str(text_path.relative_to(root)),
+            'rows': int(len(part)),
+            'row_start': int(part['row_id'].iloc[0]),
+            'start': part['Date'].min().isoformat() if dated else None,
+            'end': part['Date'].max().isoformat() if dated else None,
+            'sums': {col: float(part[col].sum()) for col in PARTITION_SUM_COLUMNS if col in part.columns},
+        })
+    return partitions
+
+
+def _write_brand_artifacts(brand: str, index: Dict[str, np.ndarray], sketches: Dict[str, Any],
+                           themes: Dict[str, np.ndarray], geo: Dict[str, np.ndarray],
+                           version_dir: Path, root: Path) -> Dict[str, Any]:
+    """Write a brand's search index, sketches, theme matrix and geo rollup; returns its manifest 'indexes' entry."""
+    index_path = version_dir / "index" / f"brand={_partition_slug(brand)}.npz"
+    write_search_index(index, index_path)
+    sketch_path = version_dir / "sketches" / f"brand={_partition_slug(brand)}.pkl"
+    write_sketches(sketches, sketch_path)
+    themes_path = version_dir / "themes" / f"brand={_partition_slug(brand)}.npz"
+    write_theme_matrix(themes, themes_path)
+    geo_path = version_dir / "geo" / f"brand={_partition_slug(brand)}.npz"
+    write_geo_rollup(geo, geo_path)
+    return {
+        'brand': brand or None,
+        'path': str(index_path.relative_to(root)),
+        'sketches': str(sketch_path.relative_to(root)),
+        'themes': str(themes_path.relative_to(root)),
+        'geo': str(geo_path.relative_to(root)),
+    }
+
+
+def _manifest_paths(manifest: Dict[str, Any]) -> List[str]:
+    """Every file a manifest refers to, relative to the partition root."""
+    paths = [p[key] for p in manifest['partitions'] for key in ('path', 'text_path') if p.get(key)]
+    paths += [entry[key] for entry in manifest.get('indexes', []) for key in ('path', 'sketches', 'themes', 'geo')]
+    for segment in manifest.get('segments', []):
+        paths += list(segment['columns'].values()) + list(segment['codes'].values())
+    if manifest.get('mention_keys'):
+        paths.append(manifest['mention_keys'])
+    return paths
+
+
+def _manifest_versions(manifest: Dict[str, Any]) -> set:
+    """Version directories holding files of a manifest."""
+    return {Path(path).parts[0] for path in _manifest_paths(manifest)} | {manifest['version']}
+
+
+@contextlib.contextmanager
+def _build_lock(root: Path) -> Iterator[None]:
+    """Hold BUILD_LOCK_FILE exclusively (blocking) for the duration of a build."""
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / BUILD_LOCK_FILE, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _publish_manifest(manifest: Dict[str, Any], root: Path) -> None:
+    """
+    Atomically swap in a new manifest and drop versions no longer in use.
+    
+    The version being replaced stays on disk until the next publish, so
+    sessions and processes still reading it finish undisturbed; directories
+    referenced by neither manifest are removed. Older directories that
+    are kept only for their segments lose their now stale disk cache.
+    Callers hold the build lock.
+    """
+    previous = read_manifest(str(root))
+    tmp_path = root / f"{MANIFEST_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, root / MANIFEST_FILE)
+    
+    retained = _manifest_versions(manifest) | (_manifest_versions(previous) if previous else set())
+    in_use = {manifest['version'], previous['version'] if previous else None}
+    for entry in root.iterdir():
+        if not entry.is_dir():
+            continue
+        if entry.name not in retained:
+            shutil.rmtree(entry, ignore_errors=True)
+        elif entry.name not in in_use:
+            shutil.rmtree(entry / "cache", ignore_errors=True)
+
+
+class PartitionWriter:
+    """
+    Writes prepared rows into a new dataset version, one row_id segment per write.
+    
+    Each write sorts its rows (see _sort_for_partitions), numbers them after
+    every earlier row and writes their column store, key code arrays and
+    brand/month files: the first segment directly under the version
+    directory, later ones under "segment=<n>" subdirectories. The search
+    index, sketches, theme matrix and geo rollup of each brand in the segment
+    are rewritten with the new rows merged into the previous ones, so only
+    one segment and one brand's artifacts are in memory at a time. Given a
+    base manifest, the writer continues that dataset and keeps referencing
+    its files (see append_partitions).
+    """
+    
+    def __init__(self, version: str, partition_dir: str = PARTITION_DIR,
+                 base: Optional[Dict[str, Any]] = None, columns: Optional[List[str]] = None):
+        """
+        Args:
+            version: Dataset version being written
+            partition_dir: Root directory for partitions and the manifest
+            base: Manifest of the dataset to append to, or None for a new one
+            columns: Columns of a new dataset (taken from the first write if None)
+        """
+        self.version = version
+        self.root = Path(partition_dir)
+        self.version_dir = self.root / version
+        if self.version_dir.exists():
+            shutil.rmtree(self.version_dir)
+        self.version_dir.mkdir(parents=True)
+        
+        self.base = base
+        self.columns: Optional[List[str]] = None
+        if base is not None:
+            self.columns = [col for col in base['columns'] if col != 'row_id']
+            self.store_cols, self.text_cols = base['column_store'], base['text_columns']
+            self.segments, self.partitions = list(base['segments']), list(base['partitions'])
+            self.indexes = {entry['brand']: entry for entry in base['indexes']}
+            self.key_codes = json.loads(json.dumps(base['key_codes']))
+        else:
+            self.segments, self.partitions, self.indexes, self.key_codes = [], [], {}, {}
+            if columns is not None:
+                self._set_columns(list(columns))
+        self.base_rows = self.row_start = sum(segment['rows'] for segment in self.segments)
+        self.written = 0
+        self.brands: List[Optional[str]] = []
+    
+    def _set_columns(self, columns: List[str]) -> None:
+        self.columns = columns
+        self.store_cols = [col for col in COLUMN_STORE_COLUMNS if col in columns]
+        self.text_cols = [col for col in LAZY_TEXT_COLUMNS if col in columns]
+    
+    def accepts(self, df: pd.DataFrame) -> bool:
+        """Whether rows fit the dataset's columns (any rows do before the first write of a new one)."""
+        return self.columns is None or set(df.columns) <= set(self.columns)
+    
+    def write(self, df: pd.DataFrame) -> None:
+        """Write prepared rows (without row_id, see accepts) as the next segment."""
+        if df.empty:
+            return
+        if self.columns is None:
+            self._set_columns(df.columns.tolist())
+        df, brands, months = _sort_for_partitions(df.reindex(columns=self.columns), self.row_start)
+        segment_dir = self.version_dir / f"segment={self.written}" if self.written else self.version_dir
+        segment_dir.mkdir(exist_ok=True)
+        self._rebase_days(df)
+        self.segments.append(_write_column_segment(df, segment_dir, self.root, self.store_cols, self.key_codes))
+        self.partitions += _write_partition_files(df, brands, months, segment_dir, self.root,
+                                                  self.store_cols, self.text_cols)
+        
+        for brand, df_brand in df.groupby(brands, sort=False):
+            index = build_search_index(df_brand)
+            index.update(build_sort_orders(df_brand))
+            sketches = build_sketches(df_brand)
+            themes = build_theme_matrix(df_brand)
+            geo = build_geo_rollup(df_brand)
+            previous = self.indexes.get(brand or None)
+            if previous is not None:
+                with np.load(self.root / previous['path']) as data:
+                    index = merge_search_index({name: data[name] for name in data.files}, index)
+                with open(self.root / previous['sketches'], 'rb') as f:
+                    sketches = merge_sketches(pickle.load(f), sketches)
+                with np.load(self.root / previous['themes']) as data:
+                    themes = merge_theme_matrix({name: data[name] for name in data.files}, themes)
+                with np.load(self.root / previous['geo']) as data:
+                    geo = merge_geo_rollup({name: data[name] for name in data.files}, geo)
+            self.indexes[brand or None] = _write_brand_artifacts(brand, index, sketches, themes, geo,
+                                                                 self.version_dir, self.root)
+            if (brand or None) not in self.brands:
+                self.brands.append(brand or None)
+        
+        self.row_start += len(df)
+        self.written += 1
+    
+    def _rebase_days(self, df: pd.DataFrame) -> None:
+        """Move the day origin back to the first day of df, recoding the segments written so far."""
+        spec = self.key_codes.get('day')
+        if spec is None or 'Date' not in df.columns or not df['Date'].notna().any():
+            return
+        first_day = df['Date'].min().normalize()
+        shift = (pd.Timestamp(spec['origin']) - first_day) // pd.Timedelta(days=1)
+        if shift <= 0:
+            return
+        # Only this version's own segments can need it: ingest_appends rejects
+        # rows dated before the origin of the dataset they are appended to
+        for segment in self.segments:
+            if 'day' in segment['codes']:
+                path = self.root / segment['codes']['day']
+                codes = np.load(path)
+                np.save(path, np.where(codes >= 0, codes + shift, codes).astype(np.int32))
+        spec['origin'] = first_day.isoformat()
+        spec['days'] += shift
+    
+    def finish(self, ingest_report: Optional[List[Dict[str, Any]]] = None,
+               mention_keys: Optional[np.ndarray] = None,
+               sources: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Write the mention keys and publish the manifest of everything written.
+        
+        Args:
+            ingest_report: Per-source row/duplicate counts (the base's if None)
+            mention_keys: Sorted mention keys of all rows (for deduplicating appends)
+            sources: Source file states from source_states (for recognizing appends)
+            
+        Returns:
+            The new manifest. An append's 'delta' entry names the previous
+            version, the first new row_id and the brands that received rows;
+            a new dataset records its 'build_segments'.
+        """
+        base = self.base or {}
+        if self.columns is None:
+            self._set_columns(normalize_source_frame(pd.DataFrame(), None).columns.tolist())
+        keys_path = None
+        if mention_keys is not None:
+            keys_path = self.version_dir / "mention_keys.npy"
+            np.save(keys_path, np.asarray(mention_keys, dtype=np.uint64))
+        
+        manifest = {
+            **base,
+            'version': self.version,
+            'built_at': datetime.now().isoformat(timespec='seconds'),
+            'columns': self.columns + ['row_id'] if self.segments else self.columns,
+            'partitions': self.partitions,
+            'indexes': list(self.indexes.values()),
+            'segments': self.segments,
+            'column_store': self.store_cols,
+            'key_codes': self.key_codes,
+            'text_columns': self.text_cols,
+            'ingest_report': ingest_report if ingest_report is not None else base.get('ingest_report', []),
+            'mention_keys': str(keys_path.relative_to(self.root)) if keys_path is not None else base.get('mention_keys'),
+            'sources': sources or [],
+        }
+        if self.base is not None:
+            manifest['delta'] = {'base_version': self.base['version'], 'row_start': self.base_rows,
+                                 'brands': self.brands}
+        else:
+            manifest['build_segments'] = len(self.segments)
+        _publish_manifest(manifest, self.root)
+        return manifest
+
+
+def write_partitions(df: pd.DataFrame, version: str, partition_dir: str = PARTITION_DIR,
+                     ingest_report: Optional[List[Dict[str, Any]]] = None,
+                     mention_keys: Optional[np.ndarray] = None,
+                     sources: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Persist a prepared DataFrame as brand/month Parquet partitions.
+    
+    Rows are sorted by brand then Date and numbered with a stable row_id, so
+    every partition (and every brand) covers a contiguous row_id range and a
+    date range within a brand is a contiguous run of row_ids. Files are written
+    under a directory named after the dataset version and the manifest is
+    swapped in atomically, so readers never see a half-written set.
+    
+    Args:
+        df: Prepared DataFrame (output of prepare_data)
+        version: Dataset version the partitions belong to
+        partition_dir: Root directory for partitions and the manifest
+        ingest_report: Per-source row/duplicate counts from load_data
+        mention_keys: Sorted mention keys of the rows (for deduplicating appends)
+        sources: Source file states from source_states (for recognizing appends)
+        
+    Returns:
+        The new manifest
+    """
+    writer = PartitionWriter(version, partition_dir, columns=df.columns.tolist())
+    writer.write(df)
+    return writer.finish(ingest_report or [], mention_keys, sources)
+
+
+def stream_partitions(sources: List[Dict[str, Any]], version: str,
+                      partition_dir: str = PARTITION_DIR) -> Dict[str, Any]:
+    """
+    Build a dataset version from the sources without holding all their rows.
+    
+    Chunks from iter_source_chunks are buffered up to BUILD_SEGMENT_ROWS rows,
+    then prepared and written as one segment by a PartitionWriter. The build
+    starts over when a source fails after some of its rows were written (it
+    is then reported as failed without being read again), or when a segment
+    has columns the earlier ones lack (with the combined columns from the start).
+    
+    Args:
+        sources: List of source configurations (see DATA_SOURCES)
+        version: Dataset version the partitions belong to
+        partition_dir: Root directory for partitions and the manifest
+        
+    Returns:
+        The new manifest
+    """
+    failed: Dict[int, str] = {}
+    columns: Optional[List[str]] = None
+    while True:
+        state: Dict[str, Any] = {}
+        writer = PartitionWriter(version, partition_dir, columns=columns)
+        pending: List[tuple] = []
+        pending_rows = 0
+        written = set()
+        
+        def flush() -> bool:
+            """Write the buffered chunks; False if they need columns the writer lacks."""
+            nonlocal pending, pending_rows, columns
+            frames = [chunk for _, chunk in pending if not chunk.empty]
+            if frames:
+                df = pd.concat(frames, ignore_index=True)
+                source_columns = df.columns.tolist()
+                df = prepare_data(df)
+                if not writer.accepts(df):
+                    # New source columns go before the computed ones, as in a single frame
+                    computed = [col for col in df.columns if col not in source_columns]
+                    columns = [col for col in writer.columns if col not in computed]
+                    columns += [col for col in source_columns if col not in columns] + computed
+                    return False
+                writer.write(df)
+                written.update(position for position, chunk in pending if not chunk.empty)
+            pending, pending_rows = [], 0
+            return True
+        
+        restart = False
+        with contextlib.closing(iter_source_chunks(sources, state, failed)) as chunks:
+            for position, chunk in chunks:
+                if chunk is not None:
+                    pending.append((position, chunk))
+                    pending_rows += len(chunk)
+                    if pending_rows >= BUILD_SEGMENT_ROWS and not flush():
+                        restart = True
+                        break
+                    continue
+                error = state['ingest_report'][-1].get('error')
+                if error and position in written:
+                    failed[position] = error
+                    restart = True
+                    break
+                if error:
+                    pending = [(p, c) for p, c in pending if p != position]
+                    pending_rows = sum(len(c) for _, c in pending)
+        
+        if not restart and flush():
+            return writer.finish(state['ingest_report'], state['mention_keys'], source_states(sources))
+
+
+def source_states(sources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Size, mtime and tail checksum of each source file, used to recognize appends.
+    
+    Returns:
+        One dict per source (size/mtime_ns/tail_sha1 are None for missing files)
+    """
+    states = []
+    for source in sources:
+        state = {'path': source['path'], 'type': source['type'], 'brand': source.get('brand'),
+                 'size': None, 'mtime_ns': None, 'tail_sha1': None}
+        try:
+            stat = os.stat(source['path'])
+            state.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+                         tail_sha1=_tail_sha1(source['path'], stat.st_size))
+        except OSError:
+            pass
+        states.append(state)
+    return states
+
+
+def _tail_sha1(path: str, end: int) -> str:
+    """SHA-1 of the SOURCE_TAIL_BYTES bytes of a file that precede offset end."""
+    with open(path, 'rb') as f:
+        f.seek(max(0, end - SOURCE_TAIL_BYTES))
+        chunk = f.read(min(end, SOURCE_TAIL_BYTES))
+    return hashlib.sha1(chunk).hexdigest() if chunk.endswith(b'\n') else ''
+
+
+def detect_appends(manifest: Dict[str, Any], sources: List[Dict[str, Any]]) -> Optional[Dict[str, int]]:
+    """
+    Find sources that only had rows appended since the manifest was built.
+    
+    A source counts as appended when it is an uncompressed CSV or JSON Lines
+    file that grew, and the bytes just before its previous end (which was a
+    line end) are unchanged. A configured file that was missing then and is
+    still missing counts as unchanged. Any other change (edited, shrunk,
+    created or deleted files, changes to a file that failed to load, other
+    source types or added/removed sources) needs a full rebuild, as does a
+    dataset that already has APPEND_MAX_SEGMENTS appended segments.
+    
+    Returns:
+        {path: previous size} of the appended sources, or None for a full rebuild
+    """
+    previous = manifest.get('sources') or []
+    appended_segments = len(manifest.get('segments', [])) - manifest.get('build_segments', 1)
+    if len(previous) != len(sources) or appended_segments >= APPEND_MAX_SEGMENTS:
+        return None
+    failed = {entry['path'] for entry in manifest.get('ingest_report', []) if entry.get('error')}
+    
+    appended = {}
+    for source, state in zip(sources, previous):
+        if (source['path'], source['type'], source.get('brand')) != (state['path'], state['type'], state['brand']):
+            return None
+        try:
+            stat = os.stat(source['path'])
+        except OSError:
+            if state['size'] is None:
+                continue
+            return None
+        if stat.st_size == state['size'] and stat.st_mtime_ns == state['mtime_ns']:
+            continue
+        if source['type'] not in APPENDABLE_SOURCE_TYPES or source_compression(source) is not None:
+            return None
+        if source['path'] in failed:
+            # Its earlier rows were never ingested
+            return None
+        if not state['size'] or stat.st_size <= state['size']:
+            return None
+        if not state['tail_sha1'] or _tail_sha1(source['path'], state['size']) != state['tail_sha1']:
+            return None
+        appended[source['path']] = state['size']
+    return appended or None
+
+
+def read_appended_rows(path: str, offset: int, source_type: str = 'csv') -> pd.DataFrame:
+    """Parse the rows written after byte offset (CSV rows with the file's header line, or JSON Lines)."""
+    with open(path, 'rb') as f:
+        header = f.readline() if source_type == 'csv' else b''
+        f.seek(offset)
+        tail = f.read()
+    if source_type == 'jsonl':
+        return pd.read_json(io.BytesIO(tail), lines=True, dtype=False, convert_dates=False)
+    return pd.read_csv(io.BytesIO(header + tail), dtype=source_read_dtypes())
+
+
+def append_partitions(manifest: Dict[str, Any], delta: pd.DataFrame, version: str,
+                      partition_dir: str = PARTITION_DIR,
+                      ingest_report: Optional[List[Dict[str, Any]]] = None,
+                      mention_keys: Optional[np.ndarray] = None,
+                      sources: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Add newly arrived prepared rows to the partitions without rewriting existing files.
+    
+    The rows get row_ids after every existing row and are written under the
+    new version directory as one more segment: their own brand/month files,
+    column store and key code arrays. The new manifest keeps referencing the
+    files of earlier versions. Only the brands with new rows get a new search
+    index, sketches, theme matrix and geo rollup, merged from their previous ones.
+    
+    Args:
+        manifest: Current manifest
+        delta: New prepared rows with the manifest's columns (no row_id)
+        version: Dataset version after the append
+        partition_dir: Root directory for partitions and the manifest
+        ingest_report: Updated per-source row/duplicate counts
+        mention_keys: Sorted mention keys including the new rows
+        sources: Source file states after the append
+        
+    Returns:
+        The new manifest; its 'delta' entry names the previous version, the
+        first new row_id and the brands that received rows
+    """
+    writer = PartitionWriter(version, partition_dir, base=manifest)
+    writer.write(delta)
+    return writer.finish(ingest_report, mention_keys, sources)
+
+
+def ingest_appends(manifest: Dict[str, Any], sources: List[Dict[str, Any]], appended: Dict[str, int],
+                   version: str, partition_dir: str = PARTITION_DIR) -> Optional[Dict[str, Any]]:
+    """
+    Ingest only the rows appended to the given sources (see detect_appends).
+    
+    New rows go through the same normalization, deduplication (against the
+    persisted mention keys) and preparation as a full load.
+    
+    Returns:
+        The new manifest, or None if the new rows do not fit the current
+        layout (new columns, dates before the first day) and a full rebuild is needed
+    """
+    root = Path(partition_dir)
+    seen = np.load(root / manifest['mention_keys']) if manifest.get('mention_keys') else np.array([], dtype=np.uint64)
+    report = {entry['path']: dict(entry) for entry in manifest['ingest_report']}
+    
+    frames = []
+    for source in sources:
+        offset = appended.get(source['path'])
+        if offset is None:
+            continue
+        df = normalize_source_frame(read_appended_rows(source['path'], offset, source['type']), source.get('brand'))
+        duplicates = 0
+        if DEDUPLICATE_MENTIONS:
+            df, seen, duplicates = drop_duplicate_mentions(df, seen)
+        entry = report.setdefault(source['path'], {'path': source['path'], 'rows': 0, 'duplicates': 0})
+        entry['rows'] += int(len(df))
+        entry['duplicates'] += duplicates
+        frames.append(df)
+    
+    delta = prepare_data(pd.concat(frames, ignore_index=True))
+    columns = [col for col in manifest['columns'] if col != 'row_id']
+    if not set(delta.columns) <= set(columns):
+        return None
+    if len(delta) > 0 and 'day' in manifest['key_codes'] and 'Date' in delta.columns:
+        if (delta['Date'].dropna() < pd.Timestamp(manifest['key_codes']['day']['origin'])).any():
+            return None
+    
+    return append_partitions(manifest, delta.reindex(columns=columns), version, partition_dir,
+                             list(report.values()), seen, source_states(sources))
+
+
+@st.cache_resource
+def _verified_versions() -> set:
+    """Dataset versions whose partition files were found complete by this process."""
+    return set()
+
+
+def partitions_complete(manifest: Dict[str, Any], partition_dir: str = PARTITION_DIR) -> bool:
+    """Check that every file the manifest refers to exists (e.g. after a partial volume restore)."""
+    root = Path(partition_dir)
+    return all((root / path).is_file() for path in _manifest_paths(manifest))
+
+
+def build_partitions(sources: List[Dict[str, Any]], partition_dir: str = PARTITION_DIR) -> Dict[str, Any]:
+    """
+    Ingest sources into brand/month partitions, reusing them if sources are unchanged.
+    
+    When sources only had rows appended, just those rows are ingested (see
+    append_partitions); otherwise everything is rebuilt segment by segment
+    (see stream_partitions).
+    
+    Args:
+        sources: List of source configurations (see DATA_SOURCES)
+        partition_dir: Root directory for partitions and the manifest
+        
+    Returns:
+        Manifest describing the current partitions
+    """
+    version = _source_signature(sources)
+    
+    def _current() -> Optional[Dict[str, Any]]:
+        manifest = read_manifest(partition_dir)
+        if manifest and manifest.get('version') == version:
+            verified = _verified_versions()
+            if version in verified or partitions_complete(manifest, partition_dir):
+                verified.add(version)
+                return manifest
+        return None
+    
+    manifest = _current()
+    if manifest is not None:
+        return manifest
+    
+    with _build_lock(Path(partition_dir)):
+        # Another process may have built this version while we waited for the lock
+        manifest = _current()
+        if manifest is not None:
+            return manifest
+        
+        manifest = read_manifest(partition_dir)
+        if manifest and 'segments' in manifest and partitions_complete(manifest, partition_dir):
+            appended = detect_appends(manifest, sources)
+            if appended:
+                updated = ingest_appends(manifest, sources, appended, version, partition_dir)
+                if updated is not None:
+                    return updated
+        
+        return stream_partitions(sources, version, partition_dir)
+
+
+def select_partitions(manifest: Dict[str, Any], brand: Optional[str] = None,
+                      start_date=None, end_date=None) -> List[Dict[str, Any]]:
+    """
+    Prune the manifest to partitions that can hold rows for a brand and date range.
+    
+    Args:
+        manifest: Partition manifest
+        brand: Brand to load, or None for all brands
+        start_date, end_date: Inclusive date bounds, or None for unbounded
+        
+    Returns:
+        Manifest entries of the overlapping partitions
+    """
+    date_bounded = 'Date' in manifest['columns'] and (start_date is not None or end_date is not None)
+    start_ts = pd.Timestamp(start_date) if start_date is not None else None
+    end_ts = pd.Timestamp(end_date) if end_date is not None else None
+    
+    selected = []
+    for partition in manifest['partitions']:
+        if brand is not None and partition['brand'] != brand:
+            continue
+        if date_bounded:
+            # Undated rows never match a date filter
+            if partition['start'] is None:
+                continue
+            if end_ts is not None and pd.Timestamp(partition['start']) > end_ts:
+                continue
+            if start_ts is not None and pd.Timestamp(partition['end']) < start_ts:
+                continue
+        selected.append(partition)
+    return selected
+
+
+def load_partitions(manifest: Dict[str, Any], brand: Optional[str] = None,
+                    start_date=None, end_date=None,
+                    partition_dir: str = PARTITION_DIR) -> pd.DataFrame:
+    """
+    Load rows for a brand and date range, reading only the overlapping partitions.
+    
+    Args:
+        manifest: Partition manifest
+        brand: Brand to load, or None for all brands
+        start_date, end_date: Inclusive date bounds, or None for unbounded
+        partition_dir: Root directory for partitions and the manifest
+        
+    Returns:
+        Prepared DataFrame restricted to the brand and date range, holding the
+        analytics columns only (text columns are fetched with fetch_rows)
+    """
+    selected = select_partitions(manifest, brand, start_date, end_date)
+    if not selected:
+        return pd.DataFrame(columns=resident_columns(manifest))
+    
+    frames = []
+    for partition in selected:
+        part = read_parquet_file(Path(partition_dir) / partition['path'])
+        # Partitions are month-grained and date-sorted; trim the edges of the range
+        if 'Date' in part.columns and partition['start'] is not None:
+            lo = part['Date'].searchsorted(pd.Timestamp(start_date), side='left') if start_date is not None else 0
+            hi = part['Date'].searchsorted(pd.Timestamp(end_date), side='right') if end_date is not None else len(part)
+            part = part.iloc[lo:hi]
+        frames.append(part)
+    
+    df = pd.concat(frames, ignore_index=True)
+    if len(manifest.get('segments', [])) > 1:
+        # Appended rows sit in their own partitions; restore the brand/Date order of a full build
+        order = pd.DataFrame({
+            'brand': df['brand'].fillna('') if 'brand' in df.columns else '',
+            'Date': df['Date'] if 'Date' in df.columns else pd.NaT,
+            'row_id': df['row_id'],
+        }).sort_values(['brand', 'Date', 'row_id'], kind='stable', na_position='last').index
+        df = df.loc[order].reset_index(drop=True)
+    return attach_column_store(df, manifest, partition_dir)
+
+
+def resident_columns(manifest: Dict[str, Any]) -> List[str]:
+    """Columns held in loaded frames: everything except the lazily fetched text fields."""
+    text_cols = set(manifest.get('text_columns', []))
+    return [col for col in manifest['columns'] if col not in text_cols]
+
+
+class SegmentedColumn:
+    """
+    A column stored as one mapped array per row_id segment, indexed like one array.
+    
+    Supports what readers of the column store need: a slice of row_ids (a view
+    when it falls within one segment) and gathering an integer array of row_ids.
+    """
+    
+    def __init__(self, parts: List[np.ndarray], starts: List[int]):
+        self.parts = parts
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.dtype = parts[0].dtype
+    
+    def __len__(self) -> int:
+        return int(self.starts[-1]) + len(self.parts[-1])
+    
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            lo, hi, _ = item.indices(len(self))
+            first = int(np.searchsorted(self.starts, lo, side='right')) - 1
+            if hi <= self.starts[first] + len(self.parts[first]):
+                return self.parts[first][lo - self.starts[first]:hi - self.starts[first]]
+            item = np.arange(lo, hi)
+        
+        row_ids = np.asarray(item, dtype=np.int64)
+        segment = np.searchsorted(self.starts, row_ids, side='right') - 1
+        values = np.empty(len(row_ids), dtype=self.dtype)
+        for i in np.unique(segment):
+            mask = segment == i
+            values[mask] = self.parts[i][row_ids[mask] - self.starts[i]]
+        return values
+
+
+@st.cache_resource
+def open_column_store(partition_dir: str, version: str) -> Dict[str, Any]:
+    """Memory-map the numeric column store of a dataset version (shared by all sessions)."""
+    manifest = read_manifest(partition_dir)
+    if manifest is None or manifest['version'] != version or not manifest.get('segments'):
+        return {}
+    segments = manifest['segments']
+    store = {}
+    for col in manifest['column_store']:
+        parts = [np.load(Path(partition_dir) / segment['columns'][col], mmap_mode='r') for segment in segments]
+        store[col] = parts[0] if len(parts) == 1 else SegmentedColumn(parts, [s['row_start'] for s in segments])
+    return store
+
+
+@st.cache_resource
+def open_key_codes(partition_dir: str, version: str) -> Dict[str, Any]:
+    """Memory-map the Source/Country/day code arrays of a dataset version (-1 where a segment lacks one)."""
+    manifest = read_manifest(partition_dir)
+    if manifest is None or manifest['version'] != version or not manifest.get('segments'):
+        return {}
+    segments = manifest['segments']
+    codes = {}
+    for key in manifest.get('key_codes', {}):
+        parts = [
+            np.load(Path(partition_dir) / segment['codes'][key], mmap_mode='r') if key in segment['codes']
+            else np.full(segment['rows'], -1, dtype=np.int32)
+            for segment in segments
+        ]
+        codes[key] = parts[0] if len(parts) == 1 else SegmentedColumn(parts, [s['row_start'] for s in segments])
+    return codes
+
+
+def attach_column_store(df: pd.DataFrame, manifest: Dict[str, Any],
+                        partition_dir: str = PARTITION_DIR) -> pd.DataFrame:
+    """
+    Add the memory-mapped numeric columns to rows read from the partitions.
+    
+    When the rows form one contiguous row_id range (any single-brand window)
+    the columns are read-only views of the mapped arrays; otherwise they are
+    gathered by row_id. The views are safe to hand out because copy-on-write
+    is enabled, so frames derived from them copy before any write.
+    
+    Args:
+        df: Rows with a row_id column
+        manifest: Partition manifest
+        partition_dir: Root directory for partitions and the manifest
+        
+    Returns:
+        DataFrame with columns in manifest order
+    """
+    store = open_column_store(partition_dir, manifest['version'])
+    if not store or 'row_id' not in df.columns:
+        return df
+    
+    df = df.reset_index(drop=True)
+    row_ids = df['row_id'].to_numpy(dtype=np.int64)
+    # Rows re-sorted across segments can span a contiguous range out of order
+    contiguous = len(row_ids) > 0 and bool(np.all(np.diff(row_ids) == 1))
+    
+    columns = {}
+    for col in manifest['columns']:
+        if col in store:
+            values = store[col][row_ids[0]:row_ids[-1] + 1] if contiguous else store[col][row_ids]
+            columns[col] = pd.Series(values, index=df.index, copy=False)
+        elif col in df.columns:
+            columns[col] = df[col]
+    return pd.DataFrame(columns, copy=False)
+
+
+def load_brand_window(version: str, brand: Optional[str], start_date=None, end_date=None,
+                      partition_dir: str = PARTITION_DIR) -> pd.DataFrame:
+    """Cached load_partitions keyed on dataset version, brand and date range."""
+    def _load() -> pd.DataFrame:
+        manifest = read_manifest(partition_dir)
+        if manifest is None or manifest['version'] != version:
+            return pd.DataFrame()
+        return load_partitions(manifest, brand, start_date, end_date, partition_dir)
+    
+    return get_artifact_cache().get_or_compute(
+        'data', (partition_dir, brand, start_date, end_date), version, _load
+    )
+
+
+def partition_totals(manifest: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Summarize the manifest as one row per partition.
+    
+    Returns:
+        DataFrame with brand, month, rows and the PARTITION_SUM_COLUMNS sums
+        present in the data. Used for cross-brand totals without reading rows.
+    """
+    sum_cols = [col for col in PARTITION_SUM_COLUMNS if col in manifest['columns']]
+    records = [
+        {'brand': p['brand'], 'month': p['month'], 'rows': p['rows'],
+         **{col: p['sums'].get(col, 0.0) for col in sum_cols}}
+        for p in manifest['partitions']
+    ]
+    return pd.DataFrame(records, columns=['brand', 'month', 'rows'] + sum_cols)
+
+
+# ============================================================================
+# ARTIFACT CACHE
+# ============================================================================
+
+_MISSING = object()
+
+
+def estimate_nbytes(value: Any) -> int:
+    """
+    Estimate the resident size of a cached value in bytes.
+    
+    DataFrames and arrays report their buffers (deep, so object columns count
+    their Python strings); containers are walked recursively; anything else
+    falls back to its pickled length.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (str, bytes, int, float, bool, type(None))):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_nbytes(k) + estimate_nbytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_nbytes(v) for v in value)
+    if hasattr(value, 'to_plotly_json'):
+        return len(value.to_json())
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+# Artifact kinds also persisted by DiskCache: small, costly to recompute, and
+# made of plain data (no app classes, so they unpickle in any process)
+DISK_CACHE_KINDS = {'metrics', 'aggregates'}
+
+# Revision of the code that computes the persisted kinds and of their value
+# layout. Bump it whenever compute_metrics, the aggregates or their shapes
+# change, so entries written by older code under the same dataset version
+# are never read back
+DISK_CACHE_REVISION = 1
+
+
+class DiskCache:
+    """
+    Versioned on-disk store for derived artifacts, surviving server restarts.
+    
+    Entries live under <root>/<version>/cache/r<revision>/<kind>/, so they
+    are removed together with the partitions of their dataset version and
+    ignored once DISK_CACHE_REVISION changes. Each file is a
+    magic line, the SHA-256 of the payload and the pickled (key, value);
+    files are written to a temporary name and renamed into place, and an entry
+    whose checksum or key does not match is deleted and treated as a miss.
+    """
+    
+    MAGIC = b"BRANDCACHE1\n"
+    
+    def __init__(self, root: str, kinds: set, revision: int = DISK_CACHE_REVISION):
+        self.root = Path(root)
+        self.kinds = kinds
+        self.revision = revision
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.corrupt = 0
+    
+    def _path(self, kind: str, key: Hashable, version: str) -> Path:
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return self.root / version / "cache" / f"r{self.revision}" / kind / f"{digest}.pkl"
+    
+    def get(self, kind: str, key: Hashable, version: str, default: Any = None) -> Any:
+        """Load an entry, or return default if it is missing or fails its integrity check."""
+        path = self._path(kind, key, version)
+        try:
+            with open(path, 'rb') as f:
+                blob = f.read()
+        except OSError:
+            self.misses += 1
+            return default
+        
+        header_len = len(self.MAGIC) + 65
+        checksum = blob[len(self.MAGIC):header_len - 1].decode('ascii', errors='replace')
+        payload = blob[header_len:]
+        try:
+            if not blob.startswith(self.MAGIC) or hashlib.sha256(payload).hexdigest() != checksum:
+                raise ValueError("checksum mismatch")
+            stored_key, value = pickle.loads(payload)
+            if stored_key != repr(key):
+                raise ValueError("key mismatch")
+        except Exception:
+            self.corrupt += 1
+            self.misses += 1
+            path.unlink(missing_ok=True)
+            return default
+        self.hits += 1
+        return value
+    
+    def put(self, kind: str, key: Hashable, version: str, value: Any) -> None:
+        """Write an entry atomically; failures only cost the persistence."""
+        path = self._path(kind, key, version)
+        if not path.parents[3].is_dir():
+            # Dataset version was rebuilt away meanwhile
+            return
+        try:
+            payload = pickle.dumps((repr(key), value), protocol=pickle.HIGHEST_PROTOCOL)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, 'wb') as f:
+                f.write(self.MAGIC + hashlib.sha256(payload).hexdigest().encode('ascii') + b"\n" + payload)
+            os.replace(tmp_path, path)
+            self.writes += 1
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            pass
+    
+    def stats(self) -> Dict[str, int]:
+        """Disk hits, misses, writes and entries dropped by the integrity check."""
+        return {'hits': self.hits, 'misses': self.misses, 'writes': self.writes, 'corrupt': self.corrupt}
+
+
+class ArtifactCache:
+    """
+    Size-aware LRU cache shared by every kind of derived artifact.
+    
+    Entries are keyed by (kind, version, key). When the total estimated size
+    exceeds the byte budget, least recently used entries are evicted regardless
+    of kind. Cached values are shared between sessions and must not be mutated.
+    Kinds handled by the optional DiskCache are looked up on disk before being
+    computed, and written there after.
+    """
+    
+    def __init__(self, budget_bytes: int, disk: Optional[DiskCache] = None):
+        self.budget_bytes = budget_bytes
+        self.disk = disk
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, kind: str, key: Hashable, version: str, default: Any = None) -> Any:
+        """Return a cached value and mark it most recently used."""
+        cache_key = (kind, version, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, kind: str, key: Hashable, version: str, value: Any) -> None:
+        """Store a value, evicting least recently used entries to stay in budget."""
+        nbytes = estimate_nbytes(value)
+        if nbytes > self.budget_bytes:
+            # Would evict everything else and still not fit
+            return
+        cache_key = (kind, version, key)
+        with self._lock:
+            previous = self._entries.pop(cache_key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+            self._entries[cache_key] = (value, nbytes)
+            self.current_bytes += nbytes
+            while self.current_bytes > self.budget_bytes and self._entries:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_bytes
+                self.evictions += 1
+    
+    def get_or_compute(self, kind: str, key: Hashable, version: str, compute: Callable[[], Any]) -> Any:
+        """Return the cached value, computing and storing it on a miss."""
+        value = self.get(kind, key, version, _MISSING)
+        if value is _MISSING:
+            persisted = self.disk is not None and kind in self.disk.kinds
+            if persisted:
+                value = self.disk.get(kind, key, version, _MISSING)
+            if value is _MISSING:
+                value = compute()
+                if persisted:
+                    self.disk.put(kind, key, version, value)
+            self.put(kind, key, version, value)
+        return value
+    
+    def contains(self, kind: str, key: Hashable, version: str) -> bool:
+        """Whether a value is cached in memory, without counting a lookup."""
+        with self._lock:
+            return (kind, version, key) in self._entries
+    
+    def keys(self, version: str) -> List[tuple]:
+        """(kind, key) of every entry cached for a dataset version."""
+        with self._lock:
+            return [(kind, key) for kind, entry_version, key in self._entries if entry_version == version]
+    
+    def carry_over(self, old_version: str, new_version: str, keep: Callable[[str, Hashable], bool]) -> int:
+        """
+        Retag entries of one dataset version as another, for entries that did not change.
+        
+        Args:
+            old_version: Version the entries were computed for
+            new_version: Version to retag them as (disk kinds are also persisted there)
+            keep: Called with (kind, key); entries it rejects are left under old_version
+            
+        Returns:
+            Number of entries carried over
+        """
+        with self._lock:
+            moved = [
+                cache_key for cache_key in self._entries
+                if cache_key[1] == old_version and keep(cache_key[0], cache_key[2])
+            ]
+            values = []
+            for kind, _, key in moved:
+                entry = self._entries.pop((kind, old_version, key))
+                self._entries[(kind, new_version, key)] = entry
+                values.append((kind, key, entry[0]))
+        if self.disk is not None:
+            for kind, key, value in values:
+                if kind in self.disk.kinds:
+                    self.disk.put(kind, key, new_version, value)
+        return len(moved)
+    
+    def invalidate(self, version: Optional[str] = None, keep_version: Optional[str] = None,
+                   kind: Optional[str] = None) -> int:
+        """
+        Drop entries by dataset version and/or kind.
+        
+        Args:
+            version: Drop entries of this version
+            keep_version: Drop entries of every version except this one
+            kind: Restrict the drop to one kind of artifact
+            
+        Returns:
+            Number of entries dropped
+        """
+        with self._lock:
+            stale = [
+                cache_key for cache_key in self._entries
+                if (kind is None or cache_key[0] == kind)
+                and (version is None or cache_key[1] == version)
+                and (keep_version is None or cache_key[1] != keep_version)
+            ]
+            for cache_key in stale:
+                self.current_bytes -= self._entries.pop(cache_key)[1]
+            return len(stale)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Current bytes, entries, hit rate and evictions, overall and per kind."""
+        with self._lock:
+            by_kind: Dict[str, Dict[str, int]] = {}
+            for (kind, _, _), (_, nbytes) in self._entries.items():
+                kind_stats = by_kind.setdefault(kind, {'entries': 0, 'bytes': 0})
+                kind_stats['entries'] += 1
+                kind_stats['bytes'] += nbytes
+            lookups = self.hits + self.misses
+            return {
+                'budget_bytes': self.budget_bytes,
+                'current_bytes': self.current_bytes,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups) if lookups > 0 else 0.0,
+                'evictions': self.evictions,
+                'by_kind': by_kind,
+                'disk': self.disk.stats() if self.disk is not None else None,
+            }
+
+
+@st.cache_resource
+def get_artifact_cache() -> ArtifactCache:
+    """Process-wide artifact cache shared by all sessions."""
+    disk = DiskCache(PARTITION_DIR, DISK_CACHE_KINDS) if DISK_CACHE else None
+    return ArtifactCache(CACHE_BUDGET_MB * 1024 * 1024, disk)
+
+
+# Position of the brand in the keys of cache kinds computed from one brand's rows
+# only. Kinds that also use cross-brand totals (metrics, approximate: share of
+# voice, health score) change with any brand's appends and are never carried over
+BRAND_KEYED_KINDS = {'data': 1, 'aggregates': 1, 'search': 0, 'explorer': 0, 'sketch_summary': 0,
+                     'cooccurrence': 0, 'geo_hierarchy': 0}
+# Cache kinds keyed by (partition_dir, file path) of the file they were read from
+FILE_KEYED_KINDS = {'index', 'sketch', 'themes', 'geo', 'rows', 'text'}
+
+
+def refresh_artifact_cache(manifest: Dict[str, Any], partition_dir: str = PARTITION_DIR) -> None:
+    """
+    Bring the artifact cache up to the manifest's dataset version.
+    
+    After an append (see append_partitions), entries of the previous version
+    are kept where the new rows cannot change them: windows of brands without
+    new rows and files that are still referenced. Cached aggregates of the
+    brands with new rows (and of all brands) are updated in place by adding
+    an aggregate over the new rows only. Metrics are recomputed, since
+    share-of-voice depends on every brand. Everything else is dropped.
+    """
+    cache = get_artifact_cache()
+    version = manifest['version']
+    delta = manifest.get('delta')
+    if delta is not None and delta['base_version'] != version:
+        affected = set(delta['brands'])
+        referenced = set(_manifest_paths(manifest))
+        
+        def _unchanged(kind: str, key: Hashable) -> bool:
+            if kind in BRAND_KEYED_KINDS:
+                brand = key[BRAND_KEYED_KINDS[kind]]
+                return brand is not None and brand not in affected
+            return kind in FILE_KEYED_KINDS and key[0] == partition_dir and key[1] in referenced
+        
+        cache.carry_over(delta['base_version'], version, _unchanged)
+        for kind, key in cache.keys(delta['base_version']):
+            if kind != 'aggregates':
+                continue
+            base = cache.get(kind, key, delta['base_version'])
+            agg_key, brand, start_date, end_date = key
+            new_rows = aggregate_window(manifest, [agg_key], AGGREGATE_VALUES, brand, start_date, end_date,
+                                        partition_dir, min_row_id=delta['row_start'])
+            value = add_aggregates(base, new_rows, [agg_key])
+            cache.put(kind, key, version, value)
+            if cache.disk is not None:
+                cache.disk.put(kind, key, version, value)
+    cache.invalidate(keep_version=version)
+
+
+# ============================================================================
+# MENTION SEARCH INDEX
+# ============================================================================
+
+# Text fields tokenized into the per-brand inverted index ('Title' is the
+# headline field of Meltwater sources)
+INDEXED_TEXT_COLUMNS = ['Headline', 'Title', 'Opening Text', 'Hit Sentence']
+SENTIMENT_LABELS = ['positive', 'neutral', 'negative', 'unknown']
+MENTION_TABLE_COLUMNS = ['Date', 'Headline', 'Source', 'Sentiment', 'Reach', 'Engagement', 'URL']
+MENTION_PAGE_SIZE = 25
+
+# Sort keys with a precomputed order per brand (Date order is the row order itself)
+EXPLORER_SORT_KEYS = ['Date', 'Reach', 'Engagement']
+EXPLORER_PAGE_SIZES = [25, 50, 100]
+
+_TOKEN_PATTERN = re.compile(r'\w+')
+# Missing dates sort after every real date in the index
+_UNDATED_KEY = np.iinfo(np.int64).max
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, as used by the search index."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def _date_keys(dates: pd.Series) -> np.ndarray:
+    """Datetimes as int64 nanoseconds, with missing dates mapped to _UNDATED_KEY."""
+    keys = dates.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    keys[dates.isna().to_numpy()] = _UNDATED_KEY
+    return keys
+
+
+def _combined_text(df: pd.DataFrame) -> pd.Series:
+    """Concatenate the indexed text fields of each row."""
+    text = pd.Series('', index=df.index, dtype=object)
+    for col in INDEXED_TEXT_COLUMNS:
+        if col in df.columns:
+            text = text + ' ' + df[col].fillna('').astype(str)
+    return text
+
+
+def build_search_index(df_brand: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Build an inverted index for one brand's rows.
+    
+    The index is stored CSR-style: a sorted term array, offsets into one
+    concatenated postings array of row_ids, plus per-row date keys and
+    sentiment codes so brand/date/sentiment filters apply without reading rows.
+    
+    Args:
+        df_brand: One brand's rows, sorted by Date, with a row_id column
+        
+    Returns:
+        Dictionary of NumPy arrays (terms, offsets, postings, row_ids, dates, sentiment)
+    """
+    row_ids = df_brand['row_id'].to_numpy(dtype=np.int64)
+    
+    tokens = _combined_text(df_brand).str.lower().str.findall(_TOKEN_PATTERN)
+    postings = (
+        pd.DataFrame({'term': tokens.to_numpy(), 'row_id': row_ids})
+        .explode('term')
+        .dropna()
+        .drop_duplicates()
+        .sort_values(['term', 'row_id'], kind='stable')
+    )
+    terms, counts = np.unique(postings['term'].to_numpy(dtype=str), return_counts=True)
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    
+    if 'Date' in df_brand.columns:
+        dates = _date_keys(df_brand['Date'])
+    else:
+        dates = np.full(len(df_brand), _UNDATED_KEY, dtype=np.int64)
+    
+    if 'Sentiment' in df_brand.columns:
+        sentiment_codes = {label: code for code, label in enumerate(SENTIMENT_LABELS)}
+        sentiment = (
+            df_brand['Sentiment'].astype(str).str.lower()
+            .map(sentiment_codes).fillna(SENTIMENT_LABELS.index('unknown'))
+            .to_numpy(dtype=np.int8)
+        )
+    else:
+        sentiment = np.full(len(df_brand), SENTIMENT_LABELS.index('unknown'), dtype=np.int8)
+    
+    return {
+        'terms': terms if len(terms) else np.array([], dtype='<U1'),
+        'offsets': offsets,
+        'postings': postings['row_id'].to_numpy(dtype=np.int64),
+        'row_ids': row_ids,
+        'dates': dates,
+        'sentiment': sentiment,
+    }
+
+
+def build_sort_orders(df_brand: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Precompute ascending sort orders for the numeric explorer sort keys.
+    
+    Returns:
+        For each key present, 'order_<key>' holding row positions (within the
+        brand's date-sorted rows) ordered by that key, and '<key>' the values
+    """
+    orders = {}
+    for key in EXPLORER_SORT_KEYS:
+        if key == 'Date' or key not in df_brand.columns:
+            continue
+        values = pd.to_numeric(df_brand[key], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+        orders[key] = values
+        orders[f'order_{key}'] = np.argsort(values, kind='stable').astype(np.int64)
+    return orders
+
+
+def merge_search_index(base: Dict[str, np.ndarray], delta: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Merge the index of a brand's newly appended rows into its existing index.
+    
+    New rows have larger row_ids, so each term's postings stay sorted when the
+    delta postings follow the base ones. Rows are re-sorted by date, which
+    leaves row_ids out of order: 'id_order' / 'id_sorted' map row_ids back to
+    positions (see _row_positions).
+    
+    Returns:
+        Index with the same arrays as build_search_index + build_sort_orders
+    """
+    def _term_column(index: Dict[str, np.ndarray]) -> np.ndarray:
+        return np.repeat(index['terms'], np.diff(index['offsets']))
+    
+    all_terms = np.concatenate([_term_column(base), _term_column(delta)])
+    all_postings = np.concatenate([base['postings'], delta['postings']])
+    order = np.argsort(all_terms, kind='stable')
+    terms, counts = np.unique(all_terms[order], return_counts=True)
+    
+    row_ids = np.concatenate([base['row_ids'], delta['row_ids']])
+    dates = np.concatenate([base['dates'], delta['dates']])
+    rows = np.lexsort((row_ids, dates))
+    merged = {
+        'terms': terms if len(terms) else np.array([], dtype='<U1'),
+        'offsets': np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+        'postings': all_postings[order],
+        'row_ids': row_ids[rows],
+        'dates': dates[rows],
+        'sentiment': np.concatenate([base['sentiment'], delta['sentiment']])[rows],
+    }
+    for key in EXPLORER_SORT_KEYS:
+        if key in base and key in delta:
+            values = np.concatenate([base[key], delta[key]])[rows]
+            merged[key] = values
+            merged[f'order_{key}'] = np.argsort(values, kind='stable').astype(np.int64)
+    merged['id_order'] = np.argsort(merged['row_ids'], kind='stable').astype(np.int64)
+    merged['id_sorted'] = merged['row_ids'][merged['id_order']]
+    return merged
+
+
+def _row_positions(index: Dict[str, np.ndarray], row_ids: np.ndarray) -> np.ndarray:
+    """Positions in the index's date-sorted rows of row_ids that it contains."""
+    if 'id_order' in index:
+        return index['id_order'][np.searchsorted(index['id_sorted'], row_ids)]
+    return np.searchsorted(index['row_ids'], row_ids)
+
+
+def write_search_index(index: Dict[str, np.ndarray], path: Path) -> None:
+    """Persist a search index as an uncompressed .npz (fast to load, no pickling)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(path, **index)
+
+
+def load_search_index(manifest: Dict[str, Any], entry: Dict[str, Any],
+                      partition_dir: str = PARTITION_DIR) -> Dict[str, np.ndarray]:
+    """Load one brand's search index through the artifact cache."""
+    def _load() -> Dict[str, np.ndarray]:
+        with np.load(Path(partition_dir) / entry['path']) as data:
+            return {name: data[name] for name in data.files}
+    
+    return get_artifact_cache().get_or_compute(
+        'index', (partition_dir, entry['path']), manifest['version'], _load
+    )
+
+
+def parse_query(query: str) -> Dict[str, Any]:
+    """
+    Split a search query into required terms and quoted phrases.
+    
+    Example: 'earnings "market impact"' -> terms ['earnings', 'market', 'impact'],
+    phrases [['market', 'impact']]
+    """
+    phrases = [tokenize(phrase) for phrase in re.findall(r'"([^"]*)"', query)]
+    phrases = [phrase for phrase in phrases if len(phrase) > 1]
+    terms = sorted(set(tokenize(query.replace('"', ' '))))
+    return {'terms': terms, 'phrases': phrases}
+
+
+def _postings(index: Dict[str, np.ndarray], term: str) -> np.ndarray:
+    """Sorted row_ids containing a term (empty if the term is unknown)."""
+    terms = index['terms']
+    pos = int(np.searchsorted(terms, term))
+    if pos >= len(terms) or terms[pos] != term:
+        return np.array([], dtype=np.int64)
+    return index['postings'][index['offsets'][pos]:index['offsets'][pos + 1]]
+
+
+def _date_key_bounds(manifest: Dict[str, Any], start_date, end_date) -> tuple:
+    """Index date keys for the date bounds (None when unbounded or the data has no Date)."""
+    if 'Date' not in manifest['columns']:
+        return None, None
+    start_key = pd.Timestamp(start_date).value if start_date is not None else None
+    end_key = pd.Timestamp(end_date).value if end_date is not None else None
+    return start_key, end_key
+
+
+def _matches_phrases(text: str, phrases: List[List[str]]) -> bool:
+    """Check that every phrase occurs as consecutive tokens in the text."""
+    tokens = ' ' + ' '.join(tokenize(text)) + ' '
+    return all(f" {' '.join(phrase)} " in tokens for phrase in phrases)
+
+
+def search_mentions(manifest: Dict[str, Any], query: str, brand: Optional[str] = None,
+                    start_date=None, end_date=None, sentiments: Optional[List[str]] = None,
+                    partition_dir: str = PARTITION_DIR) -> np.ndarray:
+    """
+    Find mentions matching a query within the brand/date/sentiment filters.
+    
+    Postings lists are intersected shortest-first, then restricted by the
+    per-row date and sentiment arrays stored in the index. Quoted phrases are
+    verified against the text of the remaining candidates only.
+    
+    Args:
+        manifest: Partition manifest
+        query: Search terms; "quoted text" must match as a phrase
+        brand: Brand to search, or None for all brands
+        start_date, end_date: Inclusive date bounds, or None for unbounded
+        sentiments: Sentiment labels to keep, or None/empty for all
+        partition_dir: Root directory for partitions and the manifest
+        
+    Returns:
+        Matching row_ids, newest first
+    """
+    parsed = parse_query(query)
+    if not parsed['terms']:
+        return np.array([], dtype=np.int64)
+    
+    start_key, end_key = _date_key_bounds(manifest, start_date, end_date)
+    sentiment_codes = [SENTIMENT_LABELS.index(s) for s in (sentiments or []) if s in SENTIMENT_LABELS]
+    
+    matched_ids, matched_dates = [], []
+    for entry in manifest.get('indexes', []):
+        if brand is not None and entry['brand'] != brand:
+            continue
+        index = load_search_index(manifest, entry, partition_dir)
+        
+        postings = sorted((_postings(index, term) for term in parsed['terms']), key=len)
+        candidates = postings[0]
+        for plist in postings[1:]:
+            if len(candidates) == 0:
+                break
+            candidates = np.intersect1d(candidates, plist, assume_unique=True)
+        if len(candidates) == 0:
+            continue
+        
+        pos = _row_positions(index, candidates)
+        dates = index['dates'][pos]
+        mask = np.ones(len(candidates), dtype=bool)
+        if start_key is not None:
+            mask &= dates >= start_key
+        if end_key is not None:
+            mask &= dates <= end_key
+        if sentiment_codes:
+            mask &= np.isin(index['sentiment'][pos], sentiment_codes)
+        matched_ids.append(candidates[mask])
+        matched_dates.append(dates[mask])
+    
+    if not matched_ids:
+        return np.array([], dtype=np.int64)
+    row_ids = np.concatenate(matched_ids)
+    dates = np.concatenate(matched_dates)
+    
+    if parsed['phrases'] and len(row_ids) > 0:
+        text_cols = [col for col in INDEXED_TEXT_COLUMNS if col in manifest['columns']]
+        texts = _combined_text(fetch_rows(manifest, row_ids, text_cols, partition_dir))
+        keep = np.array([_matches_phrases(text, parsed['phrases']) for text in texts], dtype=bool)
+        row_ids, dates = row_ids[keep], dates[keep]
+    
+    # Newest first; undated rows last
+    order = np.lexsort((row_ids, np.where(dates == _UNDATED_KEY, np.iinfo(np.int64).min, dates)))[::-1]
+    return row_ids[order]
+
+
+def explore_mentions(manifest: Dict[str, Any], brand: Optional[str] = None,
+                     start_date=None, end_date=None, sort_key: str = 'Date',
+                     descending: bool = True, partition_dir: str = PARTITION_DIR) -> np.ndarray:
+    """
+    Order every mention in the brand/date window by a sort key.
+    
+    Rows are date-sorted within a brand, so the date window is a contiguous
+    position range found by binary search. Date order is that range itself;
+    Reach/Engagement reuse the precomputed order, masked to the range. Only
+    multi-brand windows need a fresh argsort.
+    
+    Args:
+        manifest: Partition manifest
+        brand: Brand to explore, or None for all brands
+        start_date, end_date: Inclusive date bounds, or None for unbounded
+        sort_key: One of EXPLORER_SORT_KEYS
+        descending: Largest/newest first
+        partition_dir: Root directory for partitions and the manifest
+        
+    Returns:
+        Row ids of the window in display order
+    """
+    start_key, end_key = _date_key_bounds(manifest, start_date, end_date)
+    
+    ordered_ids, sort_values = [], []
+    for entry in manifest.get('indexes', []):
+        if brand is not None and entry['brand'] != brand:
+            continue
+        index = load_search_index(manifest, entry, partition_dir)
+        lo = int(np.searchsorted(index['dates'], start_key, side='left')) if start_key is not None else 0
+        hi = int(np.searchsorted(index['dates'], end_key, side='right')) if end_key is not None else len(index['dates'])
+        if hi <= lo:
+            continue
+        
+        if sort_key == 'Date' or f'order_{sort_key}' not in index:
+            positions = np.arange(lo, hi)
+            values = index['dates'][lo:hi]
+        else:
+            order = index[f'order_{sort_key}']
+            positions = order[(order >= lo) & (order < hi)]
+            values = index[sort_key][positions]
+        ordered_ids.append(index['row_ids'][positions])
+        sort_values.append(values)
+    
+    if not ordered_ids:
+        return np.array([], dtype=np.int64)
+    
+    row_ids = np.concatenate(ordered_ids)
+    if len(ordered_ids) > 1:
+        order = np.argsort(np.concatenate(sort_values), kind='stable')
+        row_ids = row_ids[order]
+    return row_ids[::-1] if descending else row_ids
+
+
+def fetch_rows(manifest: Dict[str, Any], row_ids: np.ndarray, columns: Optional[List[str]] = None,
+               partition_dir: str = PARTITION_DIR) -> pd.DataFrame:
+    """
+    Fetch rows by row_id, reading only the partitions that contain them.
+    
+    Args:
+        manifest: Partition manifest
+        row_ids: Row ids to fetch
+        columns: Columns to return (row_id is always included), or None for all
+        partition_dir: Root directory for partitions and the manifest
+        
+    Returns:
+        DataFrame with one row per requested row_id, in the requested order
+    """
+    row_ids = np.asarray(row_ids, dtype=np.int64)
+    store_cols = set(manifest.get('column_store', []))
+    text_cols = manifest.get('text_columns', [])
+    if columns is not None:
+        columns = [col for col in dict.fromkeys(columns) if col in manifest['columns'] and col != 'row_id'] + ['row_id']
+    if len(row_ids) == 0 or not manifest['partitions']:
+        return pd.DataFrame(columns=columns if columns is not None else manifest['columns'])
+    
+    partitions = sorted(manifest['partitions'], key=lambda p: p['row_start'])
+    starts = np.array([p['row_start'] for p in partitions], dtype=np.int64)
+    owners = np.searchsorted(starts, row_ids, side='right') - 1
+    
+    # Numeric columns live in the column store and text in the .text.parquet files
+    if columns is not None:
+        file_columns = [col for col in columns if col not in store_cols and col not in text_cols]
+        wanted_text = [col for col in columns if col in text_cols]
+    else:
+        file_columns, wanted_text = None, text_cols
+    
+    def _read(kind: str, path: str, read_columns: Optional[List[str]]) -> pd.DataFrame:
+        return get_artifact_cache().get_or_compute(
+            kind, (partition_dir, path, tuple(read_columns) if read_columns else None), manifest['version'],
+            lambda: read_parquet_file(Path(partition_dir) / path, columns=read_columns)
+        )
+    
+    frames = []
+    for owner in np.unique(owners):
+        partition = partitions[owner]
+        positions = row_ids[owners == owner] - partition['row_start']
+        pieces = [_read('rows', partition['path'], file_columns).iloc[positions].reset_index(drop=True)]
+        if wanted_text:
+            pieces.append(_read('text', partition['text_path'], wanted_text).iloc[positions].reset_index(drop=True))
+        frames.append(pd.concat(pieces, axis=1))
+    
+    df = pd.concat(frames, ignore_index=True)
+    df = df.set_index('row_id').loc[row_ids].reset_index()
+    
+    store = open_column_store(partition_dir, manifest['version'])
+    for col in (columns if columns is not None else manifest['columns']):
+        if col in store:
+            df[col] = store[col][row_ids]
+    if columns is not None:
+        df = df[['row_id'] + [col for col in columns if col != 'row_id' and col in df.columns]]
+    return df
+
+
+# ============================================================================
+# AGGREGATION EXECUTOR
+# ============================================================================
+
+# Group-by keys and summed columns of the per-window aggregates (see window_artifacts)
+AGGREGATE_KEYS = ['Source', 'Country', 'day']
+AGGREGATE_VALUES = ['Engagement', 'Views', 'Reach', 'sentiment_score']
+
+
+@st.cache_resource
+def get_aggregation_executor() -> AggregationExecutor:
+    """Process-wide aggregation executor; its worker pool is shared by all sessions."""
+    return AggregationExecutor(workers=AGG_WORKERS, parallel_min_rows=AGG_PARALLEL_MIN_ROWS)
+
+
+def window_row_ranges(manifest: Dict[str, Any], brand: Optional[str] = None,
+                      start_date=None, end_date=None,
+                      partition_dir: str = PARTITION_DIR) -> List[tuple]:
+    """
+    Row ranges holding a brand/date window.
+    
+    Rows are sorted by brand then Date, so each brand's part of the window is
+    one contiguous row_id range, found by binary search over the index dates.
+    Brands that received appended rows have one range per segment.
+    """
+    start_key, end_key = _date_key_bounds(manifest, start_date, end_date)
+    
+    ranges = []
+    for entry in manifest.get('indexes', []):
+        if brand is not None and entry['brand'] != brand:
+            continue
+        index = load_search_index(manifest, entry, partition_dir)
+        lo = int(np.searchsorted(index['dates'], start_key, side='left')) if start_key is not None else 0
+        hi = int(np.searchsorted(index['dates'], end_key, side='right')) if end_key is not None else len(index['dates'])
+        if hi <= lo:
+            continue
+        if 'id_order' not in index:
+            ranges.append((int(index['row_ids'][lo]), int(index['row_ids'][hi - 1]) + 1))
+            continue
+        row_ids = np.sort(index['row_ids'][lo:hi])
+        breaks = np.flatnonzero(np.diff(row_ids) != 1) + 1
+        for run in np.split(row_ids, breaks):
+            ranges.append((int(run[0]), int(run[-1]) + 1))
+    return ranges
+
+
+def aggregate_window(manifest: Dict[str, Any], keys: List[str], values: List[str],
+                     brand: Optional[str] = None, start_date=None, end_date=None,
+                     partition_dir: str = PARTITION_DIR, min_row_id: int = 0) -> pd.DataFrame:
+    """
+    Group a brand/date window by key columns, counting rows and summing values.
+    
+    Works on the column store and key code arrays only: the window's row
+    ranges are split into chunks, aggregated in worker processes when large
+    enough (see aggregation.py), and merged across segments.
+    
+    Args:
+        manifest: Partition manifest
+        keys: Columns from KEY_CODE_COLUMNS, or 'day' for calendar days
+        values: Column store columns to sum (missing columns are skipped)
+        brand: Brand to aggregate, or None for all brands
+        start_date, end_date: Inclusive date bounds, or None for unbounded
+        partition_dir: Root directory for partitions and the manifest
+        min_row_id: Only aggregate rows from this row_id on (e.g. appended rows)
+        
+    Returns:
+        DataFrame with the key columns, 'rows' and one sum column per value,
+        or an empty frame if a key column is not in the data
+    """
+    key_codes = manifest.get('key_codes', {})
+    values = [col for col in values if col in manifest.get('column_store', [])]
+    if any(key not in key_codes for key in keys):
+        return pd.DataFrame(columns=keys + ['rows'] + values)
+    
+    root = Path(partition_dir)
+    cardinalities = [
+        key_codes[key]['days'] if key == 'day' else len(key_codes[key]['categories']) for key in keys
+    ]
+    row_ranges = [
+        (max(lo, min_row_id), hi)
+        for lo, hi in window_row_ranges(manifest, brand, start_date, end_date, partition_dir) if hi > min_row_id
+    ]
+    
+    partials = []
+    for segment in manifest['segments']:
+        seg_lo, seg_hi = segment['row_start'], segment['row_start'] + segment['rows']
+        local_ranges = [
+            (max(lo, seg_lo) - seg_lo, min(hi, seg_hi) - seg_lo)
+            for lo, hi in row_ranges if lo < seg_hi and hi > seg_lo
+        ]
+        # A segment without a key's codes (e.g. no dated rows) has no rows for that key
+        if not local_ranges or any(key not in segment['codes'] for key in keys):
+            continue
+        partials.append(get_aggregation_executor().aggregate(
+            local_ranges,
+            key_paths=[str(root / segment['codes'][key]) for key in keys],
+            cardinalities=cardinalities,
+            value_paths={col: str(root / segment['columns'][col]) for col in values},
+            version=manifest['version'],
+        ))
+    codes, counts, sums = merge_partials(partials, values)
+    
+    result = {}
+    for key, key_code in zip(keys, np.unravel_index(codes, cardinalities) if keys else []):
+        if key == 'day':
+            result[key] = pd.Timestamp(key_codes[key]['origin']) + pd.to_timedelta(key_code, unit='D')
+        else:
+            result[key] = np.asarray(key_codes[key]['categories'], dtype=object)[key_code]
+    result['rows'] = counts
+    result.update(sums)
+    # Categories added by appends have later codes; order groups by value
+    aggregate = pd.DataFrame(result, columns=keys + ['rows'] + values)
+    return aggregate.sort_values(keys, ignore_index=True) if keys else aggregate
+
+
+def add_aggregates(base: pd.DataFrame, delta: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+    """Combine two aggregate_window results over disjoint rows."""
+    if delta.empty:
+        return base
+    if base.empty:
+        return delta
+    combined = pd.concat([base, delta], ignore_index=True).groupby(keys, as_index=False).sum()
+    return combined[base.columns.tolist()]
+
+
+def sum_or_count(aggregate: pd.DataFrame, column: str) -> pd.Series:
+    """Summed column of an aggregate, falling back to row counts when the column is absent."""
+    return aggregate[column] if column in aggregate.columns else aggregate['rows']
+
+
+def rollup_daily(daily: pd.DataFrame, column: Optional[str], how: str, resolution: str) -> pd.Series:
+    """
+    bucket_series over a daily aggregate from aggregate_window(keys=['day']).
+    
+    Daily sums and row counts add up exactly, so coarser buckets (and their
+    means) match aggregating the rows themselves.
+    """
+    buckets = daily['day'].dt.to_period(resolution).dt.start_time
+    grouped = daily.groupby(buckets)
+    if how == 'size':
+        return grouped['rows'].sum()
+    if how == 'mean':
+        return grouped[column].sum() / grouped['rows'].sum()
+    return grouped[column].sum()
+
+
+# ============================================================================
+# ANOMALY DETECTION
+# ============================================================================
+
+# Daily per-brand signals watched for anomalies, with their display names
+ANOMALY_METRICS = {
+    'sentiment_index': 'Sentiment Index',
+    'mentions': 'Mention Volume',
+    'engagement': 'Engagement',
+    'share_of_voice': 'Share of Voice',
+}
+ANOMALY_STATE_FILE = "anomaly_state.pkl"
+
+
+def brand_daily_rollup(manifest: Dict[str, Any], partition_dir: str = PARTITION_DIR,
+                       start_date=None) -> pd.DataFrame:
+    """
+    Daily aggregate of every brand.
+    
+    The whole history comes from the cached per-brand aggregates. With
+    start_date only the days from start_date on are aggregated (uncached),
+    reading just those days' rows.
+    
+    Returns:
+        DataFrame with brand (None for unbranded rows), day, rows and the
+        AGGREGATE_VALUES sums present
+    """
+    cache = get_artifact_cache()
+    frames = []
+    for entry in manifest.get('indexes', []):
+        brand = entry['brand']
+        if start_date is not None:
+            daily = aggregate_window(manifest, ['day'], AGGREGATE_VALUES, brand, start_date, None, partition_dir)
+        else:
+            daily = cache.get_or_compute(
+                'aggregates', ('day', brand, None, None), manifest['version'],
+                lambda brand=brand: aggregate_window(manifest, ['day'], AGGREGATE_VALUES, brand, None, None, partition_dir)
+            )
+        frames.append(daily.assign(brand=brand))
+    if not frames:
+        return pd.DataFrame(columns=['brand', 'day', 'rows'])
+    rollup = pd.concat(frames, ignore_index=True)
+    return rollup[['brand'] + [col for col in rollup.columns if col != 'brand']]
+
+
+def daily_signals(rollup: pd.DataFrame, start_date=None, brands: Optional[List[str]] = None) -> tuple:
+    """
+    Pivot a brand_daily_rollup into dense day × brand arrays of the ANOMALY_METRICS.
+    
+    Days without mentions count as zero volume/engagement; sentiment index and
+    share of voice are undefined (NaN) on days without mentions. Unbranded
+    rows only count toward the share-of-voice totals.
+    
+    Args:
+        rollup: brand_daily_rollup output
+        start_date: First day of the arrays (default: the rollup's first day)
+        brands: Brands to include even without rows in the rollup; brands
+            found in the rollup follow them
+    
+    Returns:
+        (days as DatetimeIndex, brands, {metric: float array of shape (days, brands)})
+    """
+    brands = list(brands or [])
+    if rollup.empty:
+        return pd.DatetimeIndex([]), brands, {metric: np.zeros((0, len(brands))) for metric in ANOMALY_METRICS}
+    first_day = pd.Timestamp(start_date) if start_date is not None else rollup['day'].min()
+    days = pd.date_range(first_day, rollup['day'].max(), freq='D')
+    listed = set(brands)
+    brands += [brand for brand in rollup['brand'].dropna().unique() if brand not in listed]
+    
+    def _pivot(column: str) -> pd.DataFrame:
+        table = rollup.pivot_table(index='day', columns='brand', values=column, aggfunc='sum')
+        return table.reindex(index=days, columns=brands).fillna(0)
+    
+    counts = _pivot('rows').to_numpy(dtype=np.float64)
+    day_totals = rollup.groupby('day')['rows'].sum().reindex(days, fill_value=0).to_numpy(dtype=np.float64)[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sentiment = _pivot('sentiment_score').to_numpy(dtype=np.float64) if 'sentiment_score' in rollup.columns else np.zeros_like(counts)
+        signals = {
+            'sentiment_index': np.where(counts > 0, (sentiment / counts + 1) / 2 * 100, np.nan),
+            'mentions': counts,
+            'engagement': _pivot('Engagement').to_numpy(dtype=np.float64) if 'Engagement' in rollup.columns else counts,
+            'share_of_voice': np.where(day_totals > 0, counts / day_totals * 100, np.nan),
+        }
+    return days, brands, signals
+
+
+class AnomalyDetector:
+    """
+    Incremental anomaly scoring of many daily series at once.
+    
+    Each series keeps an exponentially weighted mean and variance and a ring
+    buffer of its last ANOMALY_WINDOW_DAYS values. update() scores one day for
+    every series against that state and then folds the day in, so a new day
+    costs O(1) per series and all series update in one vectorized step:
+    - EWMA z: distance from the EWMA mean in EWMA standard deviations
+    - robust z: distance from the window median in 1.4826 × MAD (the EWMA
+      standard deviation when the MAD is 0), so earlier outliers in the
+      window do not mask new ones
+    A value is an anomaly when both |z| reach the threshold and the series has
+    ANOMALY_MIN_HISTORY values. Scales are floored at ANOMALY_MIN_RELATIVE_SCALE
+    of the series level (at least 1), so flat series do not divide by zero.
+    Missing values (NaN) are neither scored nor folded in.
+    """
+    
+    def __init__(self, halflife_days: float = 7.0, window_days: int = 28,
+                 threshold: float = 3.5, min_history: int = 7, min_relative_scale: float = 0.1):
+        self.alpha = 1 - 0.5 ** (1 / halflife_days)
+        self.window_days = window_days
+        self.threshold = threshold
+        self.min_history = min_history
+        self.min_relative_scale = min_relative_scale
+        self.series: List[tuple] = []
+        self.last_day: Optional[pd.Timestamp] = None
+        self.version: Optional[str] = None
+        self.count = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros(0)
+        self.var = np.zeros(0)
+        self.window = np.full((0, window_days), np.nan)
+        self.position = np.zeros(0, dtype=np.int64)
+    
+    def add_series(self, keys: List[tuple]) -> None:
+        """Start tracking new series with empty state."""
+        new = len(keys)
+        self.series += list(keys)
+        self.count = np.concatenate([self.count, np.zeros(new, dtype=np.int64)])
+        self.mean = np.concatenate([self.mean, np.zeros(new)])
+        self.var = np.concatenate([self.var, np.zeros(new)])
+        self.window = np.concatenate([self.window, np.full((new, self.window_days), np.nan)])
+        self.position = np.concatenate([self.position, np.zeros(new, dtype=np.int64)])
+    
+    def _floor(self, level: np.ndarray) -> np.ndarray:
+        return self.min_relative_scale * np.maximum(np.abs(np.nan_to_num(level)), 1.0)
+    
+    def update(self, values: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Score one day's values (one per series, NaN for missing) and fold them in.
+        
+        Returns:
+            {'expected', 'ewma_z', 'robust_z', 'anomaly'} arrays, one entry per series
+        """
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        
+        std = np.maximum(np.sqrt(self.var), self._floor(self.mean))
+        ewma_z = np.where(valid, (values - self.mean) / std, 0.0)
+        
+        filled = self.count > 0
+        median = np.full(len(values), np.nan)
+        mad = np.full(len(values), np.nan)
+        if filled.any():
+            window = self.window[filled]
+            median[filled] = np.nanmedian(window, axis=1)
+            mad[filled] = np.nanmedian(np.abs(window - median[filled, None]), axis=1)
+        scale = np.where(mad > 0, 1.4826 * mad, np.sqrt(self.var))
+        scale = np.maximum(np.nan_to_num(scale), self._floor(median))
+        robust_z = np.where(valid & filled, (values - np.nan_to_num(median)) / scale, 0.0)
+        
+        anomaly = (
+            valid & (self.count >= self.min_history)
+            & (np.abs(ewma_z) >= self.threshold) & (np.abs(robust_z) >= self.threshold)
+        )
+        scores = {'expected': self.mean.copy(), 'ewma_z': ewma_z, 'robust_z': robust_z, 'anomaly': anomaly}
+        
+        first = valid & ~filled
+        rest = valid & filled
+        self.mean[first] = values[first]
+        diff = values[rest] - self.mean[rest]
+        increment = self.alpha * diff
+        self.mean[rest] += increment
+        self.var[rest] = (1 - self.alpha) * (self.var[rest] + diff * increment)
+        
+        rows = np.flatnonzero(valid)
+        self.window[rows, self.position[rows]] = values[rows]
+        self.position[rows] = (self.position[rows] + 1) % self.window_days
+        self.count[rows] += 1
+        return scores
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'params': [self.alpha, self.window_days, self.threshold, self.min_history, self.min_relative_scale],
+            'series': self.series, 'last_day': self.last_day, 'version': self.version,
+            'count': self.count, 'mean': self.mean, 'var': self.var,
+            'window': self.window, 'position': self.position,
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'AnomalyDetector':
+        detector = cls()
+        detector.alpha, detector.window_days, detector.threshold, detector.min_history, detector.min_relative_scale = data['params']
+        for name in ('series', 'last_day', 'version', 'count', 'mean', 'var', 'window', 'position'):
+            setattr(detector, name, data[name])
+        return detector
+
+
+def new_anomaly_detector() -> AnomalyDetector:
+    """AnomalyDetector with the configured ANOMALY_* parameters."""
+    return AnomalyDetector(ANOMALY_HALFLIFE_DAYS, ANOMALY_WINDOW_DAYS, ANOMALY_Z_THRESHOLD,
+                           ANOMALY_MIN_HISTORY, ANOMALY_MIN_RELATIVE_SCALE)
+
+
+def _load_anomaly_state(manifest: Dict[str, Any], partition_dir: str) -> Optional[tuple]:
+    """
+    Persisted (detector, alerts) that new days can be fed to, if any.
+    
+    State of the current version is used as is. State of the version an
+    append was made to is reused when every appended row is dated after the
+    last scored day (held-back days were not scored, so rows completing them
+    keep the state); otherwise earlier days changed and scoring restarts.
+    """
+    root = Path(partition_dir)
+    delta = manifest.get('delta')
+    for version in [manifest['version']] + ([delta['base_version']] if delta else []):
+        try:
+            with open(root / version / ANOMALY_STATE_FILE, 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            continue
+        detector, alerts = AnomalyDetector.from_dict(state['detector']), state['alerts']
+        if state['detector']['params'] != new_anomaly_detector().to_dict()['params']:
+            # Thresholds changed: earlier alerts no longer apply
+            continue
+        if version == manifest['version']:
+            return detector, alerts
+        new_days = aggregate_window(manifest, ['day'], [], None, None, None, partition_dir,
+                                    min_row_id=delta['row_start'])['day']
+        if detector.last_day is not None and (new_days.empty or new_days.min() > detector.last_day):
+            return detector, alerts
+    return None
+
+
+def detect_anomalies(manifest: Dict[str, Any], partition_dir: str = PARTITION_DIR,
+                     now: Optional[pd.Timestamp] = None) -> Dict[str, Any]:
+    """
+    Score every brand × ANOMALY_METRICS daily series up to the last complete day.
+    
+    Only days after the last scored day are aggregated and fed to the
+    detector, whose state is persisted under the dataset version directory,
+    so appended days cost time proportional to their rows. The newest day of
+    the data is held back while it may still be receiving mentions (it is
+    today or later), so a partial day is neither flagged as a drop nor
+    folded into the state; it is scored once it has ended or a later day
+    arrives.
+    
+    Args:
+        manifest: Partition manifest
+        partition_dir: Root directory for partitions and the manifest
+        now: Current time, for deciding whether the newest day has ended
+    
+    Returns:
+        {'alerts': DataFrame of flagged days (day, brand, metric, value,
+        expected, ewma_z, robust_z, direction), 'series': number of series
+        monitored, 'last_day': last scored day or None}
+    """
+    state = _load_anomaly_state(manifest, partition_dir)
+    detector, alerts = state if state is not None else (new_anomaly_detector(), [])
+    
+    start = detector.last_day + timedelta(days=1) if detector.last_day is not None else None
+    days, brands, signals = daily_signals(brand_daily_rollup(manifest, partition_dir, start), start,
+                                          list(dict.fromkeys(brand for brand, _ in detector.series)))
+    metrics = list(ANOMALY_METRICS)
+    known = set(detector.series)
+    detector.add_series([(brand, metric) for brand in brands for metric in metrics if (brand, metric) not in known])
+    columns = {key: pos for pos, key in enumerate((brand, metric) for brand in brands for metric in metrics)}
+    layout = np.array([columns.get(key, -1) for key in detector.series], dtype=np.int64)
+    
+    # (days, brands × metrics), laid out brand-major
+    matrix = np.stack([signals[metric] for metric in metrics], axis=2).reshape(len(days), len(brands) * len(metrics))
+    today = (now if now is not None else pd.Timestamp.now()).normalize()
+    complete = len(days) if len(days) == 0 or days[-1] < today else len(days) - 1
+    for pos in range(complete):
+        values = np.where(layout >= 0, matrix[pos, np.maximum(layout, 0)] if matrix.size else np.nan, np.nan)
+        scores = detector.update(values)
+        for i in np.flatnonzero(scores['anomaly']):
+            brand, metric = detector.series[i]
+            alerts.append({
+                'day': days[pos], 'brand': brand, 'metric': metric, 'value': float(values[i]),
+                'expected': float(scores['expected'][i]), 'ewma_z': float(scores['ewma_z'][i]),
+                'robust_z': float(scores['robust_z'][i]),
+                'direction': 'spike' if scores['ewma_z'][i] > 0 else 'drop',
+            })
+        detector.last_day = days[pos]
+    
+    detector.version = manifest['version']
+    state_path = Path(partition_dir) / manifest['version'] / ANOMALY_STATE_FILE
+    if state_path.parent.is_dir():
+        tmp_path = state_path.with_name(f"{state_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'detector': detector.to_dict(), 'alerts': alerts}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, state_path)
+    
+    return {
+        'alerts': pd.DataFrame(alerts, columns=['day', 'brand', 'metric', 'value', 'expected',
+                                                'ewma_z', 'robust_z', 'direction']),
+        'series': len(detector.series),
+        'last_day': detector.last_day,
+    }
+
+
+# ============================================================================
+# HEALTH SCORE HISTORY
+# ============================================================================
+
+def health_score_history(rollup: pd.DataFrame, resolution: str = 'D') -> pd.DataFrame:
+    """
+    Marketing Health Score of every brand per day or week, in one vectorized pass.
+    
+    Applies the compute_metrics formula (0.4 × sentiment index + 0.3 ×
+    normalized engagement + 0.3 × normalized reach) to each period, with the
+    cross-brand average engagement and reach per mention of that same period
+    as normalizers. Periods in which a brand has no mentions are omitted.
+    
+    Args:
+        rollup: brand_daily_rollup output (unbranded rows only count toward the normalizers)
+        resolution: 'D' for days or 'W' for weeks starting Monday
+        
+    Returns:
+        DataFrame with period, brand (None for all brands together),
+        health_score, sentiment_index, norm_engagement, norm_reach and rows
+    """
+    columns = ['period', 'brand', 'health_score', 'sentiment_index', 'norm_engagement', 'norm_reach', 'rows']
+    if rollup.empty:
+        return pd.DataFrame(columns=columns)
+    
+    value_cols = [col for col in ['sentiment_score', 'Engagement', 'Reach'] if col in rollup.columns]
+    periods = rollup['day'].dt.to_period(resolution).dt.start_time.rename('period')
+    by_brand = rollup.groupby([periods, rollup['brand'].fillna('')])[['rows'] + value_cols].sum()
+    totals = by_brand.groupby(level='period').sum()
+    
+    # One extra "brand" per period: all brands together
+    branded = by_brand[by_brand.index.get_level_values('brand') != '']
+    overall = totals.assign(brand=None).set_index('brand', append=True)
+    frame = pd.concat([branded, overall])
+    period_totals = totals.reindex(frame.index.get_level_values('period'))
+    
+    rows = frame['rows'].to_numpy(dtype=np.float64)
+    total_rows = period_totals['rows'].to_numpy(dtype=np.float64)
+    
+    def _normalized(column: str) -> np.ndarray:
+        # min(100, brand average per mention / all-brand average per mention × 100)
+        if column not in frame.columns:
+            return np.zeros(len(frame))
+        overall_avg = period_totals[column].to_numpy(dtype=np.float64) / total_rows
+        brand_avg = frame[column].to_numpy(dtype=np.float64) / rows
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(overall_avg > 0, np.minimum(100, brand_avg / overall_avg * 100), 0.0)
+    
+    sentiment = frame['sentiment_score'].to_numpy(dtype=np.float64) if 'sentiment_score' in frame.columns else np.zeros(len(frame))
+    sentiment_index = (sentiment / rows + 1) / 2 * 100
+    norm_engagement = _normalized('Engagement')
+    norm_reach = _normalized('Reach')
+    return pd.DataFrame({
+        'period': frame.index.get_level_values('period'),
+        'brand': frame.index.get_level_values('brand'),
+        'health_score': 0.4 * sentiment_index + 0.3 * norm_engagement + 0.3 * norm_reach,
+        'sentiment_index': sentiment_index,
+        'norm_engagement': norm_engagement,
+        'norm_reach': norm_reach,
+        'rows': frame['rows'].to_numpy(),
+    }, columns=columns).sort_values(['brand', 'period'], na_position='first', kind='stable', ignore_index=True)
+
+
+def cached_health_history(manifest: Dict[str, Any], resolution: str,
+                          partition_dir: str = PARTITION_DIR) -> pd.DataFrame:
+    """health_score_history of the whole dataset, cached per dataset version and resolution."""
+    return get_artifact_cache().get_or_compute(
+        'health_history', (partition_dir, resolution), manifest['version'],
+        lambda: health_score_history(brand_daily_rollup(manifest, partition_dir), resolution)
+    )
+
+
+def health_trend(manifest: Dict[str, Any], brand: Optional[str], start_date=None, end_date=None,
+                 partition_dir: str = PARTITION_DIR) -> pd.Series:
+    """
+    Health score of a brand (None: all brands) over a date range, daily or weekly.
+    
+    Days are used while the range fits CHART_MAX_POINTS, weeks beyond that
+    (downsampled with LTTB if still too many).
+    
+    Returns:
+        Health score indexed by period start, named after the resolution ('D' or 'W')
+    """
+    history = cached_health_history(manifest, 'D', partition_dir)
+    history = history[history['brand'].isna()] if brand is None else history[history['brand'] == brand]
+    if start_date is not None:
+        history = history[history['period'] >= pd.Timestamp(start_date)]
+    if end_date is not None:
+        history = history[history['period'] <= pd.Timestamp(end_date)]
+    if choose_resolution(history['period']) == 'D':
+        return history.set_index('period')['health_score'].rename('D')
+    
+    weekly = cached_health_history(manifest, 'W', partition_dir)
+    weekly = weekly[weekly['brand'].isna()] if brand is None else weekly[weekly['brand'] == brand]
+    if start_date is not None:
+        weekly = weekly[weekly['period'] > pd.Timestamp(start_date) - timedelta(days=7)]
+    if end_date is not None:
+        weekly = weekly[weekly['period'] <= pd.Timestamp(end_date)]
+    return lttb(weekly.set_index('period')['health_score']).rename('W')
+
+
+# ============================================================================
+# STREAMING SKETCHES (APPROXIMATE TOP-K / DISTINCT COUNTS)
+# ============================================================================
+
+# Sketched dimensions: name -> (columns, how the cells are split into terms)
+SKETCH_DIMENSIONS = {
+    'keywords': (['Key Phrases', 'Keywords'], 'list'),
+    'hashtags': (['Hashtags'], 'hashtags'),
+    'sources': (['Source'], 'value'),
+    'influencers': (['Influencer'], 'value'),
+}
+DISTINCT_DIMENSIONS = ['sources', 'influencers']
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitter summary with a fixed number of counters.
+    
+    Every monitored count overestimates the true count by at most its recorded
+    error, and errors are bounded by N / capacity for a stream of N tokens.
+    Summaries merge with the same bound over the combined stream. The smallest
+    counter is found through a lazily updated min-heap, so an eviction costs
+    O(log capacity) instead of a scan over every counter.
+    """
+    
+    def __init__(self, capacity: int = SKETCH_CAPACITY):
+        self.capacity = capacity
+        self.total = 0
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        # (count, item) entries; an entry is stale once its item's count moved on
+        self._heap: List[tuple] = []
+    
+    def _push(self, item: str) -> None:
+        heapq.heappush(self._heap, (self.counts[item], item))
+        # Drop stale entries before they outnumber the live ones
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, item) for item, count in self.counts.items()]
+            heapq.heapify(self._heap)
+    
+    def _min_item(self) -> str:
+        """The monitored item with the smallest count."""
+        while True:
+            count, item = self._heap[0]
+            if self.counts.get(item) == count:
+                return item
+            heapq.heappop(self._heap)
+    
+    def update(self, item: str, count: int = 1) -> None:
+        """Add count occurrences of item."""
+        self.total += count
+        if item in self.counts:
+            self.counts[item] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+        else:
+            # Replace the smallest counter; the new item inherits its count as error
+            victim = self._min_item()
+            heapq.heappop(self._heap)
+            floor = self.counts.pop(victim)
+            self.errors.pop(victim)
+            self.counts[item] = floor + count
+            self.errors[item] = floor
+        self._push(item)
+    
+    def _floor(self) -> int:
+        """Upper bound on the count of any unmonitored item."""
+        return self.counts[self._min_item()] if len(self.counts) >= self.capacity else 0
+    
+    def _set(self, items) -> None:
+        """Replace the counters with (item, count, error) triples."""
+        for item, count, error in items:
+            self.counts[item] = count
+            self.errors[item] = error
+        self._heap = [(count, item) for item, count in self.counts.items()]
+        heapq.heapify(self._heap)
+    
+    def merge(self, other: 'SpaceSaving') -> 'SpaceSaving':
+        """Combine two summaries into a new one over both streams."""
+        merged = SpaceSaving(max(self.capacity, other.capacity))
+        merged.total = self.total + other.total
+        floor_self, floor_other = self._floor(), other._floor()
+        combined = {}
+        for item in set(self.counts) | set(other.counts):
+            count = self.counts.get(item, floor_self) + other.counts.get(item, floor_other)
+            error = self.errors.get(item, floor_self) + other.errors.get(item, floor_other)
+            combined[item] = (count, error)
+        top = sorted(combined.items(), key=lambda kv: -kv[1][0])[:merged.capacity]
+        merged._set((item, count, error) for item, (count, error) in top)
+        return merged
+    
+    def top(self, n: int) -> List[tuple]:
+        """The n largest (item, count, max_overestimate) triples."""
+        ranked = sorted(self.counts.items(), key=lambda kv: (-kv[1], kv[0]))[:n]
+        return [(item, count, self.errors[item]) for item, count in ranked]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {'capacity': self.capacity, 'total': self.total,
+                'items': [[item, self.counts[item], self.errors[item]] for item in self.counts]}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SpaceSaving':
+        summary = cls(data['capacity'])
+        summary.total = data['total']
+        summary._set(data['items'])
+        return summary
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """Vectorized int.bit_length for uint64 arrays (exact, via 32-bit halves)."""
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    with np.errstate(divide='ignore'):
+        high_bits = np.where(high > 0, np.floor(np.log2(high)) + 1 + 32, 0)
+        low_bits = np.where(low > 0, np.floor(np.log2(low)) + 1, 0)
+    return np.where(high > 0, high_bits, low_bits).astype(np.int64)
+
+
+def hll_registers(values: pd.Series, precision: int = HLL_PRECISION) -> np.ndarray:
+    """HyperLogLog registers for the distinct values of a Series."""
+    registers = np.zeros(1 << precision, dtype=np.uint8)
+    values = values.dropna().astype(str)
+    if len(values) == 0:
+        return registers
+    hashes = pd.util.hash_array(values.to_numpy(dtype=object))
+    buckets = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    remainder = hashes << np.uint64(precision)
+    ranks = np.minimum(64 - _bit_length(remainder) + 1, 64 - precision + 1).astype(np.uint8)
+    np.maximum.at(registers, buckets, ranks)
+    return registers
+
+
+def hll_estimate(registers: np.ndarray) -> float:
+    """Cardinality estimate from HyperLogLog registers (with small-range correction)."""
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.power(2.0, -registers.astype(np.float64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros > 0:
+        estimate = m * math.log(m / zeros)
+    return float(estimate)
+
+
+def extract_terms(df: pd.DataFrame, dimension: str) -> pd.Series:
+    """
+    Split a sketched dimension into one lowercase term per element.
+    
+    Returns:
+        Series of terms indexed like the rows they came from
+    """
+    columns, mode = SKETCH_DIMENSIONS[dimension]
+    parts = []
+    for col in columns:
+        if col not in df.columns:
+            continue
+        cells = df[col].dropna().astype(str)
+        if mode == 'value':
+            terms = cells.str.strip()
+        elif mode == 'hashtags':
+            terms = cells.str.split(r'[,;\s]+', regex=True).explode().str.strip().str.lstrip('#').str.lower()
+        else:
+            terms = cells.str.replace(';', ',').str.split(',').explode().str.strip().str.lower()
+        parts.append(terms[terms.notna() & (terms != '')])
+    if not parts:
+        return pd.Series([], dtype=object)
+    return pd.concat(parts)
+
+
+def _day_keys(df: pd.DataFrame) -> pd.Series:
+    """Publication day of each row as 'YYYY-MM-DD' ('undated' when missing)."""
+    if 'Date' not in df.columns:
+        return pd.Series(UNDATED_PARTITION, index=df.index)
+    return df['Date'].dt.strftime('%Y-%m-%d').fillna(UNDATED_PARTITION)
+
+
+def build_sketches(df_brand: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Build per-day Space-Saving and HyperLogLog sketches for one brand.
+    
+    Rows are streamed through the sketches SKETCH_CHUNK_ROWS at a time, so
+    only one chunk's terms are exploded at once.
+    
+    Returns:
+        {'days': [...], 'topk': {dimension: [summary dict per day]},
+         'hll': {dimension: uint8 array of shape (days, 2^HLL_PRECISION)}}
+    """
+    days = _day_keys(df_brand)
+    day_list = sorted(days.unique().tolist())
+    day_pos = {day: pos for pos, day in enumerate(day_list)}
+    
+    summaries = {dimension: [SpaceSaving() for _ in day_list] for dimension in SKETCH_DIMENSIONS}
+    hll = {dimension: np.zeros((len(day_list), 1 << HLL_PRECISION), dtype=np.uint8)
+           for dimension in DISTINCT_DIMENSIONS}
+    for lo in range(0, len(df_brand), SKETCH_CHUNK_ROWS):
+        chunk = df_brand.iloc[lo:lo + SKETCH_CHUNK_ROWS]
+        chunk_days = days.iloc[lo:lo + SKETCH_CHUNK_ROWS]
+        for dimension in SKETCH_DIMENSIONS:
+            terms = extract_terms(chunk, dimension)
+            if len(terms) == 0:
+                continue
+            day_of_term = chunk_days.loc[terms.index].to_numpy()
+            # Stream each day's (term, count) pairs through that day's summary
+            counts = pd.DataFrame({'day': day_of_term, 'term': terms.to_numpy()})
+            for (day, term), count in counts.groupby(['day', 'term']).size().items():
+                summaries[dimension][day_pos[day]].update(term, int(count))
+            if dimension in hll:
+                for day in np.unique(day_of_term):
+                    pos = day_pos[day]
+                    hll[dimension][pos] = np.maximum(hll[dimension][pos], hll_registers(terms[day_of_term == day]))
+    
+    topk = {dimension: [summary.to_dict() for summary in day_summaries]
+            for dimension, day_summaries in summaries.items()}
+    return {'days': day_list, 'topk': topk, 'hll': hll}
+
+
+def merge_sketches(base: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Merge the sketches of a brand's newly appended rows into its existing sketches.
+    
+    Days present in both are combined with SpaceSaving.merge and an elementwise
+    register maximum, which is what a rebuild over all rows would produce for HyperLogLog.
+    """
+    day_list = sorted(set(base['days']) | set(delta['days']))
+    day_pos = {day: pos for pos, day in enumerate(day_list)}
+    
+    topk = {}
+    for dimension in SKETCH_DIMENSIONS:
+        summaries: List[Optional[SpaceSaving]] = [None] * len(day_list)
+        for sketches in (base, delta):
+            for day, data in zip(sketches['days'], sketches['topk'].get(dimension, [])):
+                summary = SpaceSaving.from_dict(data)
+                pos = day_pos[day]
+                summaries[pos] = summary if summaries[pos] is None else summaries[pos].merge(summary)
+        topk[dimension] = [(summary or SpaceSaving()).to_dict() for summary in summaries]
+    
+    hll = {}
+    for dimension in DISTINCT_DIMENSIONS:
+        registers = np.zeros((len(day_list), 1 << HLL_PRECISION), dtype=np.uint8)
+        for sketches in (base, delta):
+            if dimension in sketches['hll']:
+                rows = [day_pos[day] for day in sketches['days']]
+                registers[rows] = np.maximum(registers[rows], sketches['hll'][dimension])
+        hll[dimension] = registers
+    
+    return {'days': day_list, 'topk': topk, 'hll': hll}
+
+
+def write_sketches(sketches: Dict[str, Any], path: Path) -> None:
+    """Persist a brand's sketches."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as f:
+        pickle.dump(sketches, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _sketch_day_mask(days: List[str], start_date, end_date) -> np.ndarray:
+    """Days of a sketch falling in the date range (undated only when unbounded)."""
+    days = np.asarray(days)
+    if start_date is None and end_date is None:
+        return np.ones(len(days), dtype=bool)
+    mask = days != UNDATED_PARTITION
+    if start_date is not None:
+        mask &= days >= pd.Timestamp(start_date).strftime('%Y-%m-%d')
+    if end_date is not None:
+        mask &= days <= pd.Timestamp(end_date).strftime('%Y-%m-%d')
+    return mask
+
+
+def load_brand_sketches(manifest: Dict[str, Any], entry: Dict[str, Any],
+                        partition_dir: str = PARTITION_DIR) -> Dict[str, Any]:
+    """Load one brand's sketches through the artifact cache."""
+    def _load() -> Dict[str, Any]:
+        with open(Path(partition_dir) / entry['sketches'], 'rb') as f:
+            return pickle.load(f)
+    
+    return get_artifact_cache().get_or_compute(
+        'sketch', (partition_dir, entry['sketches']), manifest['version'], _load
+    )
+
+
+def sketch_summary(manifest: Dict[str, Any], brand: Optional[str] = None,
+                   start_date=None, end_date=None,
+                   partition_dir: str = PARTITION_DIR) -> Dict[str, Any]:
+    """
+    Merge the per-day sketches of a brand and date range.
+    
+    Args:
+        manifest: Partition manifest
+        brand: Brand to summarize, or None for all brands
+        start_date, end_date: Inclusive date bounds (whole days), or None
+        partition_dir: Root directory for partitions and the manifest
+        
+    Returns:
+        {'topk': {dimension: SpaceSaving}, 'distinct': {dimension: estimate}}
+    """
+    merged = {dimension: SpaceSaving() for dimension in SKETCH_DIMENSIONS}
+    registers = {dimension: np.zeros(1 << HLL_PRECISION, dtype=np.uint8) for dimension in DISTINCT_DIMENSIONS}
+    
+    for entry in manifest.get('indexes', []):
+        if brand is not None and entry['brand'] != brand:
+            continue
+        sketches = load_brand_sketches(manifest, entry, partition_dir)
+        day_mask = _sketch_day_mask(sketches['days'], start_date, end_date)
+        if not day_mask.any():
+            continue
+        for dimension in SKETCH_DIMENSIONS:
+            day_summaries = sketches['topk'][dimension]
+            for pos in np.flatnonzero(day_mask):
+                merged[dimension] = merged[dimension].merge(SpaceSaving.from_dict(day_summaries[pos]))
+        for dimension in DISTINCT_DIMENSIONS:
+            registers[dimension] = np.maximum(registers[dimension], sketches['hll'][dimension][day_mask].max(axis=0))
+    
+    return {
+        'topk': merged,
+        'distinct': {dimension: hll_estimate(regs) for dimension, regs in registers.items()},
+    }
+
+
+def sketch_top_counts(summary: Dict[str, Any], dimension: str, n: int) -> pd.Series:
+    """Top-n terms of a merged sketch as a value_counts-style Series."""
+    top = summary['topk'][dimension].top(n)
+    return pd.Series([count for _, count, _ in top], index=[item for item, _, _ in top], dtype=np.int64)
+
+
+def exact_top_counts(df: pd.DataFrame, dimension: str, n: int) -> pd.Series:
+    """Top-n terms of a dimension by exact value_counts."""
+    return extract_terms(df, dimension).value_counts().head(n)
+
+
+# ============================================================================
+# THEME CO-OCCURRENCE
+# ============================================================================
+
+# Dimensions whose terms form the theme vocabulary, with the prefix marking
+# their origin in the term names (hashtags and keywords may share words)
+THEME_DIMENSIONS = {'hashtags': '#', 'keywords': ''}
+# Pairs seen in fewer mentions than this are not reported (lift is noise there)
+THEME_MIN_SUPPORT = 2
+# Most frequent themes offered in the Theme Associations selector
+THEME_SELECT_TERMS = 50
+
+
+def build_theme_matrix(df_brand: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Build one brand's sparse mention × theme presence matrix.
+    
+    Rows follow the brand's date-sorted rows (like its search index), so a
+    date window is a contiguous row slice.
+    
+    Args:
+        df_brand: One brand's rows, sorted by Date, with a row_id column
+        
+    Returns:
+        {'terms': sorted theme names, 'indptr' / 'indices': CSR rows of term
+        codes, 'row_ids', 'dates': per-row date keys (see _date_keys)}
+    """
+    parts = []
+    for dimension, prefix in THEME_DIMENSIONS.items():
+        terms = extract_terms(df_brand, dimension)
+        parts.append(pd.Series(prefix + terms.astype(str), index=terms.index))
+    terms = pd.concat(parts) if parts else pd.Series([], dtype=object)
+    
+    positions = df_brand.index.get_indexer(terms.index)
+    vocabulary, codes = np.unique(terms.to_numpy(dtype=str), return_inverse=True)
+    matrix = sp.csr_matrix(
+        (np.ones(len(codes), dtype=np.int32), (positions, codes)), shape=(len(df_brand), len(vocabulary))
+    )
+    # Presence, not occurrences: a theme repeated in one mention counts once
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    
+    dates = _date_keys(df_brand['Date']) if 'Date' in df_brand.columns else np.full(len(df_brand), _UNDATED_KEY, dtype=np.int64)
+    return {
+        'terms': vocabulary if len(vocabulary) else np.array([], dtype='<U1'),
+        'indptr': matrix.indptr.astype(np.int64),
+        'indices': matrix.indices.astype(np.int32),
+        'row_ids': df_brand['row_id'].to_numpy(dtype=np.int64),
+        'dates': dates,
+    }
+
+
+def _theme_csr(themes: Dict[str, np.ndarray], vocabulary: Optional[np.ndarray] = None) -> sp.csr_matrix:
+    """A theme matrix as scipy CSR, optionally re-coded to a larger sorted vocabulary."""
+    indices = themes['indices']
+    n_terms = len(themes['terms'])
+    if vocabulary is not None:
+        indices = np.searchsorted(vocabulary, themes['terms'])[indices].astype(np.int32)
+        n_terms = len(vocabulary)
+    data = np.ones(len(indices), dtype=np.int32)
+    return sp.csr_matrix((data, indices, themes['indptr']), shape=(len(themes['row_ids']), n_terms))
+
+
+def merge_theme_matrix(base: Dict[str, np.ndarray], delta: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Merge the theme matrix of a brand's appended rows into its existing one (rows re-sorted by date)."""
+    vocabulary = np.union1d(base['terms'], delta['terms'])
+    matrix = sp.vstack([_theme_csr(base, vocabulary), _theme_csr(delta, vocabulary)], format='csr')
+    row_ids = np.concatenate([base['row_ids'], delta['row_ids']])
+    dates = np.concatenate([base['dates'], delta['dates']])
+    rows = np.lexsort((row_ids, dates))
+    matrix = matrix[rows]
+    return {
+        'terms': vocabulary if len(vocabulary) else np.array([], dtype='<U1'),
+        'indptr': matrix.indptr.astype(np.int64),
+        'indices': matrix.indices.astype(np.int32),
+        'row_ids': row_ids[rows],
+        'dates': dates[rows],
+    }
+
+
+def write_theme_matrix(themes: Dict[str, np.ndarray], path: Path) -> None:
+    """Persist a brand's theme matrix."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(path, **themes)
+
+
+def load_theme_matrix(manifest: Dict[str, Any], entry: Dict[str, Any],
+                      partition_dir: str = PARTITION_DIR) -> Dict[str, np.ndarray]:
+    """Load one brand's theme matrix through the artifact cache."""
+    def _load() -> Dict[str, np.ndarray]:
+        with np.load(Path(partition_dir) / entry['themes']) as data:
+            return {name: data[name] for name in data.files}
+    
+    return get_artifact_cache().get_or_compute(
+        'themes', (partition_dir, entry['themes']), manifest['version'], _load
+    )
+
+
+def theme_cooccurrence(manifest: Dict[str, Any], brand: Optional[str] = None,
+                       start_date=None, end_date=None, partition_dir: str = PARTITION_DIR) -> Dict[str, Any]:
+    """
+    Theme co-occurrence counts over a brand/date window.
+    
+    The window's rows of each brand's theme matrix X (a contiguous slice) are
+    stacked over the vocabulary of themes present in the window, and C = XᵀX
+    gives, for every pair of themes, the number of mentions containing both;
+    its diagonal is each theme's mention count.
+    
+    Returns:
+        {'terms': vocabulary, 'cooccurrence': sparse C (terms × terms),
+        'counts': mentions per theme, 'mentions': mentions in the window}
+    """
+    start_key, end_key = _date_key_bounds(manifest, start_date, end_date)
+    slices = []
+    for entry in manifest.get('indexes', []):
+        if (brand is not None and entry['brand'] != brand) or 'themes' not in entry:
+            continue
+        themes = load_theme_matrix(manifest, entry, partition_dir)
+        lo = int(np.searchsorted(themes['dates'], start_key, side='left')) if start_key is not None else 0
+        hi = int(np.searchsorted(themes['dates'], end_key, side='right')) if end_key is not None else len(themes['dates'])
+        if hi > lo:
+            slices.append((themes, lo, hi))
+    
+    # Only the window's non-zeros are touched: slice each brand's CSR arrays,
+    # then re-code the themes they use to the window's vocabulary
+    window_terms = [themes['terms'][themes['indices'][themes['indptr'][lo]:themes['indptr'][hi]]]
+                    for themes, lo, hi in slices]
+    vocabulary = np.unique(np.concatenate(window_terms)) if slices else np.array([], dtype='<U1')
+    indptr, indices, offset = [np.zeros(1, dtype=np.int64)], [], 0
+    for (themes, lo, hi), terms in zip(slices, window_terms):
+        indptr.append(themes['indptr'][lo + 1:hi + 1] - themes['indptr'][lo] + offset)
+        indices.append(np.searchsorted(vocabulary, terms).astype(np.int32))
+        offset += len(terms)
+    indptr = np.concatenate(indptr)
+    indices = np.concatenate(indices) if indices else np.array([], dtype=np.int32)
+    matrix = sp.csr_matrix((np.ones(len(indices), dtype=np.int32), indices, indptr),
+                           shape=(len(indptr) - 1, len(vocabulary)))
+    cooccurrence = (matrix.T @ matrix).tocsr()
+    return {
+        'terms': vocabulary,
+        'cooccurrence': cooccurrence,
+        'counts': cooccurrence.diagonal(),
+        'mentions': matrix.shape[0],
+    }
+
+
+def associated_terms(cooccurrence: Dict[str, Any], term: str, n: int = 15,
+                     min_support: int = THEME_MIN_SUPPORT) -> pd.DataFrame:
+    """
+    Themes most associated with one theme, ranked by lift.
+    
+    lift(a, b) = N · count(a, b) / (count(a) · count(b)) is how much more often
+    b appears in mentions of a than in mentions overall; confidence is
+    count(a, b) / count(a).
+    
+    Returns:
+        DataFrame with term, co_mentions, confidence and lift, best first
+    """
+    columns = ['term', 'co_mentions', 'confidence', 'lift']
+    terms = cooccurrence['terms']
+    pos = int(np.searchsorted(terms, term))
+    if pos >= len(terms) or terms[pos] != term:
+        return pd.DataFrame(columns=columns)
+    
+    row = cooccurrence['cooccurrence'].getrow(pos)
+    keep = (row.indices != pos) & (row.data >= min_support)
+    others, together = row.indices[keep], row.data[keep].astype(np.float64)
+    counts = cooccurrence['counts'].astype(np.float64)
+    result = pd.DataFrame({
+        'term': terms[others],
+        'co_mentions': together.astype(np.int64),
+        'confidence': together / counts[pos],
+        'lift': cooccurrence['mentions'] * together / (counts[pos] * counts[others]),
+    }, columns=columns)
+    return result.sort_values(['lift', 'co_mentions', 'term'], ascending=[False, False, True], ignore_index=True).head(n)
+
+
+def distinctive_terms(manifest: Dict[str, Any], partition_dir: str = PARTITION_DIR) -> pd.DataFrame:
+    """
+    Score every brand's themes by how distinctive they are versus the other brands.
+    
+    Each brand is one document of a sparse brand × theme matrix holding the
+    number of its mentions containing each theme (column sums of its theme
+    matrix). Scores are TF-IDF over that matrix, for all brands at once:
+    tf = share of the brand's mentions containing the theme, idf =
+    log(brands / brands using the theme), so themes every brand uses
+    ("brand", "market impact") score 0. A brand's own name is dropped.
+    
+    Returns:
+        DataFrame with brand, term, mentions, brand_share, others_share and
+        score for every theme with a positive score, best first per brand
+    """
+    columns = ['brand', 'term', 'mentions', 'brand_share', 'others_share', 'score']
+    entries = [entry for entry in manifest.get('indexes', []) if entry['brand'] is not None and 'themes' in entry]
+    if not entries:
+        return pd.DataFrame(columns=columns)
+    
+    matrices = [load_theme_matrix(manifest, entry, partition_dir) for entry in entries]
+    vocabulary = np.unique(np.concatenate([themes['terms'] for themes in matrices]))
+    rows, cols, counts = [], [], []
+    for i, themes in enumerate(matrices):
+        term_counts = np.bincount(themes['indices'], minlength=len(themes['terms']))
+        present = np.flatnonzero(term_counts)
+        rows.append(np.full(len(present), i))
+        cols.append(np.searchsorted(vocabulary, themes['terms'][present]))
+        counts.append(term_counts[present])
+    brand_terms = sp.csr_matrix(
+        (np.concatenate(counts).astype(np.float64), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(len(entries), len(vocabulary))
+    )
+    
+    mentions = np.array([len(themes['row_ids']) for themes in matrices], dtype=np.float64)
+    brands_using = np.diff(brand_terms.tocsc().indptr)
+    idf = np.log(len(entries) / np.maximum(brands_using, 1))
+    tf = sp.diags(1 / np.maximum(mentions, 1)) @ brand_terms
+    scores = tf.multiply(idf[None, :]).tocoo()
+    
+    brand_idx, term_idx = scores.row, scores.col
+    term_totals = np.asarray(brand_terms.sum(axis=0)).ravel()
+    own = np.asarray(brand_terms[brand_idx, term_idx]).ravel()
+    others_mentions = mentions.sum() - mentions[brand_idx]
+    result = pd.DataFrame({
+        'brand': np.array([entry['brand'] for entry in entries], dtype=object)[brand_idx],
+        'term': vocabulary[term_idx],
+        'mentions': own.astype(np.int64),
+        'brand_share': own / np.maximum(mentions[brand_idx], 1),
+        'others_share': (term_totals[term_idx] - own) / np.maximum(others_mentions, 1),
+        'score': scores.data,
+    }, columns=columns)
+    
+    # A brand's own name is distinctive but says nothing
+    names = result['brand'].str.lower().str.replace(' ', '', regex=False)
+    bare_terms = result['term'].str.lstrip('#').str.replace(' ', '', regex=False)
+    result = result[(result['score'] > 0) & (bare_terms != names)]
+    return result.sort_values(['brand', 'score', 'term'], ascending=[True, False, True], ignore_index=True)
+
+
+def cached_distinctive_terms(manifest: Dict[str, Any], partition_dir: str = PARTITION_DIR) -> pd.DataFrame:
+    """distinctive_terms of the whole dataset, computed once per dataset version."""
+    return get_artifact_cache().get_or_compute(
+        'distinctive_terms', (partition_dir,), manifest['version'],
+        lambda: distinctive_terms(manifest, partition_dir)
+    )
+
+
+# ============================================================================
+# GEOGRAPHIC HIERARCHY
+# ============================================================================
+
+# Drilldown levels of the geographic chart, broadest first
+GEO_LEVELS = ['Country', 'Subregion', 'State', 'City']
+# Measures kept per place and day: mention count, sentiment_score sum, Reach sum
+GEO_MEASURES = ['mentions', 'sentiment', 'reach']
+# Places with no value at a level are grouped under this name
+GEO_UNKNOWN = 'Unknown'
+# Bars shown per drilldown level
+GEO_CHART_BARS = 15
+
+
+def _geo_places(df: pd.DataFrame) -> pd.DataFrame:
+    """Each row's place at every GEO_LEVELS level, GEO_UNKNOWN where missing."""
+    places = {}
+    for level in GEO_LEVELS:
+        if level in df.columns:
+            values = df[level].fillna('').astype(str).str.strip()
+            places[level] = values.where(values != '', GEO_UNKNOWN)
+        else:
+            places[level] = pd.Series(GEO_UNKNOWN, index=df.index)
+    return pd.DataFrame(places, index=df.index)
+
+
+def _geo_rollup_from_cells(cells: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Sum (date key, place) cells into a geo rollup.
+    
+    Places become a tree: node i of a level has the name nodes_<level>[i]
+    and the parent node parent_<level>[i] one level up (0, the world, for
+    the top level). Cells are kept per day at the finest level and sorted by
+    date, so a date window is a contiguous slice.
+    
+    Args:
+        cells: 'dates' (day keys, see build_geo_rollup), one column per
+            GEO_LEVELS level and the GEO_MEASURES columns
+        
+    Returns:
+        {'nodes_<level>' / 'parent_<level>' per level, 'dates', 'leaf' (finest
+        level node of each cell) and one array per GEO_MEASURES measure}
+    """
+    grouped = cells.groupby(['dates', *GEO_LEVELS], sort=True)[GEO_MEASURES].sum().reset_index()
+    rollup = {}
+    parent = np.zeros(len(grouped), dtype=np.int64)
+    for level in GEO_LEVELS:
+        codes, nodes = pd.factorize(pd.MultiIndex.from_arrays([parent, grouped[level].to_numpy(dtype=str)]))
+        rollup[f'nodes_{level}'] = nodes.get_level_values(1).to_numpy(dtype=str)
+        rollup[f'parent_{level}'] = nodes.get_level_values(0).to_numpy(dtype=np.int32)
+        parent = codes
+    rollup['dates'] = grouped['dates'].to_numpy(dtype=np.int64)
+    rollup['leaf'] = parent.astype(np.int32)
+    rollup['mentions'] = grouped['mentions'].to_numpy(dtype=np.int64)
+    rollup['sentiment'] = grouped['sentiment'].to_numpy(dtype=np.float64)
+    rollup['reach'] = grouped['reach'].to_numpy(dtype=np.float64)
+    return rollup
+
+
+def build_geo_rollup(df_brand: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Build one brand's mention count, sentiment sum and reach per place and day.
+    
+    Args:
+        df_brand: One brand's prepared rows
+        
+    Returns:
+        Geo rollup (see _geo_rollup_from_cells)
+    """
+    cells = _geo_places(df_brand)
+    if 'Date' in df_brand.columns:
+        # One cell per place and day, plus one for rows exactly at midnight, so
+        # windows ending at a day's midnight (as everywhere else) stay exact
+        days = df_brand['Date'].dt.normalize()
+        keys = _date_keys(days)
+        keys[(df_brand['Date'] > days).to_numpy(dtype=bool)] += 1
+        cells['dates'] = keys
+    else:
+        cells['dates'] = _UNDATED_KEY
+    cells['mentions'] = 1
+    cells['sentiment'] = df_brand['sentiment_score'] if 'sentiment_score' in df_brand.columns else 0.0
+    cells['reach'] = pd.to_numeric(df_brand['Reach'], errors='coerce').fillna(0) if 'Reach' in df_brand.columns else 0.0
+    return _geo_rollup_from_cells(cells)
+
+
+def merge_geo_rollup(base: Dict[str, np.ndarray], delta: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Merge the geo rollup of a brand's appended rows into its existing one.
+    
+    Level by level, delta places are matched to base nodes by (parent, name)
+    and places the base lacks are appended, so base node numbers stay valid.
+    The delta cells, pointed at the merged leaves, are then inserted by date;
+    a place and day may end up with several cells, which window sums add up.
+    """
+    merged = {}
+    # Delta node -> merged node of the level above (the world is 0 on both sides)
+    mapping = np.zeros(1, dtype=np.int64)
+    for level in GEO_LEVELS:
+        names, parents = base[f'nodes_{level}'], base[f'parent_{level}'].astype(np.int64)
+        delta_names, delta_parents = delta[f'nodes_{level}'], mapping[delta[f'parent_{level}']]
+        found = pd.MultiIndex.from_arrays([parents, names]).get_indexer(
+            pd.MultiIndex.from_arrays([delta_parents, delta_names]))
+        new = found < 0
+        found[new] = len(names) + np.arange(int(new.sum()))
+        merged[f'nodes_{level}'] = np.concatenate([names, delta_names[new]])
+        merged[f'parent_{level}'] = np.concatenate([parents, delta_parents[new]]).astype(np.int32)
+        mapping = found.astype(np.int64)
+    
+    at = np.searchsorted(base['dates'], delta['dates'], side='right')
+    merged['dates'] = np.insert(base['dates'], at, delta['dates'])
+    merged['leaf'] = np.insert(base['leaf'], at, mapping[delta['leaf']]).astype(np.int32)
+    for measure in GEO_MEASURES:
+        merged[measure] = np.insert(base[measure], at, delta[measure])
+    return merged
+
+
+def write_geo_rollup(rollup: Dict[str, np.ndarray], path: Path) -> None:
+    """Persist a brand's geo rollup."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(path, **rollup)
+
+
+def load_geo_rollup(manifest: Dict[str, Any], entry: Dict[str, Any],
+                    partition_dir: str = PARTITION_DIR) -> Dict[str, np.ndarray]:
+    """Load one brand's geo rollup through the artifact cache."""
+    def _load() -> Dict[str, np.ndarray]:
+        with np.load(Path(partition_dir) / entry['geo']) as data:
+            return {name: data[name] for name in data.files}
+    
+    return get_artifact_cache().get_or_compute(
+        'geo', (partition_dir, entry['geo']), manifest['version'], _load
+    )
+
+
+def geo_hierarchy(manifest: Dict[str, Any], brand: Optional[str] = None,
+                  start_date=None, end_date=None, partition_dir: str = PARTITION_DIR) -> Dict[tuple, pd.DataFrame]:
+    """
+    Every drilldown level of the geographic chart for a brand/date window.
+    
+    Each brand's window cells (a contiguous slice of its geo rollup) are
+    summed per finest-level place with np.bincount and rolled up through the
+    parent links, so the cost depends on the number of places and days, not
+    rows. Places named GEO_UNKNOWN are left out unless a place below them is
+    known.
+    
+    Returns:
+        Place path (() for the world, ('France',), ('France', 'Europe'), ...)
+        -> its children at the next level: place, mentions, avg_sentiment,
+        reach and whether it can be drilled into, most mentioned first
+    """
+    start_key, end_key = _date_key_bounds(manifest, start_date, end_date)
+    frames = []
+    for entry in manifest.get('indexes', []):
+        if (brand is not None and entry['brand'] != brand) or 'geo' not in entry:
+            continue
+        rollup = load_geo_rollup(manifest, entry, partition_dir)
+        lo = int(np.searchsorted(rollup['dates'], start_key, side='left')) if start_key is not None else 0
+        hi = int(np.searchsorted(rollup['dates'], end_key, side='right')) if end_key is not None else len(rollup['dates'])
+        if hi <= lo:
+            continue
+        
+        # Finest level from the cells, then each level from the one below it
+        totals = {}
+        below = rollup['leaf'][lo:hi]
+        weights = {measure: rollup[measure][lo:hi] for measure in GEO_MEASURES}
+        for level in reversed(GEO_LEVELS):
+            n = len(rollup[f'nodes_{level}'])
+            totals[level] = {measure: np.bincount(below, weights=values, minlength=n)
+                             for measure, values in weights.items()}
+            below, weights = rollup[f'parent_{level}'], totals[level]
+        
+        paths = [()]
+        for level in GEO_LEVELS:
+            parents = rollup[f'parent_{level}']
+            names = rollup[f'nodes_{level}'].tolist()
+            frame = pd.DataFrame({'parent': [paths[p] for p in parents], 'place': names, **totals[level]})
+            frames.append(frame[frame['mentions'] > 0])
+            paths = [paths[p] + (name,) for p, name in zip(parents, names)]
+    
+    if not frames:
+        return {}
+    # Brands share places, so sum them by path
+    table = pd.concat(frames, ignore_index=True).groupby(['parent', 'place'], sort=False)[GEO_MEASURES].sum()
+    
+    table = table.reset_index()
+    table['mentions'] = table['mentions'].round().astype(np.int64)
+    
+    # Deepest places first, so each place knows whether a place below it is known
+    parents, places = table['parent'].tolist(), table['place'].tolist()
+    has_known = set()
+    shown = np.zeros(len(table), dtype=bool)
+    for i in sorted(range(len(table)), key=lambda i: -len(parents[i])):
+        if places[i] != GEO_UNKNOWN or parents[i] + (places[i],) in has_known:
+            shown[i] = True
+            has_known.add(parents[i])
+    table['drillable'] = [len(parent) < len(GEO_LEVELS) - 1 and parent + (place,) in has_known
+                          for parent, place in zip(parents, places)]
+    table['avg_sentiment'] = table['sentiment'] / table['mentions']
+    table = table[shown].sort_values(['mentions', 'place'], ascending=[False, True], kind='stable')
+    
+    columns = {col: table[col].to_numpy() for col in ['place', 'mentions', 'avg_sentiment', 'reach', 'drillable']}
+    return {parent: pd.DataFrame({col: values[positions] for col, values in columns.items()})
+            for parent, positions in table.groupby('parent', sort=False).indices.items()}
+
+
+# ============================================================================
+# TIME SERIES DOWNSAMPLING
+# ============================================================================
+
+# Bucket frequency -> label, finest first
+TIME_RESOLUTIONS = {'D': 'Daily', 'W': 'Weekly', 'M': 'Monthly'}
+
+
+def choose_resolution(dates: pd.Series, max_points: int = CHART_MAX_POINTS) -> str:
+    """Finest bucket frequency ('D', 'W' or 'M') whose bucket count over the data's span fits max_points."""
+    dates = dates.dropna()
+    if dates.empty:
+        return 'D'
+    span_days = (dates.max().normalize() - dates.min().normalize()).days + 1
+    if span_days <= max_points:
+        return 'D'
+    if math.ceil(span_days / 7) + 1 <= max_points:
+        return 'W'
+    return 'M'
+
+
+def bucket_series(df: pd.DataFrame, column: Optional[str], how: str, resolution: str) -> pd.Series:
+    """
+    Aggregate a column into time buckets.
+    
+    Args:
+        df: Rows with a Date column
+        column: Column to aggregate (ignored for how='size')
+        how: 'mean', 'sum' or 'size'
+        resolution: Bucket frequency from choose_resolution
+        
+    Returns:
+        Series indexed by bucket start timestamp
+    """
+    dated = df[df['Date'].notna()]
+    buckets = dated['Date'].dt.to_period(resolution).dt.start_time
+    if how == 'size':
+        return dated.groupby(buckets).size()
+    return dated.groupby(buckets)[column].agg(how)
+
+
+def lttb(series: pd.Series, max_points: int = CHART_MAX_POINTS) -> pd.Series:
+    """
+    Downsample a time series with Largest-Triangle-Three-Buckets.
+    
+    Keeps the first and last points and, from each bucket in between, the point
+    forming the largest triangle with the previously kept point and the next
+    bucket's average, so spikes and dips survive downsampling.
+    """
+    n = len(series)
+    if n <= max_points or max_points < 3:
+        return series
+    
+    index = series.index
+    x = index.asi8.astype(np.float64) if isinstance(index, pd.DatetimeIndex) else np.arange(n, dtype=np.float64)
+    y = series.to_numpy(dtype=np.float64)
+    
+    edges = np.floor(np.linspace(1, n - 1, max_points - 1)).astype(np.int64)
+    selected = [0]
+    anchor = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        if i + 2 < len(edges):
+            next_lo, next_hi = edges[i + 1], max(edges[i + 2], edges[i + 1] + 1)
+        else:
+            next_lo, next_hi = n - 1, n
+        avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        area = np.abs((x[anchor] - avg_x) * (y[lo:hi] - y[anchor]) - (x[anchor] - x[lo:hi]) * (avg_y - y[anchor]))
+        anchor = int(lo + np.argmax(area))
+        selected.append(anchor)
+    selected.append(n - 1)
+    return series.iloc[selected]
+
+
+# ============================================================================
+# CHART PAYLOAD BUDGET
+# ============================================================================
+
+# plotly>=6 serializes NumPy arrays as base64 typed arrays, so narrower dtypes mean fewer bytes
+_PLOTLY_TYPED_ARRAYS = int(plotly.__version__.split('.')[0]) >= 6
+_CHART_SIGNIFICANT_DIGITS = 4
+_TRACE_ARRAY_ATTRS = ['x', 'y', 'values', 'z', 'text']
+
+
+def cap_categories(counts: pd.Series, max_categories: int, other_label: str = 'Other') -> pd.Series:
+    """Keep the largest max_categories - 1 categories and sum the rest into other_label."""
+    if len(counts) <= max_categories:
+        return counts
+    counts = counts.sort_values(ascending=False)
+    head = counts.iloc[:max_categories - 1]
+    return pd.concat([head, pd.Series([counts.iloc[max_categories - 1:].sum()], index=[other_label])])
+
+
+def _compact_array(values: np.ndarray) -> np.ndarray:
+    """Narrow a numeric array for serialization without visibly changing the chart."""
+    if values.dtype.kind == 'f':
+        if _PLOTLY_TYPED_ARRAYS:
+            return values.astype(np.float32)
+        finite = np.isfinite(values) & (values != 0)
+        magnitude = np.zeros_like(values)
+        magnitude[finite] = np.floor(np.log10(np.abs(values[finite])))
+        scale = np.power(10.0, _CHART_SIGNIFICANT_DIGITS - 1 - magnitude)
+        return np.where(finite, np.round(values * scale) / scale, values)
+    if values.dtype.kind in 'iu' and _PLOTLY_TYPED_ARRAYS and len(values) > 0:
+        for dtype in (np.int8, np.int16, np.int32):
+            info = np.iinfo(dtype)
+            if values.min() >= info.min and values.max() <= info.max:
+                return values.astype(dtype)
+    return values
+
+
+def compact_figure(fig: go.Figure) -> go.Figure:
+    """Drop the Plotly template and narrow numeric trace arrays."""
+    fig.layout.template = None
+    for trace in fig.data:
+        for attr in _TRACE_ARRAY_ATTRS:
+            values = getattr(trace, attr, None) if attr in trace else None
+            if values is None or isinstance(values, str):
+                continue
+            array = np.asarray(values)
+            if array.ndim >= 1 and array.dtype.kind in 'fiu':
+                trace[attr] = _compact_array(array)
+    return fig
+
+
+def _figure_bytes(fig: go.Figure) -> int:
+    return len(plotly.io.to_json(fig, validate=False))
+
+
+def _shrink_line_traces(fig: go.Figure, ratio: float) -> bool:
+    """LTTB-downsample every scatter trace to ratio of its points; True if anything shrank."""
+    shrunk = False
+    for trace in fig.data:
+        if trace.type != 'scatter' or trace.y is None or len(trace.y) <= 3:
+            continue
+        x = pd.Index(trace.x) if trace.x is not None else pd.RangeIndex(len(trace.y))
+        series = pd.Series(np.asarray(trace.y, dtype=np.float64), index=x)
+        target = max(3, int(len(series) * ratio))
+        if target < len(series):
+            reduced = lttb(series, target)
+            trace.x, trace.y = reduced.index, _compact_array(reduced.to_numpy())
+            shrunk = True
+    return shrunk
+
+
+def render_chart(fig: go.Figure, name: str, **kwargs):
+    """
+    Compact, budget-check and render a Plotly figure, recording its payload size.
+    
+    Args:
+        fig: Figure to render
+        name: Label for the sidebar payload report
+        **kwargs: Passed through to st.plotly_chart
+    """
+    compact_figure(fig)
+    payloads = st.session_state.setdefault('chart_payloads', [])
+    remaining = CHART_PAGE_BUDGET_KB * 1024 - sum(entry['bytes'] for entry in payloads)
+    
+    nbytes = _figure_bytes(fig)
+    downsampled = False
+    while nbytes > remaining and remaining > 0 and _shrink_line_traces(fig, remaining / nbytes):
+        downsampled = True
+        nbytes = _figure_bytes(fig)
+    
+    payloads.append({'chart': name, 'bytes': nbytes, 'downsampled': downsampled})
+    st.plotly_chart(fig, use_container_width=True, **kwargs)
+
+
+def render_payload_report():
+    """Render JSON bytes per chart for this page in the sidebar."""
+    payloads = st.session_state.get('chart_payloads', [])
+    total = sum(entry['bytes'] for entry in payloads)
+    with st.sidebar:
+        with st.expander("Chart payload", expanded=False):
+            st.caption(f"{total / 1024:,.1f} / {CHART_PAGE_BUDGET_KB:,} KB across {len(payloads)} charts")
+            for entry in sorted(payloads, key=lambda e: -e['bytes']):
+                note = " (downsampled to fit budget)" if entry['downsampled'] else ""
+                st.caption(f"{entry['chart']}: {entry['bytes'] / 1024:,.1f} KB{note}")
+
+
+# ============================================================================
+# CACHE WARM-UP
+# ============================================================================
+
+WARMUP_STATUS_FILE = "warmup.json"
+
+
+def default_date_range() -> tuple:
+    """Sidebar default date window: the last DEFAULT_WINDOW_DAYS days up to today."""
+    today = datetime.now().date()
+    return today - timedelta(days=DEFAULT_WINDOW_DAYS), today
+
+
+def window_artifacts(manifest: Dict[str, Any], df_totals: pd.DataFrame, brand: Optional[str],
+                     start_date=None, end_date=None, partition_dir: str = PARTITION_DIR) -> tuple:
+    """
+    Load a brand/date window with its metrics and aggregates through the artifact cache.
+    
+    Returns:
+        (df_brand, metrics, aggregates by 'Source' / 'Country' / 'day')
+    """
+    df_brand = load_brand_window(manifest['version'], brand, start_date, end_date, partition_dir)
+    metrics = window_metrics(manifest, df_totals, df_brand, brand, start_date, end_date)
+    aggregates = {key: window_aggregate(manifest, key, brand, start_date, end_date, partition_dir)
+                  for key in AGGREGATE_KEYS}
+    return df_brand, metrics, aggregates
+
+
+def window_metrics(manifest: Dict[str, Any], df_totals: pd.DataFrame, df_brand: pd.DataFrame,
+                   brand: Optional[str], start_date=None, end_date=None) -> Dict[str, Any]:
+    """compute_metrics of a loaded brand/date window, through the artifact cache."""
+    return get_artifact_cache().get_or_compute(
+        'metrics', (brand, start_date, end_date), manifest['version'],
+        lambda: compute_metrics(df_brand, df_totals)
+    )
+
+
+def window_aggregate(manifest: Dict[str, Any], key: str, brand: Optional[str],
+                     start_date=None, end_date=None, partition_dir: str = PARTITION_DIR) -> pd.DataFrame:
+    """Channel / country / day group-by of a window over the column store (see AGGREGATION EXECUTOR), cached."""
+    return get_artifact_cache().get_or_compute(
+        'aggregates', (key, brand, start_date, end_date), manifest['version'],
+        lambda: aggregate_window(manifest, [key], AGGREGATE_VALUES, brand, start_date, end_date, partition_dir)
+    )
+
+
+class WarmupProgress:
+    """Progress of the background cache warm-up for one dataset version."""
+    
+    def __init__(self, version: str, brands: List[str]):
+        self.version = version
+        self.brands = brands
+        self.done = 0
+        self.current: Optional[str] = None
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        # Set once every brand's default window is cached (or warm-up gave up)
+        self.ready = threading.Event()
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Progress as a JSON-serializable dict."""
+        finished_at = self.finished_at if self.finished_at is not None else time.time()
+        return {
+            'version': self.version,
+            'ready': self.ready.is_set(),
+            'brands': len(self.brands),
+            'done': self.done,
+            'current': self.current,
+            'error': self.error,
+            'elapsed_seconds': round(finished_at - self.started_at, 2),
+        }
+
+
+def write_warmup_status(progress: WarmupProgress, partition_dir: str = PARTITION_DIR) -> None:
+    """Write warm-up progress to PARTITION_DIR/warmup.json for readiness probes."""
+    root = Path(partition_dir)
+    tmp_path = root / f"{WARMUP_STATUS_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(progress.snapshot(), f, indent=2)
+    os.replace(tmp_path, root / WARMUP_STATUS_FILE)
+
+
+def warm_caches(progress: WarmupProgress, partition_dir: str = PARTITION_DIR) -> None:
+    """
+    Cache every brand's default window: data, metrics, aggregates and search index.
+    
+    Stops early if the partitions are rebuilt under a newer version meanwhile.
+    """
+    try:
+        start_date, end_date = default_date_range()
+        for brand in progress.brands:
+            manifest = read_manifest(partition_dir)
+            if manifest is None or manifest['version'] != progress.version:
+                progress.error = "superseded by a newer dataset version"
+                break
+            progress.current = brand
+            write_warmup_status(progress, partition_dir)
+            window_artifacts(manifest, partition_totals(manifest), brand, start_date, end_date, partition_dir)
+            progress.done += 1
+    except Exception as e:
+        progress.error = f"{type(e).__name__}: {e}"
+    finally:
+        progress.current = None
+        progress.finished_at = time.time()
+        progress.ready.set()
+        write_warmup_status(progress, partition_dir)
+
+
+@st.cache_resource
+def start_warmup(version: str, partition_dir: str = PARTITION_DIR) -> WarmupProgress:
+    """
+    Start warming the caches in a background thread, once per dataset version.
+    
+    The default brand (first in the selector) goes first, then the others by
+    mention count, so the most likely first requests are served warm soonest.
+    """
+    manifest = read_manifest(partition_dir)
+    df_totals = partition_totals(manifest) if manifest else pd.DataFrame(columns=['brand', 'rows'])
+    brand_list = [brand for brand in get_brand_list(df_totals) if brand != 'No brands found']
+    by_rows = df_totals.groupby('brand')['rows'].sum().sort_values(ascending=False, kind='stable')
+    brands = brand_list[:1] + [brand for brand in by_rows.index if brand in brand_list[1:]]
+    
+    progress = WarmupProgress(version, brands)
+    thread = threading.Thread(target=warm_caches, args=(progress, partition_dir),
+                              name=f"cache-warmup-{version}", daemon=True)
+    add_script_run_ctx(thread, get_script_run_ctx())
+    thread.start()
+    return progress
+
+
+# ============================================================================
+# PROGRESSIVE SAMPLING
+# ============================================================================
+
+# Two-sided 95% normal quantile for the sample confidence intervals
+_Z_95 = 1.959964
+
+
+def window_row_count(manifest: Dict[str, Any], brand: Optional[str] = None, start_date=None, end_date=None,
+                     partition_dir: str = PARTITION_DIR) -> int:
+    """Number of rows in a brand/date window, from the search index dates alone."""
+    return sum(hi - lo for lo, hi in window_row_ranges(manifest, brand, start_date, end_date, partition_dir))
+
+
+def stratified_sample(manifest: Dict[str, Any], brand: Optional[str] = None, start_date=None, end_date=None,
+                      target_rows: int = SAMPLE_TARGET_ROWS, partition_dir: str = PARTITION_DIR,
+                      seed: int = 0) -> Dict[str, Any]:
+    """
+    Draw a sample of a brand/date window stratified by day and source.
+    
+    Stratum sizes N_h are counted from the day and Source code arrays. Each
+    row is kept with its stratum's probability min(1, max(target_rows / N,
+    SAMPLE_MIN_PER_STRATUM / N_h)); a stratum the draw missed keeps its first
+    row, so every stratum is represented. Only sampled rows are read from the
+    column store.
+    
+    Args:
+        manifest: Partition manifest
+        brand: Brand to sample, or None for all brands
+        start_date, end_date: Inclusive date bounds, or None for unbounded
+        target_rows: Approximate sample size
+        partition_dir: Root directory for partitions and the manifest
+        seed: Random seed (the same window always gets the same sample)
+        
+    Returns:
+        {'sample': sampled rows with row_id, Date (day), Source, Country,
+        Sentiment (from sentiment_score, neutral including unknown), the
+        AGGREGATE_VALUES columns, 'stratum' and 'weight' (N_h / n_h),
+        'population': N_h and 'sampled': n_h per stratum}
+    """
+    key_codes = manifest.get('key_codes', {})
+    values = [col for col in AGGREGATE_VALUES if col in manifest.get('column_store', [])]
+    ranges = window_row_ranges(manifest, brand, start_date, end_date, partition_dir)
+    lengths = np.array([hi - lo for lo, hi in ranges], dtype=np.int64)
+    total = int(lengths.sum())
+    if total == 0:
+        columns = ['row_id', 'Date'] + KEY_CODE_COLUMNS + ['Sentiment'] + values + ['stratum', 'weight']
+        return {'sample': pd.DataFrame(columns=columns), 'population': np.zeros(0, dtype=np.int64),
+                'sampled': np.zeros(0, dtype=np.int64)}
+    
+    codes = open_key_codes(partition_dir, manifest['version'])
+    
+    def _window_codes(key: str) -> np.ndarray:
+        # Shifted by one so missing values (-1) get a stratum of their own
+        if key not in codes:
+            return np.zeros(total, dtype=np.int64)
+        return np.concatenate([np.asarray(codes[key][lo:hi], dtype=np.int64) for lo, hi in ranges]) + 1
+    
+    day = _window_codes('day')
+    source = _window_codes('Source')
+    n_sources = len(key_codes['Source']['categories']) + 1 if 'Source' in key_codes else 1
+    raw_strata = (day - day.min()) * n_sources + source
+    raw_counts = np.bincount(raw_strata)
+    present = np.flatnonzero(raw_counts)
+    strata = np.searchsorted(present, raw_strata)
+    population = raw_counts[present]
+    
+    rate = np.minimum(1.0, np.maximum(target_rows / total, SAMPLE_MIN_PER_STRATUM / population))
+    keep = np.random.default_rng(seed).random(total, dtype=np.float32) < rate[strata]
+    missed = np.flatnonzero(np.bincount(strata[keep], minlength=len(population)) == 0)
+    if len(missed) > 0:
+        candidates = np.flatnonzero(np.isin(strata, missed))
+        _, first = np.unique(strata[candidates], return_index=True)
+        keep[candidates[first]] = True
+    positions = np.flatnonzero(keep)
+    sampled = np.bincount(strata[positions], minlength=len(population))
+    
+    # Positions within the concatenated ranges back to row_ids
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    owners = np.searchsorted(offsets, positions, side='right') - 1
+    row_ids = np.array([lo for lo, _ in ranges], dtype=np.int64)[owners] + positions - offsets[owners]
+    
+    sample = {'row_id': row_ids}
+    if 'day' in key_codes:
+        day_codes = (day[positions] - 1).astype(float)
+        day_codes[day_codes < 0] = np.nan
+        sample['Date'] = pd.Timestamp(key_codes['day']['origin']) + pd.to_timedelta(day_codes, unit='D')
+    for key in KEY_CODE_COLUMNS:
+        if key in codes:
+            categorical = pd.Categorical.from_codes(np.asarray(codes[key][row_ids]), key_codes[key]['categories'])
+            sample[key] = np.asarray(categorical, dtype=object)
+    store = open_column_store(partition_dir, manifest['version'])
+    for col in values:
+        sample[col] = np.asarray(store[col][row_ids], dtype=np.float64)
+    if 'sentiment_score' in sample:
+        score = sample['sentiment_score']
+        sample['Sentiment'] = np.select([score > 0, score < 0], ['positive', 'negative'], default='neutral')
+    sample['stratum'] = strata[positions]
+    sample['weight'] = population[sample['stratum']] / sampled[sample['stratum']]
+    
+    return {'sample': pd.DataFrame(sample), 'population': population, 'sampled': sampled}
+
+
+def stratified_mean(drawn: Dict[str, Any], column: str) -> tuple:
+    """
+    Stratified estimate of a column's window mean, with its 95% confidence half-width.
+    
+    Var = Σ W_h² (1 − n_h / N_h) s_h² / n_h with W_h = N_h / N; strata with a
+    single sampled row use the pooled within-stratum variance.
+    
+    Args:
+        drawn: Result of stratified_sample
+        column: Numeric column of the sample
+        
+    Returns:
+        (mean, half-width), (0, 0) for an empty window or missing column
+    """
+    rows = drawn['sample']
+    if len(rows) == 0 or column not in rows.columns:
+        return 0.0, 0.0
+    population = drawn['population'].astype(np.float64)
+    sampled = drawn['sampled'].astype(np.float64)
+    values = rows[column].to_numpy(dtype=np.float64)
+    strata = rows['stratum'].to_numpy()
+    
+    means = np.bincount(strata, weights=values, minlength=len(sampled)) / sampled
+    squares = np.bincount(strata, weights=values * values, minlength=len(sampled))
+    deviations = np.maximum(squares - sampled * means ** 2, 0.0)
+    several = sampled > 1
+    pooled = deviations[several].sum() / (sampled[several] - 1).sum() if several.any() else 0.0
+    variances = np.where(several, deviations / np.maximum(sampled - 1, 1), pooled)
+    
+    shares = population / population.sum()
+    mean = float(shares @ means)
+    variance = float(np.sum(shares ** 2 * (1 - sampled / population) * variances / sampled))
+    return mean, _Z_95 * math.sqrt(variance)
+
+
+def sample_aggregates(rows: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    Weighted stand-ins for the window aggregates, in the layout of aggregate_window.
+    
+    Row counts per day and per source are exact, since those are unions of
+    strata; per-country counts and all sums are estimates.
+    """
+    values = [col for col in AGGREGATE_VALUES if col in rows.columns]
+    weighted = rows[values].mul(rows['weight'], axis=0)
+    weighted['rows'] = rows['weight']
+    
+    aggregates = {}
+    for key in AGGREGATE_KEYS:
+        column = 'Date' if key == 'day' else key
+        if column not in rows.columns:
+            aggregates[key] = pd.DataFrame(columns=[key, 'rows'] + values)
+            continue
+        grouped = weighted.groupby(rows[column].rename(key)).sum().reset_index()
+        grouped['rows'] = grouped['rows'].round().astype(np.int64)
+        aggregates[key] = grouped[[key, 'rows'] + values].sort_values(key, ignore_index=True)
+    return aggregates
+
+
+def daily_trend_velocity(daily: pd.DataFrame) -> float:
+    """Trend velocity (see compute_metrics) from a daily aggregate instead of rows."""
+    if daily.empty:
+        return 0
+    today = daily['day'].max()
+    engagement = sum_or_count(daily, 'Engagement')
+    recent = engagement[daily['day'] >= today - timedelta(days=14)].sum()
+    previous = engagement[(daily['day'] >= today - timedelta(days=28)) & (daily['day'] < today - timedelta(days=14))].sum()
+    return ((recent - previous) / previous) * 100 if previous > 0 else 0
+
+
+def approximate_window(manifest: Dict[str, Any], df_totals: pd.DataFrame, brand: Optional[str],
+                       start_date=None, end_date=None, partition_dir: str = PARTITION_DIR) -> Dict[str, Any]:
+    """
+    Sampled stand-in for window_artifacts while the exact window is computed.
+    
+    Returns:
+        {'sample': weighted sample rows, used in place of df_brand;
+        'metrics': the compute_metrics keys plus 'ci' (95% half-widths of the
+        estimated ones); 'aggregates': by 'Source' / 'Country' / 'day';
+        'sampled_rows': sample size}
+    """
+    drawn = stratified_sample(manifest, brand, start_date, end_date, partition_dir=partition_dir)
+    rows = drawn['sample']
+    aggregates = sample_aggregates(rows)
+    mentions = int(drawn['population'].sum())
+    total_mentions = int(df_totals['rows'].sum()) if len(df_totals) > 0 else 0
+    
+    sentiment, sentiment_ci = stratified_mean(drawn, 'sentiment_score')
+    engagement, engagement_ci = stratified_mean(drawn, 'Engagement')
+    reach, reach_ci = stratified_mean(drawn, 'Reach')
+    metrics = {
+        'sentiment_index': ((sentiment + 1) / 2) * 100 if mentions > 0 else 50,
+        # Mention counts come from the search index, so share of voice is exact
+        'share_of_voice': (mentions / total_mentions * 100) if total_mentions > 0 else 0,
+        'trend_velocity': daily_trend_velocity(aggregates['day']),
+        'total_reach': reach * mentions,
+        'total_mentions': mentions,
+        'avg_engagement': engagement,
+    }
+    metrics['health_score'] = health_score(metrics, df_totals)
+    metrics['ci'] = {
+        'sentiment_index': sentiment_ci * 50,
+        'share_of_voice': 0.0,
+        'total_reach': reach_ci * mentions,
+        'avg_engagement': engagement_ci,
+    }
+    return {'sample': rows, 'metrics': metrics, 'aggregates': aggregates, 'sampled_rows': len(rows)}
+
+
+def weighted_value_counts(df: pd.DataFrame, column: str) -> pd.Series:
+    """value_counts of a column, summing the weights of sampled rows (see stratified_sample)."""
+    if 'weight' not in df.columns:
+        return df[column].value_counts()
+    counts = df.groupby(column)['weight'].sum().round().astype(np.int64)
+    return counts.sort_values(ascending=False, kind='stable')
+
+
+@st.cache_resource
+def start_refinement(version: str, brand: Optional[str], start_date=None, end_date=None,
+                     partition_dir: str = PARTITION_DIR) -> threading.Event:
+    """
+    Compute a window's exact artifacts in a background thread, once per window and dataset version.
+    
+    Returns:
+        Event set when the thread is done; the exact window is then cached
+        (unless it failed or exceeded the cache budget, in which case the
+        next script run computes it)
+    """
+    done = threading.Event()
+    
+    def _refine():
+        try:
+            manifest = read_manifest(partition_dir)
+            if manifest is not None and manifest['version'] == version:
+                window_artifacts(manifest, partition_totals(manifest), brand, start_date, end_date, partition_dir)
+        finally:
+            done.set()
+    
+    thread = threading.Thread(target=_refine, name=f"window-refine-{version}", daemon=True)
+    add_script_run_ctx(thread, get_script_run_ctx())
+    thread.start()
+    return done
+
+
+# ============================================================================
+# PROGRESSIVE RENDERING
+# ============================================================================
+
+class RenderScheduler:
+    """
+    Paints page sections as placeholders, then fills them as their inputs are ready.
+    
+    Inputs are computed concurrently on a thread pool, in submission order.
+    Sections are rendered on the script thread (Streamlit elements can only
+    be created there) in priority order: a section waits for its own inputs
+    and for every section of a lower priority value, so the KPI row fills
+    first, and sections of the same priority fill as their inputs complete.
+    """
+    
+    def __init__(self, workers: int = RENDER_WORKERS):
+        ctx = get_script_run_ctx()
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="page-compute",
+            initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx)
+        )
+        self._sections: List[Dict[str, Any]] = []
+    
+    def submit(self, compute: Callable[..., Any], *args) -> Future:
+        """
+        Start computing a section input.
+        
+        A compute function may wait on the result of an earlier submission:
+        submissions start in order, so the one it waits for is already running.
+        """
+        return self._pool.submit(compute, *args)
+    
+    def section(self, title: str, render: Callable[..., None], *inputs: Future, priority: int = 2) -> None:
+        """Reserve a section's place on the page; render(*input results) fills it later."""
+        placeholder = st.empty()
+        placeholder.caption(f"Loading {title}...")
+        self._sections.append({'placeholder': placeholder, 'render': render, 'inputs': inputs,
+                               'priority': priority, 'order': len(self._sections)})
+    
+    def run(self) -> None:
+        """Fill every section, then stop the pool."""
+        pending = list(self._sections)
+        try:
+            while pending:
+                lowest = min(section['priority'] for section in pending)
+                ready = [
+                    section for section in pending
+                    if section['priority'] == lowest and all(future.done() for future in section['inputs'])
+                ]
+                if not ready:
+                    waiting = {
+                        future for section in pending if section['priority'] == lowest
+                        for future in section['inputs'] if not future.done()
+                    }
+                    wait(waiting, return_when=FIRST_COMPLETED)
+                    continue
+                section = min(ready, key=lambda section: section['order'])
+                pending.remove(section)
+                with section['placeholder'].container():
+                    section['render'](*[future.result() for future in section['inputs']])
+        finally:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ============================================================================
+# UI RENDERING FUNCTIONS
+# ============================================================================
+
+def render_sidebar(brand_list: List[str]) -> Dict[str, Any]:
+    """
+    Render sidebar with navigation and filters.
+    
+    Returns:
+        Dictionary of selected filter values
+    """
+    with st.sidebar:
+        st.markdown("<h1 style='text-align: center; margin-left: 0; margin-right: 0;'>Brand ⚡ Brand</h1>", unsafe_allow_html=True)
+        st.markdown("---")
+        
+        # Brand selector - moved above navigation
+        st.markdown("### Brand Selection")
+        selected_brand = st.selectbox(
+            "Select Brand",
+            options=brand_list,
+            key="brand_selector"
+        )
+        
+        st.markdown("---")
         
         # Navigation (static for now)
         st.markdown("### Navigation")
@@ -615,21 +5004,307 @@ def render_sidebar(brand_list: List[str]) -> Dict[str, Any]:
         st.markdown("### Date Range")
         date_range = st.date_input(
             "Select Date Range",
-            value=(datetime.now() - timedelta(days=90), datetime.now()),
+            value=default_date_range(),
             key="date_range"
         )
         
+        approximate_topk = st.toggle(
+            "Approximate top-K (sketches)",
+            key="approximate_topk",
+            help="Top keywords/sources from per-day Space-Saving sketches; distinct counts from HyperLogLog"
+        )
+        
         st.markdown("---")
         st.markdown("<p style='text-align: center; color: #94a3b8; font-size: 0.85rem;'><em>Data updates every hour</em></p>", unsafe_allow_html=True)
     
-    return {
-        'selected_brand': selected_brand,
-        'date_range': date_range
-    }
+    return {
+        'selected_brand': selected_brand,
+        'date_range': date_range,
+        'approximate_topk': approximate_topk
+    }
+
+
+def render_cache_stats(stats: Dict[str, Any]):
+    """Render artifact cache usage in the sidebar for container sizing."""
+    with st.sidebar:
+        with st.expander("Cache", expanded=False):
+            st.caption(
+                f"{stats['current_bytes'] / 1024 / 1024:,.1f} / {stats['budget_bytes'] / 1024 / 1024:,.0f} MB · "
+                f"{stats['entries']:,} entries · {stats['hit_rate'] * 100:.0f}% hit rate · "
+                f"{stats['evictions']:,} evictions"
+            )
+            for kind, kind_stats in sorted(stats['by_kind'].items()):
+                st.caption(f"{kind}: {kind_stats['entries']:,} entries, {kind_stats['bytes'] / 1024:,.1f} KB")
+            if stats['disk'] is not None:
+                disk = stats['disk']
+                st.caption(
+                    f"disk: {disk['hits']:,} hits · {disk['misses']:,} misses · "
+                    f"{disk['writes']:,} writes · {disk['corrupt']:,} failed integrity check"
+                )
+
+
+def render_mention_search(manifest: Dict[str, Any], selected_brand: Optional[str], start_date, end_date):
+    """Render the mention search box and a paginated table of matching mentions."""
+    st.markdown("### Mention Search")
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        query = st.text_input(
+            "Search headlines and text",
+            placeholder='e.g. earnings or "market impact"',
+            key="mention_query"
+        )
+    with col2:
+        sentiments = st.multiselect("Sentiment", SENTIMENT_LABELS, key="mention_sentiment")
+    
+    if not query.strip():
+        st.caption("Search Headline, Opening Text and Hit Sentence within the selected brand and date range.")
+        return
+    
+    started = time.perf_counter()
+    row_ids = get_artifact_cache().get_or_compute(
+        'search', (selected_brand, start_date, end_date, query.strip().lower(), tuple(sorted(sentiments))),
+        manifest['version'],
+        lambda: search_mentions(manifest, query, selected_brand, start_date, end_date, sentiments)
+    )
+    
+    total = len(row_ids)
+    if total == 0:
+        st.info("No matching mentions")
+        return
+    
+    pages = math.ceil(total / MENTION_PAGE_SIZE)
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key="mention_page")
+    page_ids = row_ids[(page - 1) * MENTION_PAGE_SIZE:page * MENTION_PAGE_SIZE]
+    page_rows = fetch_rows(manifest, page_ids, MENTION_TABLE_COLUMNS).drop(columns='row_id')
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    
+    st.caption(f"{total:,} matching mentions · page {page} of {pages} · {elapsed_ms:.0f} ms")
+    st.dataframe(page_rows, use_container_width=True, hide_index=True)
+
+
+def render_theme_associations(manifest: Dict[str, Any], selected_brand: Optional[str], start_date, end_date):
+    """Render the hashtags/keywords that travel with a selected theme, ranked by lift."""
+    st.markdown("### Theme Associations")
+    
+    cooccurrence = get_artifact_cache().get_or_compute(
+        'cooccurrence', (selected_brand, start_date, end_date), manifest['version'],
+        lambda: theme_cooccurrence(manifest, selected_brand, start_date, end_date)
+    )
+    if len(cooccurrence['terms']) == 0:
+        st.info("No hashtags or keywords in the selected range")
+        return
+    
+    top = np.argsort(-cooccurrence['counts'], kind='stable')[:THEME_SELECT_TERMS]
+    options = cooccurrence['terms'][top].tolist()
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        term = st.selectbox("Theme (#hashtag or keyword)", options, key="theme_term")
+    with col2:
+        kind = st.selectbox("Show", ['All', 'Hashtags', 'Keywords'], key="theme_kind")
+    
+    associated = associated_terms(cooccurrence, term, n=len(cooccurrence['terms']))
+    if kind == 'Hashtags':
+        associated = associated[associated['term'].str.startswith('#')]
+    elif kind == 'Keywords':
+        associated = associated[~associated['term'].str.startswith('#')]
+    
+    count = int(cooccurrence['counts'][np.searchsorted(cooccurrence['terms'], term)])
+    st.caption(
+        f"'{term}' appears in {count:,} of {cooccurrence['mentions']:,} mentions · "
+        f"pairs seen in at least {THEME_MIN_SUPPORT} mentions, by lift"
+    )
+    if associated.empty:
+        st.info("No themes co-occur often enough with this one")
+        return
+    st.dataframe(
+        pd.DataFrame({
+            'Theme': associated['term'].head(15),
+            'Co-mentions': associated['co_mentions'].head(15),
+            'Confidence': (associated['confidence'].head(15) * 100).round(1).astype(str) + '%',
+            'Lift': associated['lift'].head(15).round(2),
+        }),
+        use_container_width=True,
+        hide_index=True
+    )
+
+
+def render_distinctive_terms(distinctive: pd.DataFrame, selected_brand: Optional[str]):
+    """Render the themes that set the selected brand (or each brand) apart from the others."""
+    st.markdown("### Distinctive Keywords")
+    st.caption("Themes scored by TF-IDF across brands over the full history: common to every brand scores 0")
+    
+    if selected_brand is None:
+        top = distinctive.groupby('brand', sort=True).head(8)
+        if top.empty:
+            st.info("No distinctive keywords available")
+            return
+        table = {brand: group['term'].tolist() for brand, group in top.groupby('brand', sort=True)}
+        st.dataframe(pd.DataFrame({brand: pd.Series(terms) for brand, terms in table.items()}),
+                     use_container_width=True, hide_index=True)
+        return
+    
+    top = distinctive[distinctive['brand'] == selected_brand].head(15)
+    if top.empty:
+        st.info("No distinctive keywords for this brand")
+        return
+    
+    fig = go.Figure(go.Bar(
+        x=top['score'],
+        y=top['term'],
+        orientation='h',
+        marker_color='#8b5cf6',
+        customdata=np.stack([top['brand_share'] * 100, top['others_share'] * 100, top['mentions']], axis=1),
+        hovertemplate=('<b>%{y}</b><br>Score: %{x:.3f}<br>In %{customdata[0]:.1f}% of this brand\'s mentions'
+                       ' (%{customdata[2]:,.0f})<br>In %{customdata[1]:.1f}% of other brands\' mentions<extra></extra>')
+    ))
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#f1f5f9'),
+        showlegend=False,
+        height=420,
+        margin=dict(l=20, r=20, t=20, b=20),
+        xaxis=dict(gridcolor='#334155', title='Distinctiveness (TF-IDF)'),
+        yaxis=dict(gridcolor='#334155', autorange='reversed')
+    )
+    render_chart(fig, "Distinctive Keywords")
+
+
+def render_mentions_explorer(manifest: Dict[str, Any], selected_brand: Optional[str], start_date, end_date):
+    """Render a server-side sorted and paginated table of the mentions in the current window."""
+    st.markdown("### Mentions Explorer")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        sort_key = st.selectbox("Sort by", EXPLORER_SORT_KEYS, key="explorer_sort")
+    with col2:
+        direction = st.selectbox("Order", ["Descending", "Ascending"], key="explorer_order")
+    with col3:
+        page_size = st.selectbox("Rows per page", EXPLORER_PAGE_SIZES, key="explorer_page_size")
+    
+    descending = direction == "Descending"
+    row_ids = get_artifact_cache().get_or_compute(
+        'explorer', (selected_brand, start_date, end_date, sort_key, descending), manifest['version'],
+        lambda: explore_mentions(manifest, selected_brand, start_date, end_date, sort_key, descending)
+    )
+    
+    total = len(row_ids)
+    if total == 0:
+        st.info("No mentions in the selected range")
+        return
+    
+    pages = math.ceil(total / page_size)
+    with col4:
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key="explorer_page")
+    
+    first = (page - 1) * page_size
+    page_rows = fetch_rows(manifest, row_ids[first:first + page_size], MENTION_TABLE_COLUMNS).drop(columns='row_id')
+    
+    st.caption(f"Showing {first + 1:,}–{first + len(page_rows):,} of {total:,} mentions")
+    st.dataframe(page_rows, use_container_width=True, hide_index=True)
+
+
+def render_warmup_status(progress: WarmupProgress):
+    """Render cache warm-up progress in the sidebar until every brand is warm."""
+    status = progress.snapshot()
+    with st.sidebar:
+        if not status['ready']:
+            fraction = status['done'] / status['brands'] if status['brands'] else 0.0
+            st.progress(fraction, text=f"Warming caches: {status['done']}/{status['brands']} brands")
+        elif status['error']:
+            st.caption(f"Cache warm-up stopped after {status['done']}/{status['brands']} brands: {status['error']}")
+        else:
+            st.caption(f"Caches warm: {status['brands']} brands in {status['elapsed_seconds']:.1f} s")
+
+
+def render_ingest_report(manifest: Dict[str, Any]):
+    """Render per-source row and duplicate counts from the last ingest in the sidebar."""
+    with st.sidebar:
+        with st.expander("Sources", expanded=False):
+            for source in manifest.get('ingest_report', []):
+                if source.get('error'):
+                    st.caption(f"{Path(source['path']).name}: not loaded ({source['error']})")
+                    continue
+                st.caption(
+                    f"{Path(source['path']).name}: {source['rows']:,} rows, "
+                    f"{source['duplicates']:,} duplicates dropped"
+                )
+
+
+def render_anomaly_panel(anomalies: Dict[str, Any], selected_brand: Optional[str], start_date, end_date):
+    """Render the most recent anomalies of the selected brand (or all brands) within the date range."""
+    st.markdown("### Signal Alerts")
+    alerts = anomalies['alerts']
+    if selected_brand is not None:
+        alerts = alerts[alerts['brand'] == selected_brand]
+    if start_date is not None:
+        alerts = alerts[alerts['day'] >= pd.Timestamp(start_date)]
+    if end_date is not None:
+        alerts = alerts[alerts['day'] <= pd.Timestamp(end_date)]
+    
+    last_day = anomalies['last_day'].strftime('%Y-%m-%d') if anomalies['last_day'] is not None else 'n/a'
+    st.caption(
+        f"{anomalies['series']:,} brand × metric series scored daily through {last_day} · "
+        f"flagged when EWMA and robust |z| ≥ {ANOMALY_Z_THRESHOLD:g}"
+    )
+    if alerts.empty:
+        st.info("No anomalies in the selected range")
+        return
+    
+    recent = alerts.sort_values('day', ascending=False, kind='stable').head(ANOMALY_PANEL_ROWS)
+    st.dataframe(
+        pd.DataFrame({
+            'Day': recent['day'].dt.strftime('%Y-%m-%d'),
+            'Brand': recent['brand'],
+            'Signal': recent['metric'].map(ANOMALY_METRICS),
+            'Direction': recent['direction'].str.title(),
+            'Value': recent['value'].round(1),
+            'Expected': recent['expected'].round(1),
+            'EWMA z': recent['ewma_z'].round(1),
+            'Robust z': recent['robust_z'].round(1),
+        }),
+        use_container_width=True,
+        hide_index=True
+    )
+
+
+@st.fragment(run_every=SAMPLE_REFRESH_SECONDS)
+def render_approximate_badge(approximate: Dict[str, Any], refinement: threading.Event):
+    """
+    "Approximate" badge with the sample's confidence intervals (see PROGRESSIVE SAMPLING).
+    
+    Checks for the exact window every SAMPLE_REFRESH_SECONDS and reruns the
+    page once it is ready, replacing the estimates in place.
+    """
+    if refinement.is_set():
+        st.rerun()
+    
+    metrics = approximate['metrics']
+    ci = metrics['ci']
+    st.markdown(
+        "<span style='background: #fbbf24; color: #1e293b; padding: 3px 10px; border-radius: 10px; "
+        "font-size: 0.8rem; font-weight: 700;'>APPROXIMATE</span>",
+        unsafe_allow_html=True
+    )
+    st.caption(
+        f"Sample of {approximate['sampled_rows']:,} of {metrics['total_mentions']:,} mentions, stratified by "
+        f"day and source (95% intervals): sentiment index {metrics['sentiment_index']:.1f} ± "
+        f"{ci['sentiment_index']:.1f} · avg engagement {metrics['avg_engagement']:,.1f} ± "
+        f"{ci['avg_engagement']:,.1f} · total reach {metrics['total_reach']:,.0f} ± {ci['total_reach']:,.0f} · "
+        f"share of voice {metrics['share_of_voice']:.1f}% (exact). Computing exact values..."
+    )
 
 
-def render_kpis(metrics: Dict[str, Any], df_brand: pd.DataFrame, df_all: pd.DataFrame, selected_brand: str):
-    """Render top KPI row with gauge visualizations and keywords block."""
+def render_kpis(metrics: Dict[str, Any], df_brand: pd.DataFrame, df_totals: pd.DataFrame, selected_brand: str,
+                keyword_counts: Optional[pd.Series] = None, daily: Optional[pd.DataFrame] = None):
+    """
+    Render top KPI row with gauge visualizations and keywords block.
+    
+    keyword_counts overrides the exact keyword counts (e.g. with sketch estimates).
+    daily (aggregate_window by 'day') feeds the time series and monthly share
+    of voice instead of df_brand rows.
+    """
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
@@ -637,8 +5312,13 @@ def render_kpis(metrics: Dict[str, Any], df_brand: pd.DataFrame, df_all: pd.Data
         
         # Calculate daily sentiment scores for line chart
         if len(df_brand) > 0 and 'Date' in df_brand.columns:
-            daily_sentiment = df_brand.groupby(df_brand['Date'].dt.date)['sentiment_score'].mean()
-            daily_sentiment_index = ((daily_sentiment + 1) / 2) * 100
+            if daily is not None:
+                resolution = choose_resolution(daily['day'])
+                daily_sentiment = rollup_daily(daily, 'sentiment_score', 'mean', resolution)
+            else:
+                resolution = choose_resolution(df_brand['Date'])
+                daily_sentiment = bucket_series(df_brand, 'sentiment_score', 'mean', resolution)
+            daily_sentiment_index = lttb(((daily_sentiment + 1) / 2) * 100)
             
             fig_sentiment = go.Figure()
             
@@ -703,18 +5383,23 @@ def render_kpis(metrics: Dict[str, Any], df_brand: pd.DataFrame, df_all: pd.Data
             showlegend=False
         )
         
-        st.plotly_chart(fig_sentiment, use_container_width=True)
+        render_chart(fig_sentiment, "Sentiment Index")
     
     with col2:
         st.markdown("#### Trend Velocity")
         
         # Calculate daily engagement trend for velocity visualization
         if len(df_brand) > 0 and 'Date' in df_brand.columns and 'Engagement' in df_brand.columns:
-            daily_engagement = df_brand.groupby(df_brand['Date'].dt.date)['Engagement'].sum()
+            if daily is not None:
+                resolution = choose_resolution(daily['day'])
+                daily_engagement = rollup_daily(daily, 'Engagement', 'sum', resolution)
+            else:
+                resolution = choose_resolution(df_brand['Date'])
+                daily_engagement = bucket_series(df_brand, 'Engagement', 'sum', resolution)
             
             # Calculate rolling percentage change
             if len(daily_engagement) > 1:
-                velocity_trend = daily_engagement.pct_change(fill_method=None).fillna(0) * 100
+                velocity_trend = lttb(daily_engagement.pct_change(fill_method=None).fillna(0) * 100)
                 
                 fig_velocity = go.Figure()
                 
@@ -798,30 +5483,31 @@ def render_kpis(metrics: Dict[str, Any], df_brand: pd.DataFrame, df_all: pd.Data
             showlegend=False
         )
         
-        st.plotly_chart(fig_velocity, use_container_width=True)
+        render_chart(fig_velocity, "Trend Velocity")
     
     with col3:
         st.markdown("#### Share of Voice")
         
         # Calculate share of voice over time for selected brand (monthly aggregation)
-        if len(df_brand) > 0 and 'Date' in df_brand.columns and 'brand' in df_all.columns:
+        if len(df_brand) > 0 and 'Date' in df_brand.columns and len(df_totals) > 0:
             # Group by month and calculate monthly share of voice
-            df_all_with_date = df_all[df_all['Date'].notna()].copy()
-            
-            # Create month-year column for grouping
-            df_brand_copy = df_brand.copy()
-            df_brand_copy['Month'] = df_brand_copy['Date'].dt.to_period('M')
-            df_all_with_date['Month'] = df_all_with_date['Date'].dt.to_period('M')
+            dated_totals = df_totals[df_totals['month'] != UNDATED_PARTITION]
             
             # Get monthly mention counts for selected brand and all brands
-            monthly_brand_mentions = df_brand_copy.groupby('Month').size()
-            monthly_total_mentions = df_all_with_date.groupby('Month').size()
+            if daily is not None:
+                monthly_brand_mentions = daily.groupby(daily['day'].dt.to_period('M'))['rows'].sum()
+            else:
+                monthly_brand_mentions = df_brand.groupby(df_brand['Date'].dt.to_period('M')).size()
+            monthly_total_mentions = dated_totals.groupby('month')['rows'].sum()
+            monthly_total_mentions.index = pd.PeriodIndex(monthly_total_mentions.index, freq='M')
             
-            # Calculate monthly share of voice percentage
+            # Calculate monthly share of voice percentage, downsampled (not truncated)
+            # so the whole history stays on the chart
             monthly_sov = (monthly_brand_mentions / monthly_total_mentions * 100).fillna(0)
+            monthly_sov = lttb(monthly_sov.set_axis(monthly_sov.index.to_timestamp()))
             
-            # Convert period index to string for plotting
-            months_str = [str(m) for m in monthly_sov.index]
+            # Convert month starts to labels for plotting
+            months_str = [m.strftime('%Y-%m') for m in monthly_sov.index]
             
             fig_sov = go.Figure()
             
@@ -873,28 +5559,18 @@ def render_kpis(metrics: Dict[str, Any], df_brand: pd.DataFrame, df_all: pd.Data
             showlegend=False
         )
         
-        st.plotly_chart(fig_sov, use_container_width=True)
+        render_chart(fig_sov, "Share of Voice")
     
     with col4:
         st.markdown("#### Top Keywords")
         
         # Extract keywords
-        keywords_list = []
-        if len(df_brand) > 0:
-            if 'Key Phrases' in df_brand.columns:
-                for phrases in df_brand['Key Phrases'].dropna():
-                    if isinstance(phrases, str) and phrases:
-                        keywords_list.extend([kw.strip().lower() for kw in phrases.replace(';', ',').split(',') if kw.strip()])
-            
-            if 'Keywords' in df_brand.columns:
-                for keywords in df_brand['Keywords'].dropna():
-                    if isinstance(keywords, str) and keywords:
-                        keywords_list.extend([kw.strip().lower() for kw in keywords.replace(';', ',').split(',') if kw.strip()])
+        if keyword_counts is None:
+            keyword_counts = exact_top_counts(df_brand, 'keywords', 8) if len(df_brand) > 0 else pd.Series(dtype=np.int64)
+        keyword_counts = keyword_counts.head(8)
         
         # Display keywords in pastel yellow blocks
-        if keywords_list:
-            keyword_counts = pd.Series(keywords_list).value_counts().head(8)
-            
+        if len(keyword_counts) > 0:
             # Create HTML for keyword tags
             keywords_html = '<div style="display: flex; flex-wrap: wrap; gap: 8px; margin-top: 10px;">'
             for keyword in keyword_counts.index:
@@ -966,7 +5642,7 @@ def render_main_charts(df_brand: pd.DataFrame, metric_name: str):
                 yaxis=dict(gridcolor='#334155')
             )
             
-            st.plotly_chart(fig, use_container_width=True)
+            render_chart(fig, "Channel Performance")
         else:
             st.info("No channel data available")
     
@@ -1005,7 +5681,7 @@ def render_main_charts(df_brand: pd.DataFrame, metric_name: str):
                 yaxis=dict(gridcolor='#334155')
             )
             
-            st.plotly_chart(fig, use_container_width=True)
+            render_chart(fig, "Geo Sentiment")
         else:
             st.info("No geographic data available")
 
@@ -1056,7 +5732,7 @@ def render_keywords_section(df_brand: pd.DataFrame):
                 yaxis=dict(gridcolor='#334155', autorange='reversed')
             )
             
-            st.plotly_chart(fig_keywords, use_container_width=True)
+            render_chart(fig_keywords, "Top Keywords")
             
             # Top 10 keywords table with counts
             st.markdown("#### Top Keywords Summary")
@@ -1181,6 +5857,34 @@ def render_right_sidebar(df_brand: pd.DataFrame, metrics: Dict[str, Any]):
     st.markdown(sidebar_html, unsafe_allow_html=True)
 
 
+def render_health_trend(trend: pd.Series):
+    """Render a compact health score trend line (see health_trend)."""
+    if len(trend) < 2:
+        st.caption("Not enough history for a health score trend")
+        return
+    
+    fig_health = go.Figure(go.Scatter(
+        x=trend.index,
+        y=trend.values,
+        mode='lines+markers' if len(trend) <= 31 else 'lines',
+        line=dict(color='#8b5cf6', width=2),
+        marker=dict(size=4, color='#8b5cf6'),
+        hovertemplate='%{x|%Y-%m-%d}<br>Health Score: %{y:.1f}<extra></extra>'
+    ))
+    fig_health.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#f1f5f9', size=10),
+        showlegend=False,
+        height=130,
+        margin=dict(l=5, r=5, t=5, b=5),
+        xaxis=dict(gridcolor='#334155', showticklabels=False),
+        yaxis=dict(gridcolor='#334155', range=[0, 100])
+    )
+    render_chart(fig_health, "Health Score Trend", key="health_trend")
+    st.caption(f"{'Daily' if trend.name == 'D' else 'Weekly'} health score, normalized against all brands per period")
+
+
 def render_right_panel(df_brand: pd.DataFrame, metrics: Dict[str, Any]):
     """Render right sidebar with Live Metrics."""
     st.markdown('<div style="position: sticky; top: 20px;">', unsafe_allow_html=True)
@@ -1233,7 +5937,7 @@ def render_right_panel(df_brand: pd.DataFrame, metrics: Dict[str, Any]):
         margin=dict(l=5, r=5, t=5, b=5)
     )
     
-    st.plotly_chart(fig_gauge, use_container_width=True)
+    render_chart(fig_gauge, "Health Score Gauge")
     
     st.markdown("---")
     
@@ -1245,7 +5949,8 @@ def render_right_panel(df_brand: pd.DataFrame, metrics: Dict[str, Any]):
         last_7_days = df_brand[df_brand['Date'] >= (today - timedelta(days=7))]
         
         if len(last_7_days) > 0:
-            trend_data = last_7_days.groupby('Date')['Engagement'].sum().reset_index() if 'Engagement' in df_brand.columns else last_7_days.groupby('Date').size().reset_index(name='Engagement')
+            days = last_7_days['Date'].dt.floor('D').rename('Date')
+            trend_data = last_7_days.groupby(days)['Engagement'].sum().reset_index() if 'Engagement' in df_brand.columns else last_7_days.groupby(days).size().reset_index(name='Engagement')
             
             fig_trend = px.line(
                 trend_data,
@@ -1268,7 +5973,7 @@ def render_right_panel(df_brand: pd.DataFrame, metrics: Dict[str, Any]):
                 yaxis=dict(gridcolor='#334155')
             )
             
-            st.plotly_chart(fig_trend, use_container_width=True)
+            render_chart(fig_trend, "7-Day Trend")
         else:
             st.info("No recent data")
     
@@ -1278,7 +5983,7 @@ def render_right_panel(df_brand: pd.DataFrame, metrics: Dict[str, Any]):
     st.markdown("#### Sentiment")
     
     if len(df_brand) > 0 and 'Sentiment' in df_brand.columns:
-        sentiment_dist = df_brand['Sentiment'].value_counts()
+        sentiment_dist = cap_categories(df_brand['Sentiment'].value_counts(), PIE_MAX_SLICES)
         
         fig_sentiment_pie = px.pie(
             values=sentiment_dist.values,
@@ -1288,7 +5993,8 @@ def render_right_panel(df_brand: pd.DataFrame, metrics: Dict[str, Any]):
                 'positive': '#10b981',
                 'neutral': '#fbbf24',
                 'negative': '#ef4444',
-                'unknown': '#94a3b8'
+                'unknown': '#94a3b8',
+                'Other': '#64748b'
             }
         )
         
@@ -1301,7 +6007,7 @@ def render_right_panel(df_brand: pd.DataFrame, metrics: Dict[str, Any]):
             margin=dict(l=5, r=5, t=5, b=5)
         )
         
-        st.plotly_chart(fig_sentiment_pie, use_container_width=True)
+        render_chart(fig_sentiment_pie, "Sentiment Pie")
     
     st.markdown("---")
     
@@ -1377,55 +6083,8 @@ def render_recommendations(df_brand: pd.DataFrame, metrics: Dict[str, Any]):
     st.markdown('</div>', unsafe_allow_html=True)
 
 
-# ============================================================================
-# MAIN APPLICATION
-# ============================================================================
-
-def main():
-    """Main application entry point."""
-    
-    # Load and prepare data
-    with st.spinner("Loading data sources..."):
-        df_all = load_data(DATA_SOURCES)
-        df_all = prepare_data(df_all)
-    
-    if df_all.empty:
-        st.error("No data loaded. Please check your DATA_SOURCES configuration.")
-        st.info("Make sure the CSV/JSON files exist and the paths are correct.")
-        return
-    
-    # Get brand list
-    brand_list = get_brand_list(df_all)
-    
-    # Render sidebar and get filters
-    filters = render_sidebar(brand_list)
-    
-    # Filter data by selected brand
-    if filters['selected_brand'] and filters['selected_brand'] != 'No brands found':
-        df_brand = df_all[df_all['brand'] == filters['selected_brand']].copy()
-    else:
-        df_brand = df_all.copy()
-    
-    # Apply date filter
-    if 'Date' in df_brand.columns and len(filters['date_range']) == 2:
-        start_date, end_date = filters['date_range']
-        df_brand = df_brand[(df_brand['Date'] >= pd.Timestamp(start_date)) & 
-                           (df_brand['Date'] <= pd.Timestamp(end_date))]
-    
-    # Compute metrics
-    metrics = compute_metrics(df_brand, df_all)
-    
-    # Main layout
-    st.markdown("# Brand Analytics Dashboard")
-    st.markdown(f"### {filters['selected_brand']}")
-    st.markdown("---")
-    
-    # Top KPI row with keywords
-    render_kpis(metrics, df_brand, df_all, filters['selected_brand'])
-    
-    st.markdown("<br>", unsafe_allow_html=True)
-    
-    # Main charts section - Enhanced Channel Performance
+def render_performance_overview(by_source: pd.DataFrame):
+    """Render channel mentions, engagement and reach from the window's 'Source' aggregate."""
     st.markdown("---")
     st.markdown("### Performance Overview")
     
@@ -1435,14 +6094,14 @@ def main():
     with col1:
         st.markdown("#### Channel Mentions & Engagement")
         
-        if len(df_brand) > 0 and 'Source' in df_brand.columns:
-            # Aggregate data by channel
-            channel_data = df_brand.groupby('Source').agg({
-                'Sentiment': 'count',  # Mentions
-                'Engagement': 'sum' if 'Engagement' in df_brand.columns else 'count'
-            }).reset_index()
-            channel_data.columns = ['Channel', 'Mentions', 'Total_Engagement']
-            channel_data = channel_data.sort_values('Mentions', ascending=False).head(10)
+        if not by_source.empty:
+            # Channel rows and engagement
+            channel_data = pd.DataFrame({
+                'Channel': by_source['Source'],
+                'Mentions': by_source['rows'],
+                'Total_Engagement': sum_or_count(by_source, 'Engagement'),
+            })
+            channel_data = channel_data.sort_values('Mentions', ascending=False, kind='stable').head(10)
             
             # Create bar chart with line overlay
             fig = go.Figure()
@@ -1478,20 +6137,20 @@ def main():
                 legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
             )
             
-            st.plotly_chart(fig, use_container_width=True)
+            render_chart(fig, "Channel Mentions & Engagement")
         else:
             st.info("No channel data available")
     
     with col2:
         st.markdown("#### Channel Reach")
         
-        if len(df_brand) > 0 and 'Source' in df_brand.columns:
-            # Aggregate reach by channel
-            channel_reach = df_brand.groupby('Source').agg({
-                'Reach': 'sum' if 'Reach' in df_brand.columns else 'count'
-            }).reset_index()
-            channel_reach.columns = ['Channel', 'Total_Reach']
-            channel_reach = channel_reach.sort_values('Total_Reach', ascending=False).head(10)
+        if not by_source.empty:
+            # Reach by channel
+            channel_reach = pd.DataFrame({
+                'Channel': by_source['Source'],
+                'Total_Reach': sum_or_count(by_source, 'Reach'),
+            })
+            channel_reach = channel_reach.sort_values('Total_Reach', ascending=False, kind='stable').head(10)
             
             # Create bar chart
             fig = go.Figure()
@@ -1515,131 +6174,223 @@ def main():
                 showlegend=False
             )
             
-            st.plotly_chart(fig, use_container_width=True)
+            render_chart(fig, "Channel Reach")
         else:
             st.info("No channel data available")
+
+
+def _set_geo_path(path: tuple):
+    """Drill the geographic chart to a place path (() for the world)."""
+    st.session_state['geo_path'] = path
+
+
+def _drill_geo(chart_key: str, path: tuple, drillable: set):
+    """Chart selection callback: drill into the clicked place."""
+    points = st.session_state[chart_key]['selection']['points']
+    if points and points[0].get('x') in drillable:
+        _set_geo_path(path + (points[0]['x'],))
+
+
+def render_geographic_sentiment(geo: Dict[tuple, pd.DataFrame]):
+    """
+    Render average sentiment per place, drilling down GEO_LEVELS on click.
     
-    # Second row - Geographic Sentiment (full width)
+    Clicking a bar shows the places inside it and the breadcrumb goes back
+    up; every level is a lookup in the window's precomputed geo_hierarchy.
+    """
     st.markdown("#### Geographic Sentiment Distribution")
     
-    if len(df_brand) > 0 and 'Country' in df_brand.columns:
-        geo_data = df_brand.groupby('Country').agg({
-            'sentiment_score': 'mean',
-            'Sentiment': 'count'
-        }).reset_index()
-        geo_data.columns = ['Country', 'Avg_Sentiment', 'Mentions']
-        geo_data = geo_data[geo_data['Country'] != 'Unknown'].sort_values('Mentions', ascending=False).head(15)
-        
-        fig = px.bar(
-            geo_data,
-            x='Country',
-            y='Avg_Sentiment',
-            color='Avg_Sentiment',
-            title='Average Sentiment by Country',
-            color_continuous_scale=['#ef4444', '#fbbf24', '#10b981'],
-            color_continuous_midpoint=0,
-            hover_data={'Mentions': True}
-        )
-        
-        fig.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font=dict(color='#f1f5f9'),
-            showlegend=False,
-            height=400,
-            margin=dict(l=20, r=20, t=40, b=20),
-            xaxis=dict(gridcolor='#334155', tickangle=45),
-            yaxis=dict(gridcolor='#334155')
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
-    else:
+    if not geo:
         st.info("No geographic data available")
+        return
     
-    st.markdown("<br>", unsafe_allow_html=True)
+    # A place drilled into earlier may not be in the current window
+    path = tuple(st.session_state.get('geo_path', ()))
+    if path not in geo:
+        path = ()
+    level = GEO_LEVELS[len(path)]
+    children = geo[path].head(GEO_CHART_BARS)
+    
+    crumbs = [('All countries', ())] + [(place, path[:depth + 1]) for depth, place in enumerate(path)]
+    for col, (label, target) in zip(st.columns(len(GEO_LEVELS)), crumbs):
+        with col:
+            st.button(label, key=f"geo_crumb_{len(target)}", on_click=_set_geo_path, args=(target,),
+                      disabled=target == path, use_container_width=True)
+    
+    geo_data = pd.DataFrame({
+        level: children['place'],
+        'Avg_Sentiment': children['avg_sentiment'],
+        'Mentions': children['mentions'],
+        'Reach': children['reach'],
+    })
+    fig = px.bar(
+        geo_data,
+        x=level,
+        y='Avg_Sentiment',
+        color='Avg_Sentiment',
+        title=f"Average Sentiment by {level}" + (f" in {path[-1]}" if path else ""),
+        color_continuous_scale=['#ef4444', '#fbbf24', '#10b981'],
+        color_continuous_midpoint=0,
+        hover_data={'Mentions': True, 'Reach': ':,.0f'}
+    )
+    
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#f1f5f9'),
+        showlegend=False,
+        height=400,
+        margin=dict(l=20, r=20, t=40, b=20),
+        xaxis=dict(gridcolor='#334155', tickangle=45),
+        yaxis=dict(gridcolor='#334155')
+    )
+    
+    # One chart key per place, so a new level starts without a selection
+    chart_key = "geo_chart_" + hashlib.sha1(repr(path).encode('utf-8')).hexdigest()[:12]
+    drillable = set(children.loc[children['drillable'], 'place'])
+    render_chart(fig, "Geographic Sentiment", key=chart_key, selection_mode='points',
+                 on_select=functools.partial(_drill_geo, chart_key, path, drillable))
+    if drillable:
+        st.caption(f"Click a bar to see its {GEO_LEVELS[len(path) + 1].lower()} breakdown")
+
+
+def render_live_metrics(scheduler: 'RenderScheduler', brand_metrics: Future, brand_rows: Future,
+                        health: Future, sketches: Future):
+    """
+    Lay out the Live Metrics row, each part as its own scheduler section.
     
-    # Live Metrics Section
+    The KPI numbers only wait for the window metrics; the health trend,
+    sentiment distribution, top sources (from sketches when given) and the
+    heavy hitters fill in as their own inputs complete.
+    """
     st.markdown("### Live Metrics")
     
     col1, col2, col3 = st.columns(3)
     
     with col1:
         st.markdown("<p style='text-align: center; color: #f1f5f9; font-size: 1.1rem; font-weight: 700; margin-bottom: 15px;'>REAL-TIME KPIs</p>", unsafe_allow_html=True)
-        st.metric("Total Mentions", f"{metrics['total_mentions']:,}")
-        st.metric("Total Reach", f"{metrics['total_reach']:,.0f}")
-        st.metric("Avg Engagement", f"{metrics['avg_engagement']:,.1f}")
-        st.metric("Health Score", f"{metrics['health_score']:.1f}/100")
+        scheduler.section("live KPIs", render_live_kpis, brand_metrics, priority=1)
+        scheduler.section("health trend", render_health_trend, health)
     
     with col2:
         st.markdown("<p style='text-align: center; color: #f1f5f9; font-size: 1.1rem; font-weight: 700; margin-bottom: 15px;'>SENTIMENT DISTRIBUTION</p>", unsafe_allow_html=True)
-        if len(df_brand) > 0 and 'Sentiment' in df_brand.columns:
-            sentiment_dist = df_brand['Sentiment'].value_counts()
-            fig_sentiment = go.Figure(data=[go.Pie(
-                labels=sentiment_dist.index,
-                values=sentiment_dist.values,
-                hole=0.4,
-                marker=dict(colors=['#10b981', '#fbbf24', '#ef4444', '#94a3b8'])
-            )])
-            fig_sentiment.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                font=dict(color='#f1f5f9'),
-                height=280,
-                margin=dict(t=10, b=10, l=10, r=10),
-                showlegend=True
-            )
-            st.plotly_chart(fig_sentiment, use_container_width=True, key="live_sentiment")
+        scheduler.section("sentiment distribution", render_live_sentiment, brand_rows)
     
     with col3:
         st.markdown("<p style='text-align: center; color: #f1f5f9; font-size: 1.1rem; font-weight: 700; margin-bottom: 15px;'>TOP SOURCES</p>", unsafe_allow_html=True)
-        if len(df_brand) > 0 and 'Source' in df_brand.columns:
-            top_sources = df_brand['Source'].value_counts().head(5)
-            for idx, (source, count) in enumerate(top_sources.items(), 1):
-                # Single color for all sources - blue
-                color = '#3b82f6'
-                st.markdown(f"""
-                    <div style="background: linear-gradient(135deg, #1e293b 0%, #0f172a 100%); 
-                                border-radius: 8px; 
-                                padding: 12px 15px; 
-                                margin: 8px 0; 
-                                border-left: 3px solid {color}; 
-                                display: flex; 
-                                justify-content: space-between; 
-                                align-items: center;">
-                        <div>
-                            <span style="background: {color}; 
-                                        color: #ffffff; 
-                                        padding: 2px 8px; 
-                                        border-radius: 4px; 
-                                        font-size: 0.75rem; 
-                                        font-weight: 700; 
-                                        margin-right: 10px;">#{idx}</span>
-                            <span style="color: #f1f5f9; 
-                                        font-weight: 600; 
-                                        font-size: 0.95rem;">{source}</span>
-                        </div>
-                        <span style="color: #94a3b8; 
+        scheduler.section("top sources", render_top_sources, brand_rows, sketches)
+    
+    scheduler.section("heavy hitters", render_heavy_hitters, sketches)
+
+
+def render_live_kpis(metrics: Dict[str, Any]):
+    """Render the Live Metrics KPI numbers (with 95% intervals when sampled)."""
+    st.metric("Total Mentions", f"{metrics['total_mentions']:,}")
+    ci = metrics.get('ci')
+    st.metric("Total Reach", f"{metrics['total_reach']:,.0f}",
+              help=f"Estimate ± {ci['total_reach']:,.0f} (95%)" if ci else None)
+    st.metric("Avg Engagement", f"{metrics['avg_engagement']:,.1f}",
+              help=f"Estimate ± {ci['avg_engagement']:,.1f} (95%)" if ci else None)
+    st.metric("Health Score", f"{metrics['health_score']:.1f}/100",
+              help="Estimated from a sample" if ci else None)
+
+
+def render_live_sentiment(df_brand: pd.DataFrame):
+    """Render the window's sentiment distribution as a donut chart."""
+    if len(df_brand) > 0 and 'Sentiment' in df_brand.columns:
+        sentiment_dist = cap_categories(weighted_value_counts(df_brand, 'Sentiment'), PIE_MAX_SLICES)
+        fig_sentiment = go.Figure(data=[go.Pie(
+            labels=sentiment_dist.index,
+            values=sentiment_dist.values,
+            hole=0.4,
+            marker=dict(colors=['#10b981', '#fbbf24', '#ef4444', '#94a3b8', '#64748b'])
+        )])
+        fig_sentiment.update_layout(
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='#f1f5f9'),
+            height=280,
+            margin=dict(t=10, b=10, l=10, r=10),
+            showlegend=True
+        )
+        render_chart(fig_sentiment, "Live Sentiment Distribution", key="live_sentiment")
+
+
+def render_top_sources(df_brand: pd.DataFrame, sketches: Optional[Dict[str, Any]] = None):
+    """Render the top sources of the window (from sketches when given) with distinct counts."""
+    if sketches is not None or (len(df_brand) > 0 and 'Source' in df_brand.columns):
+        if sketches is not None:
+            top_sources = sketch_top_counts(sketches, 'sources', 5)
+        else:
+            top_sources = weighted_value_counts(df_brand, 'Source').head(5)
+        for idx, (source, count) in enumerate(top_sources.items(), 1):
+            # Single color for all sources - blue
+            color = '#3b82f6'
+            st.markdown(f"""
+                <div style="background: linear-gradient(135deg, #1e293b 0%, #0f172a 100%); 
+                            border-radius: 8px; 
+                            padding: 12px 15px; 
+                            margin: 8px 0; 
+                            border-left: 3px solid {color}; 
+                            display: flex; 
+                            justify-content: space-between; 
+                            align-items: center;">
+                    <div>
+                        <span style="background: {color}; 
+                                    color: #ffffff; 
+                                    padding: 2px 8px; 
+                                    border-radius: 4px; 
+                                    font-size: 0.75rem; 
+                                    font-weight: 700; 
+                                    margin-right: 10px;">#{idx}</span>
+                        <span style="color: #f1f5f9; 
                                     font-weight: 600; 
-                                    font-size: 0.9rem;">{count:,}</span>
+                                    font-size: 0.95rem;">{source}</span>
                     </div>
-                """, unsafe_allow_html=True)
-    
-    st.markdown("<br>", unsafe_allow_html=True)
+                    <span style="color: #94a3b8; 
+                                font-weight: 600; 
+                                font-size: 0.9rem;">{count:,}</span>
+                </div>
+            """, unsafe_allow_html=True)
     
-    # Detailed Channel Metrics Table - under Live Metrics
+    if sketches is not None:
+        st.caption(
+            f"≈{sketches['distinct']['sources']:,.0f} distinct sources · "
+            f"≈{sketches['distinct']['influencers']:,.0f} distinct influencers "
+            f"(±{104 / math.sqrt(1 << HLL_PRECISION):.1f}%)"
+        )
+
+
+def render_heavy_hitters(sketches: Optional[Dict[str, Any]]):
+    """Render the sketches' top hashtags and influencers with their worst-case overestimate."""
+    if sketches is None:
+        return
+    with st.expander("Top hashtags & influencers (approximate)"):
+        col1, col2 = st.columns(2)
+        for col, dimension in [(col1, 'hashtags'), (col2, 'influencers')]:
+            with col:
+                top = sketches['topk'][dimension].top(10)
+                st.dataframe(
+                    pd.DataFrame(top, columns=[dimension.title()[:-1], 'Count', 'Max Overestimate']),
+                    use_container_width=True,
+                    hide_index=True
+                )
+
+
+def render_channel_metrics_table(by_source: pd.DataFrame):
+    """Render the top channels table from the window's 'Source' aggregate."""
     st.markdown("### Detailed Channel Metrics")
     
-    if len(df_brand) > 0 and 'Source' in df_brand.columns:
-        channel_metrics = df_brand.groupby('Source').agg({
-            'Sentiment': 'count',
-            'Engagement': 'sum' if 'Engagement' in df_brand.columns else 'count',
-            'Views': 'sum' if 'Views' in df_brand.columns else 'count',
-            'Reach': 'sum' if 'Reach' in df_brand.columns else 'count',
-            'sentiment_score': 'mean'
-        }).reset_index()
-        
-        channel_metrics.columns = ['Channel', 'Mentions', 'Engagement', 'Views', 'Reach', 'Avg Sentiment']
-        channel_metrics = channel_metrics.sort_values('Mentions', ascending=False).head(10)
+    if not by_source.empty:
+        channel_metrics = pd.DataFrame({
+            'Channel': by_source['Source'],
+            'Mentions': by_source['rows'],
+            'Engagement': sum_or_count(by_source, 'Engagement'),
+            'Views': sum_or_count(by_source, 'Views'),
+            'Reach': sum_or_count(by_source, 'Reach'),
+            'Avg Sentiment': by_source['sentiment_score'] / by_source['rows'],
+        })
+        channel_metrics = channel_metrics.sort_values('Mentions', ascending=False, kind='stable').head(10)
         
         channel_metrics['Engagement'] = channel_metrics['Engagement'].apply(lambda x: f"{x:,.0f}")
         channel_metrics['Views'] = channel_metrics['Views'].apply(lambda x: f"{x:,.0f}")
@@ -1654,24 +6405,25 @@ def main():
         )
     else:
         st.info("No channel data available")
-    
-    st.markdown("<br>", unsafe_allow_html=True)
-    
-    # Agentic Recommendations - Simple section without purple bubble
+
+
+def render_agentic_recommendations(df_brand: pd.DataFrame, metrics: Dict[str, Any]):
+    """Render the analysis summary and action buttons."""
     st.markdown("### Agentic Recommendations")
     st.markdown("---")
     
     if len(df_brand) > 0:
         # Dominant sentiment
         if 'Sentiment' in df_brand.columns:
-            sentiment_counts = df_brand['Sentiment'].value_counts()
+            sentiment_counts = weighted_value_counts(df_brand, 'Sentiment')
             dominant_sentiment = sentiment_counts.index[0] if len(sentiment_counts) > 0 else 'neutral'
         else:
             dominant_sentiment = 'neutral'
         
         # Top channel
         if 'Source' in df_brand.columns:
-            top_channel = df_brand['Source'].value_counts().index[0] if len(df_brand['Source'].value_counts()) > 0 else 'Unknown'
+            source_counts = weighted_value_counts(df_brand, 'Source')
+            top_channel = source_counts.index[0] if len(source_counts) > 0 else 'Unknown'
         else:
             top_channel = 'Unknown'
         
@@ -1708,15 +6460,187 @@ def main():
                 st.toast("Added to active campaign!")
     else:
         st.markdown("**No data available for recommendations.**")
+
+
+# ============================================================================
+# MAIN APPLICATION
+# ============================================================================
+
+def main():
+    """Main application entry point."""
+    
+    # Chart payload report is per page render
+    st.session_state['chart_payloads'] = []
+    
+    # Ingest sources into brand/month partitions (no-op when sources are unchanged)
+    with st.spinner("Loading data sources..."):
+        manifest = build_partitions(DATA_SOURCES)
+        df_totals = partition_totals(manifest)
+        refresh_artifact_cache(manifest)
+    
+    # Pre-compute every brand's default window in the background
+    warmup = start_warmup(manifest['version']) if WARMUP_ENABLED and not df_totals.empty else None
+    
+    if df_totals.empty:
+        st.error("No data loaded. Please check your DATA_SOURCES configuration.")
+        st.info("Make sure the CSV/JSON files exist and the paths are correct.")
+        return
+    
+    # Get brand list
+    brand_list = get_brand_list(df_totals)
+    
+    # Render sidebar and get filters
+    filters = render_sidebar(brand_list)
+    
+    # Load only the partitions overlapping the selected brand and date range
+    if filters['selected_brand'] and filters['selected_brand'] != 'No brands found':
+        selected_brand = filters['selected_brand']
+    else:
+        selected_brand = None
+    
+    if len(filters['date_range']) == 2:
+        start_date, end_date = filters['date_range']
+    else:
+        start_date, end_date = None, None
+    
+    # Large uncached windows render from a stratified sample while the exact
+    # window is computed in the background (see PROGRESSIVE SAMPLING)
+    cache = get_artifact_cache()
+    version = manifest['version']
+    window = (selected_brand, start_date, end_date)
+    approximate, refinement = None, None
+    if (not cache.contains('data', (PARTITION_DIR, *window), version)
+            and window_row_count(manifest, *window) >= SAMPLE_MIN_ROWS):
+        refinement = start_refinement(version, *window)
+        if not refinement.is_set():
+            approximate = cache.get_or_compute(
+                'approximate', window, version, lambda: approximate_window(manifest, df_totals, *window)
+            )
+    
+    render_ingest_report(manifest)
+    render_cache_stats(cache.stats())
+    if warmup is not None:
+        render_warmup_status(warmup)
+    
+    # Main layout
+    st.markdown("# Brand Analytics Dashboard")
+    st.markdown(f"### {filters['selected_brand']}")
+    if approximate is not None:
+        render_approximate_badge(approximate, refinement)
+    st.markdown("---")
+    
+    # Section inputs (futures) are computed on worker threads while placeholders
+    # are already on the page (see PROGRESSIVE RENDERING). Window rows and
+    # metrics go first, since the KPI row and Live Metrics need them; then the
+    # column store aggregates (cached; pre-warmed for every brand's default window)
+    scheduler = RenderScheduler()
+    if approximate is not None:
+        brand_rows = scheduler.submit(lambda: approximate['sample'])
+        brand_metrics = scheduler.submit(lambda: approximate['metrics'])
+        aggregates = {key: scheduler.submit(lambda key=key: approximate['aggregates'][key]) for key in AGGREGATE_KEYS}
+    else:
+        brand_rows = scheduler.submit(load_brand_window, version, *window)
+        brand_metrics = scheduler.submit(lambda: window_metrics(manifest, df_totals, brand_rows.result(), *window))
+        aggregates = {key: scheduler.submit(window_aggregate, manifest, key, *window) for key in AGGREGATE_KEYS}
+    
+    # Approximate top-K and distinct counts from the per-day sketches (also
+    # used for keywords while the window is sampled, which has no text columns)
+    if filters['approximate_topk'] or approximate is not None:
+        sketches = scheduler.submit(
+            cache.get_or_compute, 'sketch_summary', window, version, lambda: sketch_summary(manifest, *window)
+        )
+    else:
+        sketches = scheduler.submit(lambda: None)
+    
+    def _top_keywords() -> pd.Series:
+        if sketches.result() is not None:
+            return sketch_top_counts(sketches.result(), 'keywords', 8)
+        df_brand = brand_rows.result()
+        return exact_top_counts(df_brand, 'keywords', 8) if len(df_brand) > 0 else pd.Series(dtype=np.int64)
+    
+    keywords = scheduler.submit(_top_keywords)
+    health = scheduler.submit(health_trend, manifest, *window)
+    anomalies = scheduler.submit(
+        cache.get_or_compute, 'anomalies', (PARTITION_DIR,), version, lambda: detect_anomalies(manifest)
+    )
+    distinctive = scheduler.submit(cached_distinctive_terms, manifest)
+    geo = scheduler.submit(
+        cache.get_or_compute, 'geo_hierarchy', window, version, lambda: geo_hierarchy(manifest, *window)
+    )
+    has_days = 'day' in manifest.get('key_codes', {})
+    
+    # Top KPI row with keywords
+    scheduler.section(
+        "KPIs",
+        lambda metrics, df_brand, keyword_counts, daily: render_kpis(
+            metrics, df_brand, df_totals, filters['selected_brand'],
+            keyword_counts=keyword_counts, daily=daily if has_days else None
+        ),
+        brand_metrics, brand_rows, keywords, aggregates['day'], priority=0
+    )
     
     st.markdown("<br>", unsafe_allow_html=True)
     
+    # Anomalies on daily sentiment / volume / engagement / share of voice
+    scheduler.section(
+        "signal alerts", lambda alerts: render_anomaly_panel(alerts, *window), anomalies
+    )
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+    
+    # Channel performance and geographic sentiment from the column store aggregates
+    scheduler.section("performance overview", render_performance_overview, aggregates['Source'])
+    scheduler.section("geographic sentiment", render_geographic_sentiment, geo)
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+    
+    # Live Metrics numbers only wait for the window metrics, never for the charts
+    # above; the health trend and sketch-based parts are sections of their own
+    render_live_metrics(scheduler, brand_metrics, brand_rows, health, sketches)
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+    
+    # Detailed Channel Metrics Table - under Live Metrics
+    scheduler.section("channel metrics", render_channel_metrics_table, aggregates['Source'])
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+    
+    # Hashtags / keywords that co-occur with a selected theme
+    scheduler.section("theme associations", lambda: render_theme_associations(manifest, *window))
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+    
+    # Themes that set the brand apart from its competitors
+    scheduler.section(
+        "distinctive keywords", lambda terms: render_distinctive_terms(terms, selected_brand), distinctive
+    )
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+    
+    # Mention search over the per-brand inverted index
+    scheduler.section("mention search", lambda: render_mention_search(manifest, *window))
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+    
+    # Record-level view, sorted and paged server-side
+    scheduler.section("mentions explorer", lambda: render_mentions_explorer(manifest, *window))
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+    
+    # Agentic Recommendations - Simple section without purple bubble
+    scheduler.section("recommendations", render_agentic_recommendations, brand_rows, brand_metrics)
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+    
+    scheduler.run()
+    render_payload_report()
+    
     # Footer
     st.markdown("---")
     st.markdown(
         f"*Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | "
-        f"Total records: {len(df_all):,} | "
-        f"Filtered records: {len(df_brand):,}*"
+        f"Total records: {int(df_totals['rows'].sum()):,} | "
+        f"Filtered records: {brand_metrics.result()['total_mentions']:,}*"
     )
 
 
@@ -0,0 +1,414 @@
+"""
+Brand Metrics JSON API
+======================
+
+Read-only HTTP service exposing the dashboard's numbers to other tools (chat
+bots, BI pipelines) without rendering the Streamlit app.
+
+USAGE:
+------
+    python metrics_api.py --host 0.0.0.0 --port 8502
+
+ENDPOINTS (GET):
+----------------
+- /health                               status and dataset version
+- /v1/brands                            brand names
+- /v1/brands/<brand>/metrics            compute_metrics output
+- /v1/brands/<brand>/series             daily mentions, sentiment index, engagement, reach
+- /v1/brands/<brand>/keywords?n=10      top keywords with counts
+
+Brand names are URL-encoded. Every brand endpoint takes ?start=YYYY-MM-DD
+and ?end=YYYY-MM-DD (inclusive), defaulting to the dashboard's default
+window; ?window=all covers the whole history.
+
+CACHING:
+--------
+- Data comes from the partitions built by the dashboard (build_partitions runs
+  once at startup and is a no-op when sources are unchanged) and goes through
+  the same artifact/disk caches, so numbers match the dashboard exactly
+- Each response body is serialized once per dataset version and kept in the
+  artifact cache together with its gzip encoding; repeat requests are a dict
+  lookup and a socket write. Every brand's default-window responses are built
+  at startup
+- ETag is derived from the dataset version and the resolved request, so
+  If-None-Match gets 304 Not Modified until the data is re-ingested
+- Responses are gzip-compressed when the client's Accept-Encoding allows gzip
+  (explicitly or via *) with a non-zero q-value
+- The manifest is re-read when its file changes (checked at most once per
+  MANIFEST_CHECK_SECONDS), so a dashboard re-ingest is picked up without a restart
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import traceback
+from datetime import date
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+import streamlit.config
+import streamlit.logger
+
+# app calls st.* outside a Streamlit session; its bare-mode warnings are noise
+# here. Parse the config now, as `streamlit run` would with flags, so the
+# first st.* call does not re-parse it and reset the log level
+streamlit.logger.set_log_level('error')
+streamlit.config.get_config_options(force_reparse=True, options_from_flags={
+    'logger.level': 'error',
+    'global.showWarningOnDirectExecution': False,
+})
+
+import app
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8502
+
+# How often (at most) the manifest file is checked for a re-ingest
+MANIFEST_CHECK_SECONDS = 1.0
+
+# Bodies smaller than this are sent uncompressed
+GZIP_MIN_BYTES = 512
+
+KEYWORDS_DEFAULT_N = 10
+KEYWORDS_MAX_N = 100
+
+
+# ============================================================================
+# DATASET STATE
+# ============================================================================
+
+class DatasetState:
+    """Current manifest and partition totals, reloaded when the manifest file changes."""
+
+    def __init__(self, partition_dir: str = app.PARTITION_DIR):
+        self.partition_dir = partition_dir
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._mtime_ns: Optional[int] = None
+        self.manifest: Optional[Dict[str, Any]] = None
+        self.totals = pd.DataFrame()
+        self.brands: list = []
+
+    def current(self) -> Tuple[Optional[Dict[str, Any]], pd.DataFrame]:
+        """Return (manifest, totals), re-reading the manifest if it changed on disk."""
+        now = time.monotonic()
+        if now - self._checked_at >= MANIFEST_CHECK_SECONDS:
+            with self._lock:
+                if now - self._checked_at >= MANIFEST_CHECK_SECONDS:
+                    self._checked_at = now
+                    self._reload_if_changed()
+        return self.manifest, self.totals
+
+    def _reload_if_changed(self) -> None:
+        try:
+            mtime_ns = os.stat(Path(self.partition_dir) / app.MANIFEST_FILE).st_mtime_ns
+        except OSError:
+            return
+        if mtime_ns == self._mtime_ns:
+            return
+        manifest = app.read_manifest(self.partition_dir)
+        if manifest is None:
+            return
+        totals = app.partition_totals(manifest)
+        self.manifest, self.totals, self._mtime_ns = manifest, totals, mtime_ns
+        self.brands = [brand for brand in app.get_brand_list(totals) if brand != 'No brands found']
+        app.refresh_artifact_cache(manifest, self.partition_dir)
+
+
+# ============================================================================
+# RESPONSE BUILDING
+# ============================================================================
+
+class ApiError(Exception):
+    """Request error mapped to an HTTP status and a JSON error body."""
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _json_default(value: Any) -> Any:
+    """Serialize numpy scalars, timestamps and dates."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.Timestamp, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def resolve_window(params: Dict[str, list]) -> Tuple[Optional[date], Optional[date]]:
+    """
+    Resolve the date window of a request.
+
+    Returns:
+        (start_date, end_date) as dates, or (None, None) for ?window=all
+    """
+    if params.get('window', [''])[0] == 'all':
+        return None, None
+    default_start, default_end = app.default_date_range()
+    try:
+        start = date.fromisoformat(params['start'][0]) if 'start' in params else default_start
+        end = date.fromisoformat(params['end'][0]) if 'end' in params else default_end
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "start/end must be YYYY-MM-DD dates")
+    if start > end:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "start must not be after end")
+    return start, end
+
+
+def metrics_payload(manifest: Dict[str, Any], totals: pd.DataFrame, brand: str, start, end,
+                    partition_dir: str = app.PARTITION_DIR) -> Dict[str, Any]:
+    """compute_metrics output for a brand window (the dashboard's cached path)."""
+    _, metrics, _ = app.window_artifacts(manifest, totals, brand, start, end, partition_dir)
+    return {'metrics': dict(metrics)}
+
+
+def series_payload(manifest: Dict[str, Any], totals: pd.DataFrame, brand: str, start, end,
+                   partition_dir: str = app.PARTITION_DIR) -> Dict[str, Any]:
+    """Daily mentions, sentiment index (0-100), engagement and reach for a brand window."""
+    _, _, aggregates = app.window_artifacts(manifest, totals, brand, start, end, partition_dir)
+    daily = aggregates['day']
+    points = []
+    for row in daily.itertuples(index=False):
+        row = row._asdict()
+        points.append({
+            'date': row['day'].date().isoformat(),
+            'mentions': int(row['rows']),
+            'sentiment_index': ((row['sentiment_score'] / row['rows'] + 1) / 2) * 100 if 'sentiment_score' in row else None,
+            'engagement': row.get('Engagement'),
+            'reach': row.get('Reach'),
+        })
+    return {'series': points}
+
+
+def keywords_payload(manifest: Dict[str, Any], totals: pd.DataFrame, brand: str, start, end, n: int,
+                     partition_dir: str = app.PARTITION_DIR) -> Dict[str, Any]:
+    """Top-n keywords (Key Phrases + Keywords) for a brand window, by exact count."""
+    df_brand, _, _ = app.window_artifacts(manifest, totals, brand, start, end, partition_dir)
+    counts = app.exact_top_counts(df_brand, 'keywords', n)
+    return {'keywords': [{'term': term, 'count': int(count)} for term, count in counts.items()]}
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """
+    Whether an Accept-Encoding header allows a gzip response.
+
+    Codings are matched case-insensitively with their q-values; gzip;q=0
+    refuses gzip, and * stands for any coding not listed explicitly.
+    """
+    qualities = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    for coding in ('gzip', 'x-gzip', '*'):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+def encode_response(payload: Dict[str, Any], etag: str) -> Dict[str, Any]:
+    """Serialize a payload once, with its gzip encoding and ETag."""
+    body = json.dumps(payload, default=_json_default, separators=(',', ':')).encode('utf-8')
+    return {
+        'etag': etag,
+        'body': body,
+        'gzip': gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None,
+    }
+
+
+def build_response(state: DatasetState, path: str, params: Dict[str, list]) -> Dict[str, Any]:
+    """
+    Route a request and return its encoded response from the artifact cache.
+
+    Args:
+        state: Dataset state
+        path: URL path
+        params: Parsed query string
+
+    Returns:
+        {'etag', 'body', 'gzip'} for the request
+    """
+    manifest, totals = state.current()
+    if manifest is None:
+        raise ApiError(HTTPStatus.SERVICE_UNAVAILABLE, "no data ingested yet")
+    version = manifest['version']
+    partition_dir = state.partition_dir
+
+    parts = [unquote(part) for part in path.strip('/').split('/')]
+    if parts == ['v1', 'brands']:
+        resource_key: tuple = ('brands',)
+        compute = lambda: {'brands': state.brands}
+    elif len(parts) == 4 and parts[:2] == ['v1', 'brands']:
+        brand, endpoint = parts[2], parts[3]
+        if brand not in state.brands:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"unknown brand: {brand}")
+        start, end = resolve_window(params)
+        window = {'brand': brand, 'start': start, 'end': end}
+        if endpoint == 'metrics':
+            resource_key = ('metrics', brand, start, end)
+            compute = lambda: {**window, **metrics_payload(manifest, totals, brand, start, end, partition_dir)}
+        elif endpoint == 'series':
+            resource_key = ('series', brand, start, end)
+            compute = lambda: {**window, **series_payload(manifest, totals, brand, start, end, partition_dir)}
+        elif endpoint == 'keywords':
+            try:
+                n = min(KEYWORDS_MAX_N, max(1, int(params.get('n', [KEYWORDS_DEFAULT_N])[0])))
+            except ValueError:
+                raise ApiError(HTTPStatus.BAD_REQUEST, "n must be an integer")
+            resource_key = ('keywords', brand, start, end, n)
+            compute = lambda: {**window, **keywords_payload(manifest, totals, brand, start, end, n, partition_dir)}
+        else:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"unknown endpoint: {endpoint}")
+    else:
+        raise ApiError(HTTPStatus.NOT_FOUND, "not found")
+
+    etag = '"{}-{}"'.format(version, hashlib.sha1(repr(resource_key).encode('utf-8')).hexdigest()[:16])
+    return app.get_artifact_cache().get_or_compute(
+        'response', resource_key, version,
+        lambda: encode_response({'version': version, **compute()}, etag)
+    )
+
+
+def warm_responses(state: DatasetState) -> int:
+    """Build every brand's default-window responses; returns the number built."""
+    built = 0
+    for brand in state.brands:
+        for endpoint in ('metrics', 'series', 'keywords'):
+            build_response(state, f"/v1/brands/{brand}/{endpoint}", {})
+            built += 1
+    return built
+
+
+# ============================================================================
+# HTTP SERVER
+# ============================================================================
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """GET-only handler serving cached JSON with ETag and gzip support."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "BrandMetricsAPI/1.0"
+    # Send headers and body in one segment on keep-alive connections instead of
+    # waiting on delayed ACKs between them
+    disable_nagle_algorithm = True
+    wbufsize = -1
+    state: DatasetState
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            if url.path == '/health':
+                manifest, _ = self.state.current()
+                health = {
+                    'status': 'ok' if manifest else 'no data',
+                    'version': manifest['version'] if manifest else None,
+                }
+            else:
+                response = build_response(self.state, url.path, parse_qs(url.query))
+        except ApiError as e:
+            self._send_json(e.status, {'error': e.message}, cache=False)
+            return
+        except Exception:
+            # A failing window must not drop the connection without a response
+            traceback.print_exc()
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "internal server error"}, cache=False)
+            return
+        if url.path == '/health':
+            self._send_json(HTTPStatus.OK, health, cache=False)
+            return
+
+        etags = [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]
+        if response['etag'] in etags or '*' in etags:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', response['etag'])
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = response['body']
+        use_gzip = response['gzip'] is not None and accepts_gzip(self.headers.get('Accept-Encoding', ''))
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', response['etag'])
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        if use_gzip:
+            body = response['gzip']
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: HTTPStatus, payload: Dict[str, Any], cache: bool = True):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if not cache:
+            self.send_header('Cache-Control', 'no-store')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Per-request logging would dominate the cost of cached responses
+        pass
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, warm: bool = True) -> None:
+    """Ingest (if needed), pre-build default responses and serve until interrupted."""
+    app.build_partitions(app.DATA_SOURCES)
+    state = DatasetState()
+    state.current()
+    if warm:
+        started = time.time()
+        built = warm_responses(state)
+        print(f"Built {built} responses for {len(state.brands)} brands in {time.time() - started:.1f} s")
+
+    handler = type('Handler', (MetricsRequestHandler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    print(f"Serving brand metrics on http://{host}:{port}/v1/brands")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read-only JSON API for brand metrics")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--no-warm', action='store_true', help="skip pre-building default responses")
+    args = parser.parse_args()
+    serve(args.host, args.port, warm=not args.no_warm)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Shared fixtures for the dashboard tests.
+
+The tests import app.py directly (its Streamlit UI only runs under
+`streamlit run`) and build partitions from synthetic mention exports in
+pytest's temporary directories, so they never touch data/partitions.
+"""
+
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+import pytest
+import streamlit.logger
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Importing app outside `streamlit run` logs bare-mode warnings on every st.* call
+streamlit.logger.set_log_level('error')
+
+import app  # noqa: E402
+
+streamlit.logger.set_log_level('error')
+
+SOURCES = ['Reuters', 'Bloomberg', 'Twitter', 'Reddit', 'Local News']
+PLACES = [
+    ('United States', 'North America', 'Oregon', 'Portland'),
+    ('United States', 'North America', 'Texas', 'Dallas'),
+    ('France', 'Europe', None, 'Paris'),
+    ('Australia', 'Oceania', 'NSW', 'Sydney'),
+    (None, None, None, None),
+]
+KEYWORDS = ['pricing', 'quality', 'launch', 'earnings', 'ceo', 'supply chain']
+HASHTAGS = ['#growth', '#tech', '#news', '#deal']
+
+
+def make_mentions(brand: str, days: int = 45, per_day: int = 12, start: str = '2025-01-01',
+                  seed: int = 0, tag: str = '') -> pd.DataFrame:
+    """
+    Synthetic export rows for one brand, in date order, as the CSV files hold them.
+
+    Args:
+        brand: Input Name of every row
+        days: Days covered, starting at start
+        per_day: Average mentions per day
+        start: First day
+        seed: Random seed
+        tag: Added to every URL, so exports with different tags never share mentions
+    """
+    rng = np.random.default_rng(seed)
+    n = days * per_day
+    dates = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days * 86400, n), unit='s')
+    places = [PLACES[i] for i in rng.integers(0, len(PLACES), n)]
+    keywords = [', '.join(rng.choice(KEYWORDS, rng.integers(0, 4), replace=False)) for _ in range(n)]
+    hashtags = [' '.join(rng.choice(HASHTAGS, rng.integers(0, 3), replace=False)) for _ in range(n)]
+    frame = pd.DataFrame({
+        'Date': dates.strftime('%Y-%m-%d %H:%M:%S'),
+        'Headline': [f"{brand} {kw or 'update'} story {i}" for i, kw in enumerate(keywords)],
+        'URL': [f"https://news.example.com/{brand.lower()}/{tag}{i}" for i in range(n)],
+        'Opening Text': [f"Coverage of {brand} and its {kw or 'plans'}" for kw in keywords],
+        'Source': rng.choice(SOURCES, n),
+        'Country': [p[0] for p in places],
+        'Subregion': [p[1] for p in places],
+        'State': [p[2] for p in places],
+        'City': [p[3] for p in places],
+        'Reach': rng.integers(0, 100_000, n).astype(float),
+        'Engagement': rng.integers(0, 500, n).astype(float),
+        'Sentiment': rng.choice(['Positive', 'Negative', 'Neutral', 'Not Rated'], n),
+        'Keywords': keywords,
+        'Hashtags': hashtags,
+        'Input Name': brand,
+    })
+    return frame.sort_values('Date', kind='stable', ignore_index=True)
+
+
+def write_source(frame: pd.DataFrame, path: Path, source_type: str, append: bool = False) -> None:
+    """Write (or append) export rows as a CSV or JSON Lines file."""
+    with open(path, 'a' if append else 'w', encoding='utf-8', newline='') as f:
+        if source_type == 'csv':
+            f.write(frame.to_csv(index=False, header=not append))
+        else:
+            text = frame.to_json(orient='records', lines=True)
+            f.write(text if text.endswith('\n') else text + '\n')
+
+
+def sorted_rows(df: pd.DataFrame, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Rows without row_id in a canonical order, as strings, for comparing two builds."""
+    df = df.drop(columns=['row_id'], errors='ignore')
+    df = df[sorted(col for col in (columns if columns is not None else df.columns) if col != 'row_id')]
+    return df.astype(str).sort_values(list(df.columns), kind='stable', ignore_index=True)
+
+
+@pytest.fixture
+def brand_exports(tmp_path):
+    """Three brands' CSV exports and their source configs."""
+    sources = []
+    for seed, brand in enumerate(['Nike', 'Adidas', 'Puma']):
+        path = tmp_path / f"{brand}.csv"
+        write_source(make_mentions(brand, seed=seed), path, 'csv')
+        sources.append({'path': str(path), 'type': 'csv', 'brand': brand})
+    return sources
+
+
+@pytest.fixture
+def dataset(brand_exports, tmp_path):
+    """(manifest, partition_dir, all prepared rows) of the three brand exports."""
+    partition_dir = str(tmp_path / "partitions")
+    rows = app.prepare_data(app.load_data(brand_exports))
+    # Ingest bookkeeping such as the mention key array is not row data
+    rows.attrs.clear()
+    return app.build_partitions(brand_exports, partition_dir), partition_dir, rows
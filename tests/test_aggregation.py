@@ -0,0 +1,78 @@
+"""Group-by aggregation over the column store, in-process and in the worker pool."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import aggregation
+from conftest import app
+
+
+def expected_aggregate(rows: pd.DataFrame, keys: list, values: list) -> pd.DataFrame:
+    """The same aggregate computed with a pandas group-by over the rows."""
+    rows = rows.assign(day=rows['Date'].dt.normalize()).dropna(subset=keys)
+    grouped = rows.groupby(keys)
+    expected = grouped[values].sum()
+    expected.insert(0, 'rows', grouped.size())
+    return expected.reset_index()
+
+
+def canonical(aggregate: pd.DataFrame, keys: list) -> pd.DataFrame:
+    aggregate = aggregate.astype({key: str for key in keys if key != 'day'})
+    return aggregate.sort_values(keys, ignore_index=True)
+
+
+@pytest.mark.parametrize('keys', [['Source'], ['day', 'Country'], []])
+@pytest.mark.parametrize('brand, window', [(None, (None, None)),
+                                           ('Puma', ('2025-01-10', '2025-01-31 12:00:00'))])
+def test_aggregate_window_matches_group_by(dataset, keys, brand, window):
+    manifest, partition_dir, _ = dataset
+    start, end = window
+    values = ['Reach', 'Engagement']
+    result = app.aggregate_window(manifest, keys, values, brand, start, end, partition_dir)
+    rows = app.load_partitions(manifest, brand, start, end, partition_dir)
+
+    if keys:
+        expected = expected_aggregate(rows, keys, values)
+    else:
+        expected = pd.DataFrame({'rows': [len(rows)], 'Reach': [rows['Reach'].sum()],
+                                 'Engagement': [rows['Engagement'].sum()]})
+    pd.testing.assert_frame_equal(canonical(result, keys), canonical(expected, keys), check_dtype=False)
+
+
+def test_merge_partials_sums_per_code():
+    partials = [
+        (np.array([1, 4]), np.array([2, 1]), {'Reach': np.array([10.0, 5.0])}),
+        (np.array([], dtype=np.int64), np.array([], dtype=np.int64), {'Reach': np.array([])}),
+        (np.array([0, 4]), np.array([3, 2]), {'Reach': np.array([1.0, 2.0])}),
+    ]
+    codes, counts, sums = aggregation.merge_partials(partials, ['Reach'])
+    assert codes.tolist() == [0, 1, 4]
+    assert counts.tolist() == [3, 2, 3]
+    assert sums['Reach'].tolist() == [1.0, 10.0, 7.0]
+
+
+def test_worker_pool_matches_in_process(dataset):
+    manifest, partition_dir, _ = dataset
+    key_codes, (segment,) = manifest['key_codes'], manifest['segments']
+    root = app.Path(partition_dir)
+    kwargs = dict(
+        row_ranges=app.window_row_ranges(manifest, None, '2025-01-05', None, partition_dir),
+        key_paths=[str(root / segment['codes'][key]) for key in ['Source', 'day']],
+        cardinalities=[len(key_codes['Source']['categories']), key_codes['day']['days']],
+        value_paths={col: str(root / segment['columns'][col]) for col in ['Reach', 'Engagement']},
+        version=manifest['version'],
+    )
+
+    serial = aggregation.AggregationExecutor(workers=1, chunk_rows=1_000_000).aggregate(**kwargs)
+    executor = aggregation.AggregationExecutor(workers=2, chunk_rows=97, parallel_min_rows=0)
+    try:
+        parallel = executor.aggregate(**kwargs)
+        assert executor._pool is not None
+    finally:
+        executor.shutdown()
+
+    np.testing.assert_array_equal(parallel[0], serial[0])
+    np.testing.assert_array_equal(parallel[1], serial[1])
+    for col in ['Reach', 'Engagement']:
+        np.testing.assert_allclose(parallel[2][col], serial[2][col])
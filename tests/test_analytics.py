@@ -0,0 +1,217 @@
+"""Window analytics checked against direct computations over the rows."""
+
+import collections
+import concurrent.futures
+import itertools
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import app, make_mentions, write_source
+
+
+@pytest.mark.parametrize('resolution', ['D', 'W'])
+def test_health_score_history_matches_compute_metrics(dataset, resolution):
+    manifest, partition_dir, _ = dataset
+    history = app.health_score_history(app.brand_daily_rollup(manifest, partition_dir), resolution)
+    rows = app.load_partitions(manifest, None, None, None, partition_dir)
+    periods = rows['Date'].dt.to_period(resolution).dt.start_time
+
+    checked = 0
+    for period, in_period in rows.groupby(periods):
+        totals = pd.DataFrame({'rows': [len(in_period)], 'Engagement': [in_period['Engagement'].sum()],
+                               'Reach': [in_period['Reach'].sum()]})
+        scores = history[history['period'] == period]
+        for brand, df_brand in [(None, in_period)] + list(in_period.groupby('brand')):
+            expected = app.compute_metrics(df_brand, totals)['health_score']
+            got = scores['health_score'][scores['brand'].isna() if brand is None else scores['brand'] == brand]
+            assert got.item() == pytest.approx(expected)
+            checked += 1
+    assert checked == len(history)
+
+
+def test_detector_flags_spikes_and_drops_only():
+    rng = np.random.default_rng(0)
+    days = 90
+    values = np.stack([100 + rng.normal(0, 5, days), 20 + rng.normal(0, 2, days)], axis=1)
+    values[60, 0] = 200  # spike
+    values[75, 1] = 2  # drop
+    values[30, 1] = np.nan  # missing day
+
+    detector = app.AnomalyDetector()
+    detector.add_series([('Nike', 'mentions'), ('Nike', 'engagement')])
+    flagged = []
+    for day in range(days):
+        scores = detector.update(values[day])
+        flagged += [(day, series, scores['ewma_z'][series] > 0) for series in np.flatnonzero(scores['anomaly'])]
+    assert flagged == [(60, 0, True), (75, 1, False)]
+    assert detector.count.tolist() == [days, days - 1]
+
+    # State round-trips through the pickle it is persisted as
+    restored = app.AnomalyDetector.from_dict(pickle.loads(pickle.dumps(detector.to_dict())))
+    np.testing.assert_array_equal(restored.update(values[-1])['ewma_z'], detector.update(values[-1])['ewma_z'])
+
+
+def test_incremental_anomalies_match_one_shot(tmp_path):
+    frame = pd.concat([make_mentions('Nike', days=60, seed=1), make_mentions('Adidas', days=60, seed=2)])
+    # A burst of Nike mentions on one day
+    burst = make_mentions('Nike', days=1, per_day=150, start='2025-02-10', seed=3, tag='burst')
+    frame = pd.concat([frame, burst]).sort_values('Date', kind='stable', ignore_index=True)
+    now = pd.Timestamp('2030-01-01')
+
+    def _sources(folder):
+        return [{'path': str(tmp_path / folder / f"{brand}.csv"), 'type': 'csv', 'brand': brand}
+                for brand in ['Nike', 'Adidas']]
+
+    (tmp_path / "full").mkdir()
+    for brand in ['Nike', 'Adidas']:
+        write_source(frame[frame['Input Name'] == brand], tmp_path / "full" / f"{brand}.csv", 'csv')
+    manifest = app.build_partitions(_sources("full"), str(tmp_path / "full" / "p"))
+    one_shot = app.detect_anomalies(manifest, str(tmp_path / "full" / "p"), now=now)
+    burst_alerts = one_shot['alerts'][one_shot['alerts']['day'] == pd.Timestamp('2025-02-10')]
+    assert ('Nike', 'mentions', 'spike') in set(zip(burst_alerts['brand'], burst_alerts['metric'],
+                                                    burst_alerts['direction']))
+    assert one_shot['series'] == 2 * len(app.ANOMALY_METRICS)
+
+    # The same rows arriving in appends, some cut mid-day while that day is still today
+    (tmp_path / "inc").mkdir()
+    previous = '0000'
+    for step, cut in enumerate(['2025-01-20 12:00:00', '2025-02-10 08:00:00', '2025-02-10 20:00:00', '2030']):
+        part = frame[(frame['Date'] >= previous) & (frame['Date'] < cut)]
+        for brand in ['Nike', 'Adidas']:
+            write_source(part[part['Input Name'] == brand], tmp_path / "inc" / f"{brand}.csv", 'csv', append=step > 0)
+        manifest = app.build_partitions(_sources("inc"), str(tmp_path / "inc" / "p"))
+        assert step == 0 or 'delta' in manifest
+        result = app.detect_anomalies(manifest, str(tmp_path / "inc" / "p"), now=min(pd.Timestamp(cut), now))
+        previous = cut
+
+    assert result['last_day'] == one_shot['last_day']
+    pd.testing.assert_frame_equal(result['alerts'].reset_index(drop=True), one_shot['alerts'].reset_index(drop=True))
+
+
+def test_concurrent_anomaly_runs_persist_one_state(dataset):
+    manifest, partition_dir, _ = dataset
+    with concurrent.futures.ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda _: app.detect_anomalies(manifest, partition_dir), range(4)))
+    for result in results[1:]:
+        pd.testing.assert_frame_equal(result['alerts'], results[0]['alerts'])
+    version_dir = app.Path(partition_dir) / manifest['version']
+    assert (version_dir / app.ANOMALY_STATE_FILE).is_file()
+    assert not list(version_dir.glob('*.tmp'))
+
+
+@pytest.mark.parametrize('brand', [None, 'Adidas'])
+@pytest.mark.parametrize('window', [(None, None), ('2025-01-05', '2025-01-20'), ('2025-01-12', '2025-01-12')])
+def test_theme_cooccurrence_matches_brute_force(dataset, brand, window):
+    manifest, partition_dir, _ = dataset
+    result = app.theme_cooccurrence(manifest, brand, *window, partition_dir)
+    rows = app.load_partitions(manifest, brand, *window, partition_dir)
+
+    themes = collections.defaultdict(set)
+    for dimension, prefix in app.THEME_DIMENSIONS.items():
+        for position, term in app.extract_terms(rows, dimension).items():
+            themes[position].add(prefix + term)
+    expected = collections.Counter()
+    for terms in themes.values():
+        expected.update((term, term) for term in terms)
+        expected.update(itertools.permutations(terms, 2))
+
+    matrix = result['cooccurrence'].tocoo()
+    got = {(result['terms'][i], result['terms'][j]): int(count)
+           for i, j, count in zip(matrix.row, matrix.col, matrix.data) if count}
+    assert got == dict(expected)
+    assert result['mentions'] == len(rows)
+
+    if got:
+        term = max(result['terms'], key=lambda t: expected[t, t])
+        associated = app.associated_terms(result, term, n=100, min_support=1)
+        for partner in associated.itertuples():
+            assert partner.co_mentions == expected[term, partner.term]
+            assert partner.lift == pytest.approx(
+                len(rows) * partner.co_mentions / (expected[term, term] * expected[partner.term, partner.term]))
+        assert associated['lift'].is_monotonic_decreasing
+
+
+def test_distinctive_terms_scores_tf_idf(tmp_path):
+    sources = []
+    for seed, brand in enumerate(['Nike', 'Adidas', 'Puma']):
+        frame = make_mentions(brand, days=10, seed=seed)
+        if brand == 'Nike':
+            extra = np.where(np.arange(len(frame)) % 2 == 0, 'swoosh, nike', 'nike')
+            frame['Keywords'] = frame['Keywords'] + ', ' + extra
+        if brand != 'Puma':
+            frame['Hashtags'] = frame['Hashtags'] + ' #running'
+        write_source(frame, tmp_path / f"{brand}.csv", 'csv')
+        sources.append({'path': str(tmp_path / f"{brand}.csv"), 'type': 'csv', 'brand': brand})
+    manifest = app.build_partitions(sources, str(tmp_path / "p"))
+
+    result = app.distinctive_terms(manifest, str(tmp_path / "p")).set_index(['brand', 'term'])
+    assert sorted(result.index) == [('Adidas', '#running'), ('Nike', '#running'), ('Nike', 'swoosh')]
+    assert result.loc[('Nike', 'swoosh'), 'score'] == pytest.approx(0.5 * np.log(3))
+    assert result.loc[('Nike', 'swoosh'), 'others_share'] == 0
+    assert result.loc[('Adidas', '#running'), 'score'] == pytest.approx(np.log(3 / 2))
+    assert result.loc[('Nike', '#running'), 'brand_share'] == 1
+
+
+def test_stratified_sample_confidence_intervals(tmp_path):
+    # About 40 mentions per day and source, so strata are sampled sparsely
+    write_source(make_mentions('Nike', days=10, per_day=200), tmp_path / "nike.csv", 'csv')
+    partition_dir = str(tmp_path / "partitions")
+    manifest = app.build_partitions([{'path': str(tmp_path / "nike.csv"), 'type': 'csv', 'brand': 'Nike'}],
+                                    partition_dir)
+    rows = app.load_partitions(manifest, 'Nike', None, None, partition_dir)
+
+    drawn = app.stratified_sample(manifest, 'Nike', target_rows=150, partition_dir=partition_dir)
+    sample = drawn['sample']
+    assert len(sample) < len(rows)
+    assert sample['weight'].sum() == pytest.approx(len(rows))
+    # Days and sources are unions of strata, so their row counts are exact
+    estimated = app.sample_aggregates(sample)['Source'].set_index('Source')['rows']
+    assert estimated.to_dict() == rows['Source'].astype(str).value_counts().to_dict()
+
+    # The 95% intervals cover the true means in about 95% of draws
+    for column in ['sentiment_score', 'Engagement', 'Reach']:
+        truth = rows[column].mean()
+        covered = 0
+        for seed in range(100):
+            mean, half_width = app.stratified_mean(
+                app.stratified_sample(manifest, 'Nike', target_rows=150, partition_dir=partition_dir, seed=seed), column)
+            assert half_width > 0
+            covered += abs(mean - truth) <= half_width
+        assert covered >= 85, column
+
+    # A sample of the whole window is exact
+    mean, half_width = app.stratified_mean(
+        app.stratified_sample(manifest, 'Nike', target_rows=len(rows), partition_dir=partition_dir), 'Reach')
+    assert mean == pytest.approx(rows['Reach'].mean())
+    assert half_width == pytest.approx(0, abs=1e-9)
+
+
+@pytest.mark.parametrize('brand', [None, 'Puma'])
+@pytest.mark.parametrize('window', [(None, None), ('2025-01-10', '2025-01-31')])
+def test_geo_hierarchy_matches_group_by(dataset, brand, window):
+    manifest, partition_dir, _ = dataset
+    geo = app.geo_hierarchy(manifest, brand, *window, partition_dir)
+    rows = app.load_partitions(manifest, brand, *window, partition_dir)
+    places = rows[app.GEO_LEVELS].fillna(app.GEO_UNKNOWN)
+
+    expected = {}
+    for depth, level in enumerate(app.GEO_LEVELS):
+        deeper_known = (places[app.GEO_LEVELS[depth + 1:]] != app.GEO_UNKNOWN).any(axis=1)
+        shown = (places[level] != app.GEO_UNKNOWN) | deeper_known
+        keys = app.GEO_LEVELS[:depth + 1]
+        for path, in_place in rows[shown].groupby([places[key] for key in keys]):
+            children = expected.setdefault(path[:-1], {})
+            children[path[-1]] = (len(in_place), in_place['sentiment_score'].mean(), in_place['Reach'].sum(),
+                                  depth < len(app.GEO_LEVELS) - 1 and deeper_known[in_place.index].any())
+
+    assert sorted(geo) == sorted(expected)
+    for path, children in geo.items():
+        assert children['mentions'].is_monotonic_decreasing
+        got = {row.place: (row.mentions, row.avg_sentiment, row.reach, row.drillable)
+               for row in children.itertuples()}
+        assert got.keys() == expected[path].keys()
+        for place, values in got.items():
+            assert values == pytest.approx(expected[path][place])
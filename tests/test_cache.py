@@ -0,0 +1,123 @@
+"""The byte-budgeted artifact cache."""
+
+import numpy as np
+import pandas as pd
+
+from conftest import app
+
+
+def _array(kib: int) -> np.ndarray:
+    return np.zeros(kib * 1024, dtype=np.uint8)
+
+
+def test_estimate_nbytes_counts_buffers():
+    assert app.estimate_nbytes(_array(4)) == 4096
+    frame = pd.DataFrame({'a': np.zeros(1000), 'b': ['x' * 50] * 1000})
+    assert app.estimate_nbytes(frame) >= 8000 + 50 * 1000
+    assert app.estimate_nbytes({'a': _array(1), 'b': [_array(2)]}) > 3072
+
+
+def test_evicts_least_recently_used_across_kinds():
+    cache = app.ArtifactCache(budget_bytes=10 * 1024)
+    cache.put('data', 'a', 'v1', _array(4))
+    cache.put('metrics', 'b', 'v1', _array(4))
+    assert cache.get('data', 'a', 'v1') is not None  # 'b' is now the oldest
+    cache.put('search', 'c', 'v1', _array(4))
+
+    assert cache.get('metrics', 'b', 'v1') is None
+    assert cache.get('data', 'a', 'v1') is not None
+    assert cache.get('search', 'c', 'v1') is not None
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['current_bytes'] == 8 * 1024 <= stats['budget_bytes']
+    assert set(stats['by_kind']) == {'data', 'search'}
+
+
+def test_value_larger_than_budget_is_not_cached():
+    cache = app.ArtifactCache(budget_bytes=1024)
+    cache.put('data', 'small', 'v1', _array(0))
+    cache.put('data', 'big', 'v1', _array(2))
+    assert cache.get('data', 'big', 'v1') is None
+    assert cache.get('data', 'small', 'v1') is not None
+
+
+def test_get_or_compute_computes_once_per_version():
+    cache = app.ArtifactCache(budget_bytes=1 << 20)
+    calls = []
+
+    def _compute():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get_or_compute('metrics', ('Nike',), 'v1', _compute) == 1
+    assert cache.get_or_compute('metrics', ('Nike',), 'v1', _compute) == 1
+    assert cache.get_or_compute('metrics', ('Nike',), 'v2', _compute) == 2
+    assert cache.stats()['hits'] == 1
+
+
+def test_invalidate_by_version_and_kind():
+    cache = app.ArtifactCache(budget_bytes=1 << 20)
+    for version in ['v1', 'v2']:
+        for kind in ['data', 'metrics']:
+            cache.put(kind, 'k', version, version + kind)
+
+    assert cache.invalidate(version='v1', kind='data') == 1
+    assert cache.invalidate(keep_version='v2') == 1
+    assert cache.stats()['entries'] == 2
+    assert cache.get('metrics', 'k', 'v2') == 'v2metrics'
+
+
+def _disk_cache(tmp_path, version: str = 'v1') -> 'app.DiskCache':
+    (tmp_path / version).mkdir(exist_ok=True)
+    return app.DiskCache(str(tmp_path), {'metrics'})
+
+
+def test_disk_tier_survives_a_new_memory_cache(tmp_path):
+    first = app.ArtifactCache(budget_bytes=1 << 20, disk=_disk_cache(tmp_path))
+    assert first.get_or_compute('metrics', ('Nike', None), 'v1', lambda: {'score': 1.5}) == {'score': 1.5}
+    first.get_or_compute('search', 'q', 'v1', lambda: 'not persisted')
+    assert len(list((tmp_path / 'v1' / 'cache').rglob('*.pkl'))) == 1
+
+    restarted = app.ArtifactCache(budget_bytes=1 << 20, disk=_disk_cache(tmp_path))
+    computed = []
+    value = restarted.get_or_compute('metrics', ('Nike', None), 'v1', lambda: computed.append(1))
+    assert value == {'score': 1.5} and not computed
+    assert restarted.disk.stats()['hits'] == 1
+
+
+def test_disk_entry_failing_checksum_is_dropped(tmp_path):
+    disk = _disk_cache(tmp_path)
+    disk.put('metrics', 'k', 'v1', [1, 2, 3])
+    path = disk._path('metrics', 'k', 'v1')
+    blob = bytearray(path.read_bytes())
+    blob[-2] ^= 0xFF
+    path.write_bytes(bytes(blob))
+
+    assert disk.get('metrics', 'k', 'v1', default='miss') == 'miss'
+    assert not path.exists()
+    assert disk.stats() == {'hits': 0, 'misses': 1, 'writes': 1, 'corrupt': 1}
+
+
+def test_disk_entry_for_another_key_is_rejected(tmp_path):
+    disk = _disk_cache(tmp_path)
+    disk.put('metrics', 'k', 'v1', 'value of k')
+    # A digest collision would leave another key's entry at this path
+    disk._path('metrics', 'k', 'v1').rename(disk._path('metrics', 'other', 'v1'))
+    assert disk.get('metrics', 'other', 'v1') is None
+    assert disk.stats()['corrupt'] == 1
+
+
+def test_disk_put_skips_removed_versions(tmp_path):
+    disk = app.DiskCache(str(tmp_path), {'metrics'})
+    disk.put('metrics', 'k', 'gone', 1)
+    assert disk.stats()['writes'] == 0 and not (tmp_path / 'gone').exists()
+
+
+def test_disk_entries_of_older_revisions_are_ignored(tmp_path):
+    (tmp_path / 'v1').mkdir()
+    app.DiskCache(str(tmp_path), {'metrics'}, revision=1).put('metrics', 'k', 'v1', 'old layout')
+    newer = app.DiskCache(str(tmp_path), {'metrics'}, revision=2)
+    assert newer.get('metrics', 'k', 'v1', default='miss') == 'miss'
+    newer.put('metrics', 'k', 'v1', 'new layout')
+    assert newer.get('metrics', 'k', 'v1') == 'new layout'
+    assert app.DiskCache(str(tmp_path), {'metrics'}, revision=1).get('metrics', 'k', 'v1') == 'old layout'
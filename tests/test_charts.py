@@ -0,0 +1,64 @@
+"""Chart payloads: time-bucket resolution and LTTB downsampling."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import app
+
+
+@pytest.mark.parametrize('days, resolution', [(1, 'D'), (120, 'D'), (121, 'W'), (7 * 118, 'W'), (3000, 'M')])
+def test_choose_resolution_fits_budget(days, resolution):
+    dates = pd.Series(pd.date_range('2025-01-01', periods=days, freq='D'))
+    assert app.choose_resolution(dates, max_points=120) == resolution
+    buckets = app.bucket_series(pd.DataFrame({'Date': dates}), None, 'size', resolution)
+    assert len(buckets) <= 120 and buckets.sum() == days
+
+
+def test_bucket_series_aggregates_by_period():
+    df = pd.DataFrame({'Date': pd.to_datetime(['2025-01-01 08:00', '2025-01-01 20:00', '2025-01-02 00:00', None]),
+                       'Reach': [1.0, 3.0, 5.0, 100.0]})
+    assert app.bucket_series(df, 'Reach', 'mean', 'D').tolist() == [2.0, 5.0]
+    assert app.bucket_series(df, 'Reach', 'sum', 'M').tolist() == [9.0]
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    index = pd.date_range('2025-01-01', periods=2000, freq='h')
+    values = np.sin(np.arange(2000) / 50.0)
+    values[777], values[1500] = 25.0, -25.0
+    series = pd.Series(values, index=index)
+
+    sampled = app.lttb(series, max_points=100)
+    assert len(sampled) == 100
+    assert sampled.index[0] == index[0] and sampled.index[-1] == index[-1]
+    assert sampled.index.is_monotonic_increasing
+    assert {index[777], index[1500]} <= set(sampled.index)
+    pd.testing.assert_series_equal(sampled, series.loc[sampled.index])
+
+
+def test_lttb_returns_short_series_unchanged():
+    series = pd.Series([3.0, 1.0, 2.0])
+    assert app.lttb(series, max_points=5) is series
+
+
+def test_cap_categories_sums_tail_into_other():
+    counts = pd.Series({'a': 1, 'b': 9, 'c': 5, 'd': 3, 'e': 2})
+    capped = app.cap_categories(counts, 3)
+    assert capped.to_dict() == {'b': 9, 'c': 5, 'Other': 6}
+    assert app.cap_categories(counts, 5) is counts
+
+
+def test_render_chart_downsamples_to_page_budget(monkeypatch):
+    monkeypatch.setattr(app, 'CHART_PAGE_BUDGET_KB', 64)
+    app.st.session_state['chart_payloads'] = []
+    rendered = []
+    monkeypatch.setattr(app.st, 'plotly_chart', lambda fig, **kwargs: rendered.append(fig))
+
+    index = pd.date_range('2025-01-01', periods=20_000, freq='min')
+    fig = app.go.Figure(app.go.Scatter(x=index, y=np.random.default_rng(0).normal(size=len(index))))
+    app.render_chart(fig, 'Noise')
+
+    (entry,) = app.st.session_state['chart_payloads']
+    assert entry['downsampled'] and entry['bytes'] <= 64 * 1024
+    assert entry['bytes'] == len(app.plotly.io.to_json(rendered[0], validate=False))
+    assert rendered[0].layout.template.to_plotly_json() == {}
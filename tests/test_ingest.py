@@ -0,0 +1,99 @@
+"""Ingest: loading exports and deduplicating mentions across sources."""
+
+import numpy as np
+import pandas as pd
+
+from conftest import app, make_mentions, write_source
+
+
+def test_mention_keys_normalize_urls_and_scope_by_brand():
+    df = pd.DataFrame({
+        'URL': ['https://www.example.com/a/?utm_source=x#top', 'http://EXAMPLE.com/a', 'https://example.com/a',
+                None, None, None],
+        'Headline': ['x', 'y', 'z', 'Big  News', 'big news', 'big news'],
+        'Date': ['2025-01-01 08:00', '2025-01-01', '2025-01-01', '2025-01-02 09:00', '2025-01-02 23:00',
+                 '2025-01-03'],
+        'brand': ['Nike', 'Nike', 'Puma', 'Nike', 'Nike', 'Nike'],
+    })
+    keys, valid = app.mention_keys(df)
+    assert valid.all()
+    assert keys[0] == keys[1] != keys[2]  # same link; other brand
+    assert keys[3] == keys[4] != keys[5]  # same headline and day; other day
+
+    _, valid = app.mention_keys(pd.DataFrame({'URL': [None], 'Headline': [''], 'brand': ['Nike']}))
+    assert not valid.any()
+
+
+def test_load_data_drops_repeats_across_sources(tmp_path):
+    mentions = make_mentions('Nike', days=10)
+    write_source(mentions.iloc[:80], tmp_path / "first.csv", 'csv')
+    # Overlaps the first file by 30 rows and repeats 5 of its own rows
+    second = pd.concat([mentions.iloc[50:], mentions.iloc[100:105]], ignore_index=True)
+    second['URL'] = second['URL'].str.replace('https://', 'http://www.')
+    write_source(second, tmp_path / "second.csv", 'csv')
+    sources = [{'path': str(tmp_path / "first.csv"), 'type': 'csv', 'brand': 'Nike'},
+               {'path': str(tmp_path / "second.csv"), 'type': 'csv', 'brand': 'Nike'}]
+
+    df = app.load_data(sources)
+    assert len(df) == len(mentions)
+    assert df['URL'].str.rsplit('/', n=1).str[-1].is_unique
+    report = df.attrs['ingest_report']
+    assert [(r['rows'], r['duplicates']) for r in report] == [(80, 0), (len(mentions) - 80, 35)]
+
+
+def test_drop_duplicate_mentions_keeps_seen_sorted():
+    first = make_mentions('Nike', days=2, tag='a').assign(brand='Nike')
+    second = make_mentions('Nike', days=2, tag='b').assign(brand='Nike')
+    kept, seen, dropped = app.drop_duplicate_mentions(first, np.array([], dtype=np.uint64))
+    assert dropped == 0 and len(seen) == len(first)
+    kept, seen, dropped = app.drop_duplicate_mentions(pd.concat([second, first.iloc[:7]]), seen)
+    assert (dropped, len(kept), len(seen)) == (7, len(second), len(first) + len(second))
+    assert (np.diff(seen.astype(np.float64)) >= 0).all() and seen.dtype == np.uint64
+
+    # Repeats within a chunk keep their first copy; a chunk of known keys leaves seen as it was
+    repeated = pd.concat([first.iloc[:3], first.iloc[:3]]).iloc[[0, 3, 1, 4, 2, 5]]
+    kept, fresh, dropped = app.drop_duplicate_mentions(repeated, np.array([], dtype=np.uint64))
+    assert dropped == 3 and kept['URL'].tolist() == first['URL'].iloc[:3].tolist()
+    kept, unchanged, dropped = app.drop_duplicate_mentions(repeated, seen)
+    assert (dropped, len(kept)) == (6, 0)
+    np.testing.assert_array_equal(unchanged, seen)
+
+
+def test_normalize_source_frame_emits_canonical_layout():
+    raw = pd.DataFrame({
+        ' Date ': ['2025-01-01 10:00', 'not a date', '2025-01-03 05:00'],
+        'Sentiment': ['Positive', 'NEGATIVE', None],
+        'Input Name': ['Nike + Product', 'Adidas', 'Puma + A + B'],
+        'Reach': ['10', 'n/a', 3],
+        'Hidden': ['yes', 'False', None],
+        'Total Social Echo': ['4', None, '6'],
+        'Custom Score': [1, 2, 3],
+    })
+    df = app.normalize_source_frame(raw, None)
+
+    assert list(df.columns) == list(app.CANONICAL_SCHEMA) + ['Total Social Echo', 'Custom Score']
+    assert df['brand'].tolist() == ['Nike', 'Adidas', 'Puma']
+    assert df['Date'].dtype == app.DATE_DTYPE and df['Date'].isna().tolist() == [False, True, False]
+    assert df['Reach'].tolist() == [10.0, 0.0, 3.0]
+    assert df['Hidden'].dtype == 'boolean' and df['Hidden'].tolist() == [True, False, pd.NA]
+    assert df['Total Social Echo'].dtype == np.float64
+    assert df['Sentiment'].dtype == app.text_dtype() and df['Source'].tolist() == ['Unknown'] * 3
+    assert df['Desktop Reach'].isna().all() and df['Engagement'].tolist() == [0.0] * 3
+
+    assert app.prepare_data(df)['sentiment_score'].tolist() == [1.0, -1.0, 0.0]
+    assert app.normalize_source_frame(raw, 'Reebok')['brand'].tolist() == ['Reebok'] * 3
+
+
+def test_csv_ids_keep_their_digits(tmp_path):
+    frame = make_mentions('Nike', days=1, per_day=3).assign(**{'Tweet Id': ['007', '0100', '12']})
+    write_source(frame, tmp_path / "nike.csv", 'csv')
+    df = app.load_data([{'path': str(tmp_path / "nike.csv"), 'type': 'csv', 'brand': 'Nike'}])
+    assert sorted(df['Tweet Id']) == ['007', '0100', '12']
+    assert df['Headline'].dtype == app.text_dtype()
+
+
+def test_partitions_read_back_as_arrow_strings(dataset):
+    manifest, partition_dir, _ = dataset
+    loaded = app.load_partitions(manifest, 'Nike', None, None, partition_dir)
+    assert loaded['Source'].dtype == app.ARROW_STRING_DTYPE
+    assert app.fetch_rows(manifest, [0, 1], ['Headline'], partition_dir)['Headline'].dtype == app.ARROW_STRING_DTYPE
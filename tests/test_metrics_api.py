@@ -0,0 +1,162 @@
+"""The read-only JSON metrics API: routing, windows, brand endpoints, ETags, gzip and errors."""
+
+import gzip
+import http.client
+import json
+import threading
+from datetime import date, timedelta
+from http import HTTPStatus
+
+import pytest
+
+import metrics_api
+from conftest import app
+
+
+@pytest.fixture
+def state(dataset):
+    _, partition_dir, _ = dataset
+    state = metrics_api.DatasetState(partition_dir)
+    state.current()
+    return state
+
+
+@pytest.fixture
+def server(state):
+    """A running API server on a free port; yields a request function."""
+    handler = type('Handler', (metrics_api.MetricsRequestHandler,), {'state': state})
+    httpd = metrics_api.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    def request(path: str, headers: dict = None):
+        conn = http.client.HTTPConnection('127.0.0.1', httpd.server_address[1], timeout=30)
+        try:
+            conn.request('GET', path, headers=headers or {})
+            response = conn.getresponse()
+            return response.status, dict(response.getheaders()), response.read()
+        finally:
+            conn.close()
+
+    yield request
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_resolve_window():
+    default_start, default_end = app.default_date_range()
+    assert metrics_api.resolve_window({}) == (default_start, default_end)
+    assert metrics_api.resolve_window({'window': ['all'], 'start': ['bad']}) == (None, None)
+    assert metrics_api.resolve_window({'start': ['2025-01-02'], 'end': ['2025-01-31']}) == (
+        date(2025, 1, 2), date(2025, 1, 31))
+    assert metrics_api.resolve_window({'start': [(default_end - timedelta(days=3)).isoformat()]}) == (
+        default_end - timedelta(days=3), default_end)
+    for params in [{'start': ['01/02/2025']}, {'start': ['2025-02-01'], 'end': ['2025-01-01']}]:
+        with pytest.raises(metrics_api.ApiError) as excinfo:
+            metrics_api.resolve_window(params)
+        assert excinfo.value.status == HTTPStatus.BAD_REQUEST
+
+
+def test_build_response_routes(state):
+    response = metrics_api.build_response(state, '/v1/brands', {})
+    assert json.loads(response['body']) == {'version': state.manifest['version'],
+                                            'brands': ['Adidas', 'Nike', 'Puma']}
+    assert metrics_api.build_response(state, '/v1/brands/', {}) is response
+
+    for path, params, status in [
+        ('/v1/brands/Reebok/metrics', {}, HTTPStatus.NOT_FOUND),
+        ('/v1/brands/Nike/unknown', {}, HTTPStatus.NOT_FOUND),
+        ('/v2/brands', {}, HTTPStatus.NOT_FOUND),
+        ('/v1/brands/Nike/keywords', {'n': ['ten']}, HTTPStatus.BAD_REQUEST),
+        ('/v1/brands/Nike/series', {'start': ['2025-13-01']}, HTTPStatus.BAD_REQUEST),
+    ]:
+        with pytest.raises(metrics_api.ApiError) as excinfo:
+            metrics_api.build_response(state, path, params)
+        assert excinfo.value.status == status
+
+
+def test_brand_endpoints_match_window_rows(state, dataset):
+    manifest, partition_dir, rows = dataset
+    params = {'start': ['2025-01-05'], 'end': ['2025-01-20']}
+    # Date bounds select rows the way the dashboard's date inputs do
+    in_window = rows[(rows['brand'] == 'Nike') & rows['Date'].between('2025-01-05', '2025-01-20')]
+
+    def _get(endpoint, **extra):
+        return json.loads(metrics_api.build_response(state, f'/v1/brands/Nike/{endpoint}', {**params, **extra})['body'])
+
+    metrics = _get('metrics')
+    assert (metrics['brand'], metrics['start'], metrics['end']) == ('Nike', '2025-01-05', '2025-01-20')
+    assert metrics['metrics']['total_mentions'] == len(in_window)
+    assert metrics['metrics']['total_reach'] == pytest.approx(in_window['Reach'].sum())
+
+    series = _get('series')['series']
+    daily = in_window.groupby(in_window['Date'].dt.normalize())
+    assert [point['date'] for point in series] == [day.date().isoformat() for day in daily.groups]
+    assert [point['mentions'] for point in series] == daily.size().tolist()
+    assert [point['reach'] for point in series] == pytest.approx(daily['Reach'].sum().tolist())
+
+    keywords = _get('keywords', n=['3'])['keywords']
+    assert len(keywords) == 3
+    window = app.load_partitions(manifest, 'Nike', '2025-01-05', '2025-01-20', partition_dir)
+    expected = app.exact_top_counts(window, 'keywords', 3)
+    assert [(k['term'], k['count']) for k in keywords] == list(zip(expected.index, expected.tolist()))
+
+
+def test_accepts_gzip():
+    for header, expected in [('gzip', True), ('br, GZIP;q=0.5', True), ('gzip;q=0', False),
+                             ('gzip; q=0.000, *', False), ('*', True), ('*;q=0', False),
+                             ('identity', False), ('', False), ('gzip;q=bad', False)]:
+        assert metrics_api.accepts_gzip(header) is expected, header
+
+
+def test_build_response_without_data(tmp_path):
+    with pytest.raises(metrics_api.ApiError) as excinfo:
+        metrics_api.build_response(metrics_api.DatasetState(str(tmp_path)), '/v1/brands', {})
+    assert excinfo.value.status == HTTPStatus.SERVICE_UNAVAILABLE
+
+
+def test_handler_etag_and_errors(server, state):
+    status, headers, body = server('/health')
+    assert status == 200 and json.loads(body) == {'status': 'ok', 'version': state.manifest['version']}
+
+    status, headers, body = server('/v1/brands')
+    assert status == 200 and headers['Content-Type'] == 'application/json'
+    etag = headers['ETag']
+    assert etag.startswith(f'"{state.manifest["version"]}-')
+
+    status, headers, body = server('/v1/brands', {'If-None-Match': f'"other", {etag}'})
+    assert (status, headers['ETag'], body) == (304, etag, b'')
+    assert server('/v1/brands', {'If-None-Match': '"other"'})[0] == 200
+
+    status, headers, body = server('/v1/brands/Reebok/metrics')
+    assert status == 404 and json.loads(body) == {'error': 'unknown brand: Reebok'}
+    assert headers['Cache-Control'] == 'no-store'
+
+
+def test_handler_gzip(server, monkeypatch):
+    monkeypatch.setattr(metrics_api, 'GZIP_MIN_BYTES', 0)
+    app.get_artifact_cache().invalidate(kind='response')
+
+    status, headers, body = server('/v1/brands', {'Accept-Encoding': 'br, gzip'})
+    assert status == 200 and headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(body))['brands'] == ['Adidas', 'Nike', 'Puma']
+
+    status, headers, body = server('/v1/brands')
+    assert 'Content-Encoding' not in headers and json.loads(body)['brands'] == ['Adidas', 'Nike', 'Puma']
+
+    for refused in ['gzip;q=0', 'identity, *;q=0']:
+        status, headers, body = server('/v1/brands', {'Accept-Encoding': refused})
+        assert 'Content-Encoding' not in headers and json.loads(body)['brands'] == ['Adidas', 'Nike', 'Puma']
+
+
+def test_handler_reports_failures_as_json(server, monkeypatch, capsys):
+    def _fail(*args):
+        raise RuntimeError("window failed")
+
+    monkeypatch.setattr(metrics_api, 'build_response', _fail)
+    status, headers, body = server('/v1/brands/Nike/metrics')
+    assert status == 500 and json.loads(body) == {'error': 'internal server error'}
+    assert headers['Cache-Control'] == 'no-store'
+    assert "window failed" in capsys.readouterr().err
+    # The connection's handler thread survives for the next request
+    assert server('/health')[0] == 200
@@ -0,0 +1,50 @@
+"""Progressive page rendering: section order of the RenderScheduler."""
+
+import threading
+import time
+
+from conftest import app
+
+
+def test_sections_fill_by_priority_then_completion():
+    scheduler = app.RenderScheduler(workers=3)
+    release_kpis, release_chart = threading.Event(), threading.Event()
+    rendered = []
+
+    def _slow(event, value):
+        assert event.wait(10)
+        return value
+
+    kpis = scheduler.submit(_slow, release_kpis, 'kpis')
+    chart = scheduler.submit(_slow, release_chart, 'chart')
+    table = scheduler.submit(lambda: 'table')
+    scheduler.section("Chart", rendered.append, chart)
+    scheduler.section("Table", rendered.append, table)
+    scheduler.section("KPIs", rendered.append, kpis, priority=1)
+
+    before_kpis = []
+
+    def _release():
+        # The table input is long done, but nothing renders before the KPI row
+        time.sleep(0.2)
+        before_kpis.extend(rendered)
+        release_kpis.set()
+        time.sleep(0.2)
+        release_chart.set()
+
+    releaser = threading.Thread(target=_release)
+    releaser.start()
+    scheduler.run()
+    releaser.join()
+    assert before_kpis == []
+    assert rendered == ['kpis', 'table', 'chart']
+
+
+def test_later_inputs_may_wait_on_earlier_ones():
+    scheduler = app.RenderScheduler(workers=2)
+    rows = scheduler.submit(lambda: [1, 2, 3])
+    total = scheduler.submit(lambda: sum(rows.result()))
+    rendered = []
+    scheduler.section("Total", lambda rows, total: rendered.append((rows, total)), rows, total)
+    scheduler.run()
+    assert rendered == [([1, 2, 3], 6)]
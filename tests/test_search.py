@@ -0,0 +1,99 @@
+"""Mention search over the per-brand inverted indexes."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import app
+
+
+def brute_force_search(rows, query, brand=None, start_date=None, end_date=None,
+                       sentiments=None):
+    """Row ids matching a query by scanning every row, newest first."""
+    parsed = app.parse_query(query)
+    texts = rows[['Headline', 'Opening Text']].fillna('').astype(str).agg(' '.join, axis=1)
+    keep = []
+    for text in texts:
+        tokens = app.tokenize(text)
+        joined = f" {' '.join(tokens)} "
+        keep.append(set(parsed['terms']) <= set(tokens)
+                    and all(f" {' '.join(phrase)} " in joined for phrase in parsed['phrases']))
+    mask = pd.Series(keep, index=rows.index)
+    if brand is not None:
+        mask &= rows['brand'] == brand
+    if start_date is not None:
+        mask &= rows['Date'] >= pd.Timestamp(start_date)
+    if end_date is not None:
+        mask &= rows['Date'] <= pd.Timestamp(end_date)
+    if sentiments:
+        mask &= rows['Sentiment'].str.lower().isin(sentiments)
+    matched = rows[mask].sort_values(['Date', 'row_id'], ascending=False)
+    return matched['row_id'].to_numpy()
+
+
+@pytest.fixture
+def indexed_rows(dataset):
+    manifest, partition_dir, rows = dataset
+    return manifest, partition_dir, app.fetch_rows(manifest, np.arange(len(rows)), None, partition_dir)
+
+
+@pytest.mark.parametrize('query, filters', [
+    ('quality', {}),
+    ('Supply CHAIN', {'brand': 'Nike'}),
+    ('launch pricing', {'start_date': '2025-01-10', 'end_date': '2025-01-20'}),
+    ('earnings', {'brand': 'Puma', 'sentiments': ['positive', 'negative']}),
+    ('"its quality"', {}),
+    ('"quality its"', {}),
+    ('adidas', {'brand': 'Nike'}),
+    ('nosuchterm', {}),
+])
+def test_search_matches_brute_force(indexed_rows, query, filters):
+    manifest, partition_dir, rows = indexed_rows
+    found = app.search_mentions(manifest, query, partition_dir=partition_dir, **filters)
+    np.testing.assert_array_equal(found, brute_force_search(rows, query, **filters))
+
+
+def test_parse_query_splits_terms_and_phrases():
+    parsed = app.parse_query('Earnings "market impact" "solo"')
+    assert parsed == {'terms': ['earnings', 'impact', 'market', 'solo'], 'phrases': [['market', 'impact']]}
+    assert app.parse_query('  "" ')['terms'] == []
+
+
+def test_fetch_rows_returns_requested_order(indexed_rows):
+    manifest, partition_dir, rows = indexed_rows
+    row_ids = np.array([len(rows) - 1, 0, 300, 5], dtype=np.int64)
+    fetched = app.fetch_rows(manifest, row_ids, ['Headline', 'URL'], partition_dir)
+    assert sorted(fetched.columns) == ['Headline', 'URL', 'row_id']
+    expected = rows.set_index('row_id').loc[row_ids, ['Headline', 'URL']].reset_index(drop=True)
+    pd.testing.assert_frame_equal(fetched[['Headline', 'URL']], expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('sort_key', app.EXPLORER_SORT_KEYS)
+@pytest.mark.parametrize('descending', [True, False])
+@pytest.mark.parametrize('brand, window', [(None, (None, None)), ('Adidas', ('2025-01-05', '2025-01-25')),
+                                           (None, ('2025-02-01', None))])
+def test_explore_orders_every_row_in_window(indexed_rows, sort_key, descending, brand, window):
+    manifest, partition_dir, rows = indexed_rows
+    start, end = window
+    expected = rows if brand is None else rows[rows['brand'] == brand]
+    if start is not None:
+        expected = expected[expected['Date'] >= pd.Timestamp(start)]
+    if end is not None:
+        expected = expected[expected['Date'] <= pd.Timestamp(end)]
+
+    row_ids = app.explore_mentions(manifest, brand, start, end, sort_key, descending, partition_dir)
+    assert sorted(row_ids) == sorted(expected['row_id'])
+    values = rows.set_index('row_id').loc[row_ids, sort_key].to_numpy()
+    assert (values == np.sort(values)[::-1] if descending else values == np.sort(values)).all()
+
+
+def test_explorer_pages_cover_window_once(indexed_rows):
+    manifest, partition_dir, rows = indexed_rows
+    row_ids = app.explore_mentions(manifest, 'Nike', sort_key='Reach', partition_dir=partition_dir)
+    page_size = app.EXPLORER_PAGE_SIZES[0]
+    pages = [app.fetch_rows(manifest, row_ids[start:start + page_size], ['Reach'], partition_dir)
+             for start in range(0, len(row_ids), page_size)]
+    assert all(len(page) <= page_size for page in pages)
+    combined = pd.concat(pages, ignore_index=True)
+    assert combined['row_id'].tolist() == row_ids.tolist()
+    assert combined['Reach'].is_monotonic_decreasing
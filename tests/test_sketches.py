@@ -0,0 +1,75 @@
+"""Space-Saving and HyperLogLog sketches for approximate top-K and distinct counts."""
+
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import app
+
+
+def zipf_stream(n: int, seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    return [f"term{value}" for value in rng.zipf(1.3, n) % 5000]
+
+
+def assert_space_saving_bounds(summary: 'app.SpaceSaving', stream: list):
+    truth = Counter(stream)
+    bound = len(stream) / summary.capacity
+    assert summary.total == len(stream)
+    for item, count, error in summary.top(summary.capacity):
+        assert truth[item] <= count <= truth[item] + error
+        assert error <= bound
+    # Anything heavier than the bound is always monitored
+    assert {item for item, count in truth.items() if count > bound} <= set(summary.counts)
+
+
+def test_space_saving_bounds():
+    stream = zipf_stream(20_000, seed=1)
+    summary = app.SpaceSaving(capacity=50)
+    for item in stream:
+        summary.update(item)
+    assert_space_saving_bounds(summary, stream)
+    assert [item for item, _, _ in summary.top(3)] == [item for item, _ in Counter(stream).most_common(3)]
+
+
+def test_space_saving_merge_keeps_bounds():
+    streams = [zipf_stream(6_000, seed) for seed in range(4)]
+    merged = app.SpaceSaving(capacity=50)
+    for stream in streams:
+        summary = app.SpaceSaving(capacity=50)
+        for item in stream:
+            summary.update(item)
+        merged = merged.merge(app.SpaceSaving.from_dict(summary.to_dict()))
+    assert_space_saving_bounds(merged, sum(streams, []))
+
+
+@pytest.mark.parametrize('distinct', [10, 900, 50_000])
+def test_hll_estimate_within_error_bound(distinct):
+    values = pd.Series([f"user{i}" for i in range(distinct)] * 2)
+    estimate = app.hll_estimate(app.hll_registers(values))
+    assert abs(estimate - distinct) <= 4 * 1.04 / np.sqrt(1 << app.HLL_PRECISION) * distinct + 1
+
+
+def test_hll_registers_merge_as_union():
+    left = pd.Series([f"user{i}" for i in range(0, 3000)])
+    right = pd.Series([f"user{i}" for i in range(2000, 6000)])
+    merged = np.maximum(app.hll_registers(left), app.hll_registers(right))
+    np.testing.assert_array_equal(merged, app.hll_registers(pd.concat([left, right])))
+
+
+@pytest.mark.parametrize('brand, window', [(None, (None, None)),
+                                           ('Nike', ('2025-01-10', '2025-01-31 23:59:59'))])
+def test_sketch_summary_matches_exact_counts(dataset, brand, window):
+    manifest, partition_dir, rows = dataset
+    start, end = window
+    summary = app.sketch_summary(manifest, brand, start, end, partition_dir)
+    expected = app.load_partitions(manifest, brand, start, end, partition_dir)
+
+    # Sketches cover whole days; fewer distinct terms than SKETCH_CAPACITY keeps counts exact
+    for dimension in ['sources', 'keywords', 'hashtags']:
+        approx = app.sketch_top_counts(summary, dimension, 10)
+        exact = app.exact_top_counts(expected, dimension, 10)
+        assert approx.sort_index().to_dict() == exact.sort_index().to_dict()
+    assert round(summary['distinct']['sources']) == expected['Source'].nunique()
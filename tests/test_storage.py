@@ -0,0 +1,257 @@
+"""Partitioned storage: brand/month partitions, segmented builds, date pruning and incremental appends."""
+
+import functools
+import gzip
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import app, sorted_rows, write_source, make_mentions
+
+
+def assert_same_dataset(manifest_a, dir_a, manifest_b, dir_b):
+    """Two builds hold the same rows and give the same index-backed answers."""
+    assert manifest_a['columns'] == manifest_b['columns']
+    pd.testing.assert_frame_equal(sorted_rows(app.load_partitions(manifest_a, None, None, None, dir_a)),
+                                  sorted_rows(app.load_partitions(manifest_b, None, None, None, dir_b)))
+
+    brands = sorted(entry['brand'] for entry in manifest_a['indexes'])
+    assert brands == sorted(entry['brand'] for entry in manifest_b['indexes'])
+    for brand in brands:
+        for window in [(None, None), ('2025-01-10', '2025-01-31')]:
+            found = [sorted(app.fetch_rows(m, app.search_mentions(m, 'quality', brand, *window, partition_dir=d),
+                                           ['URL'], d)['URL'])
+                     for m, d in [(manifest_a, dir_a), (manifest_b, dir_b)]]
+            assert found[0] == found[1]
+
+            reach = [app.fetch_rows(m, app.explore_mentions(m, brand, *window, sort_key='Reach', partition_dir=d),
+                                    ['Reach'], d)['Reach'].tolist()
+                     for m, d in [(manifest_a, dir_a), (manifest_b, dir_b)]]
+            assert reach[0] == reach[1]
+
+            aggregates = [app.aggregate_window(m, ['day', 'Source'], ['Reach', 'Engagement'], brand, *window, d)
+                          for m, d in [(manifest_a, dir_a), (manifest_b, dir_b)]]
+            pd.testing.assert_frame_equal(sorted_rows(aggregates[0]), sorted_rows(aggregates[1]))
+
+            sketches = [app.sketch_summary(m, brand, *window, d) for m, d in [(manifest_a, dir_a), (manifest_b, dir_b)]]
+            for dimension in ['sources', 'keywords']:
+                pd.testing.assert_series_equal(app.sketch_top_counts(sketches[0], dimension, 10),
+                                               app.sketch_top_counts(sketches[1], dimension, 10))
+
+            geo = [app.geo_hierarchy(m, brand, *window, d) for m, d in [(manifest_a, dir_a), (manifest_b, dir_b)]]
+            assert sorted(geo[0]) == sorted(geo[1])
+            for path, children in geo[0].items():
+                pd.testing.assert_frame_equal(children, geo[1][path])
+
+
+@pytest.mark.parametrize('brand', [None, 'Nike', 'Puma'])
+@pytest.mark.parametrize('window', [(None, None), ('2025-01-10', '2025-01-31'), ('2025-02-03', None),
+                                    (None, '2025-01-01 12:00:00'), ('2026-01-01', '2026-02-01')])
+def test_window_load_matches_filtered_rows(dataset, brand, window):
+    manifest, partition_dir, rows = dataset
+    start, end = window
+    expected = rows if brand is None else rows[rows['brand'] == brand]
+    if start is not None:
+        expected = expected[expected['Date'] >= pd.Timestamp(start)]
+    if end is not None:
+        expected = expected[expected['Date'] <= pd.Timestamp(end)]
+
+    loaded = app.load_partitions(manifest, brand, start, end, partition_dir)
+    columns = app.resident_columns(manifest)
+    assert 'Headline' not in columns and 'Headline' not in loaded.columns
+    assert len(loaded) == len(expected)
+    pd.testing.assert_frame_equal(sorted_rows(loaded, columns), sorted_rows(expected, columns))
+
+
+def test_select_partitions_prunes_by_brand_and_month(dataset):
+    manifest, _, _ = dataset
+    assert {p['month'] for p in manifest['partitions']} == {'2025-01', '2025-02'}
+
+    selected = app.select_partitions(manifest, 'Nike', '2025-02-03', '2025-02-10')
+    assert [(p['brand'], p['month']) for p in selected] == [('Nike', '2025-02')]
+    assert len(app.select_partitions(manifest, None, '2025-01-20', '2025-02-10')) == 6
+    assert app.select_partitions(manifest, 'Nike', '2024-01-01', '2024-12-31') == []
+
+
+def test_partition_totals_match_rows(dataset):
+    manifest, _, rows = dataset
+    totals = app.partition_totals(manifest).groupby('brand')[['rows', 'Engagement', 'Reach']].sum()
+    expected = rows.groupby('brand').agg(rows=('Date', 'size'), Engagement=('Engagement', 'sum'),
+                                         Reach=('Reach', 'sum'))
+    pd.testing.assert_frame_equal(totals, expected, check_dtype=False, check_index_type=False)
+
+
+def test_build_partitions_reuses_unchanged_sources(brand_exports, tmp_path):
+    partition_dir = str(tmp_path / "partitions")
+    first = app.build_partitions(brand_exports, partition_dir)
+    assert app.build_partitions(brand_exports, partition_dir) == first
+
+    # A changed source file gives a new version; the replaced one stays for
+    # readers of the previous manifest until the next publish
+    write_source(make_mentions('Nike', days=10, seed=7), tmp_path / "Nike.csv", 'csv')
+    second = app.build_partitions(brand_exports, partition_dir)
+    assert second['version'] != first['version']
+    assert app.read_manifest(partition_dir) == second
+    assert {first['version'], second['version']} <= set(os.listdir(partition_dir))
+
+    write_source(make_mentions('Nike', days=10, seed=8), tmp_path / "Nike.csv", 'csv')
+    third = app.build_partitions(brand_exports, partition_dir)
+    assert {second['version'], third['version']} <= set(os.listdir(partition_dir))
+    assert first['version'] not in os.listdir(partition_dir)
+
+
+def test_numeric_columns_live_in_column_store(dataset):
+    manifest, partition_dir, rows = dataset
+    assert {'Reach', 'Engagement'} <= set(manifest['column_store'])
+    partition = manifest['partitions'][0]
+    assert 'Reach' not in pd.read_parquet(os.path.join(partition_dir, partition['path'])).columns
+
+    store = app.open_column_store(partition_dir, manifest['version'])
+    loaded = app.load_partitions(manifest, None, None, None, partition_dir).sort_values('row_id')
+    np.testing.assert_array_equal(store['Reach'][loaded['row_id'].to_numpy()], loaded['Reach'].to_numpy())
+
+    # A single-brand window is one row range, so its columns are views of the mapped arrays
+    window = app.load_partitions(manifest, 'Adidas', '2025-01-05', '2025-02-05', partition_dir)
+    assert np.shares_memory(window['Engagement'].to_numpy(), store['Engagement'])
+
+
+@pytest.mark.parametrize('suffix', ['.csv', '.csv.gz', '.jsonl', '.jsonl.gz', '.csv.zst'])
+def test_chunked_read_matches_whole_file(tmp_path, suffix):
+    frame = make_mentions('Nike', days=20)
+    source_type = 'jsonl' if '.jsonl' in suffix else 'csv'
+    plain = tmp_path / f"nike.{source_type}"
+    write_source(frame, plain, source_type)
+    path = tmp_path / f"nike{suffix}"
+    if suffix.endswith('.gz'):
+        with open(plain, 'rb') as src, gzip.open(path, 'wb') as dst:
+            dst.write(src.read())
+    elif suffix.endswith('.zst'):
+        zstandard = pytest.importorskip('zstandard')
+        path.write_bytes(zstandard.ZstdCompressor().compress(plain.read_bytes()))
+    source = {'path': str(path), 'type': source_type, 'brand': 'Nike'}
+
+    chunks = [app.normalize_source_frame(chunk, 'Nike') for chunk in app.read_source_chunks(source, chunk_rows=37)]
+    assert len(chunks) == -(-len(frame) // 37)
+    if source_type == 'csv':
+        whole = pd.read_csv(plain)
+    else:
+        whole = pd.read_json(plain, lines=True, dtype=False, convert_dates=False)
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), app.normalize_source_frame(whole, 'Nike'))
+
+
+def test_segmented_build_matches_single_frame(tmp_path, monkeypatch):
+    nike = make_mentions('Nike', seed=1)
+    write_source(pd.concat([nike, nike.iloc[:25]]), tmp_path / "nike.csv", 'csv')  # duplicates
+    # Dated before everything already written, and with a column the others lack
+    adidas = make_mentions('Adidas', start='2023-06-01', seed=2).assign(Title=lambda df: 'T ' + df['Headline'])
+    write_source(adidas, tmp_path / "adidas.jsonl", 'jsonl')
+    # Fails after some of its chunks were read
+    write_source(make_mentions('Puma', seed=3), tmp_path / "puma.jsonl", 'jsonl')
+    with open(tmp_path / "puma.jsonl", 'a') as f:
+        f.write('{"broken": \n')
+    sources = [
+        {'path': str(tmp_path / "nike.csv"), 'type': 'csv', 'brand': 'Nike'},
+        {'path': str(tmp_path / "puma.jsonl"), 'type': 'jsonl', 'brand': 'Puma'},
+        {'path': str(tmp_path / "adidas.jsonl"), 'type': 'jsonl', 'brand': 'Adidas'},
+        {'path': str(tmp_path / "missing.csv"), 'type': 'csv', 'brand': 'Reebok'},
+    ]
+    monkeypatch.setattr(app, 'read_source_chunks', functools.partial(app.read_source_chunks, chunk_rows=40))
+
+    df = app.load_data(sources)
+    mention_keys = df.attrs.pop('mention_keys')
+    whole = app.write_partitions(app.prepare_data(df), 'whole', str(tmp_path / "whole"),
+                                 df.attrs['ingest_report'], mention_keys)
+    monkeypatch.setattr(app, 'BUILD_SEGMENT_ROWS', 100)
+    streamed = app.stream_partitions(sources, 'streamed', str(tmp_path / "streamed"))
+
+    assert len(whole['segments']) == 1
+    assert len(streamed['segments']) == streamed['build_segments'] > 1
+    assert streamed['ingest_report'] == whole['ingest_report']
+    assert [bool(entry.get('error')) for entry in streamed['ingest_report']] == [False, True, False, True]
+    assert streamed['key_codes']['day'] == whole['key_codes']['day']
+    np.testing.assert_array_equal(np.load(tmp_path / "streamed" / streamed['mention_keys']), mention_keys)
+    assert_same_dataset(whole, str(tmp_path / "whole"), streamed, str(tmp_path / "streamed"))
+
+    row_ids = np.arange(sum(segment['rows'] for segment in streamed['segments']))
+    texts = [sorted_rows(app.fetch_rows(m, row_ids, ['URL', 'Title'], str(tmp_path / name)))
+             for m, name in [(whole, "whole"), (streamed, "streamed")]]
+    pd.testing.assert_frame_equal(texts[0], texts[1])
+
+
+@pytest.mark.parametrize('source_type', ['csv', 'jsonl'])
+def test_append_matches_full_rebuild(tmp_path, source_type):
+    exports = {brand: make_mentions(brand, seed=seed) for seed, brand in enumerate(['Nike', 'Adidas'])}
+    (tmp_path / "inc").mkdir()
+    (tmp_path / "full").mkdir()
+
+    def _sources(folder):
+        return [{'path': str(tmp_path / folder / f"{brand}.{source_type}"), 'type': source_type, 'brand': brand}
+                for brand in exports]
+
+    for brand, frame in exports.items():
+        write_source(frame.iloc[:300], tmp_path / "inc" / f"{brand}.{source_type}", source_type)
+    first = app.build_partitions(_sources("inc"), str(tmp_path / "inc" / "p"))
+    # New rows for one brand only; the other file is untouched
+    write_source(exports['Nike'].iloc[300:], tmp_path / "inc" / f"Nike.{source_type}", source_type, append=True)
+    appended = app.build_partitions(_sources("inc"), str(tmp_path / "inc" / "p"))
+
+    assert appended['delta'] == {'base_version': first['version'], 'row_start': 600, 'brands': ['Nike']}
+    assert len(appended['segments']) == 2
+    assert appended['ingest_report'][0]['rows'] == len(exports['Nike'])
+
+    for brand, frame in exports.items():
+        write_source(frame if brand == 'Nike' else frame.iloc[:300],
+                     tmp_path / "full" / f"{brand}.{source_type}", source_type)
+    full = app.build_partitions(_sources("full"), str(tmp_path / "full" / "p"))
+    assert 'delta' not in full
+    assert_same_dataset(appended, str(tmp_path / "inc" / "p"), full, str(tmp_path / "full" / "p"))
+
+
+def test_append_deduplicates_against_earlier_rows(tmp_path):
+    frame = make_mentions('Nike')
+    path = tmp_path / "nike.csv"
+    write_source(frame.iloc[:300], path, 'csv')
+    sources = [{'path': str(path), 'type': 'csv', 'brand': 'Nike'}]
+    app.build_partitions(sources, str(tmp_path / "p"))
+    # A re-export that repeats 50 already ingested mentions
+    write_source(frame.iloc[250:], path, 'csv', append=True)
+    manifest = app.build_partitions(sources, str(tmp_path / "p"))
+
+    assert 'delta' in manifest
+    assert manifest['ingest_report'][0] == {'path': str(path), 'rows': len(frame), 'duplicates': 50}
+    assert sum(segment['rows'] for segment in manifest['segments']) == len(frame)
+
+
+def test_merge_geo_rollup_matches_rebuild():
+    df = app.prepare_data(app.normalize_source_frame(make_mentions('Nike', days=90), 'Nike'))
+    shuffled = df.sample(frac=1, random_state=0)
+    merged = app.build_geo_rollup(shuffled.iloc[0::3])
+    for part in [shuffled.iloc[1::3], shuffled.iloc[2::3]]:
+        merged = app.merge_geo_rollup(merged, app.build_geo_rollup(part))
+    full = app.build_geo_rollup(df)
+    assert np.all(np.diff(merged['dates']) >= 0)
+
+    def _cells(rollup):
+        # (day key, place path) -> measure sums
+        node = rollup['leaf'].astype(np.int64)
+        names = []
+        for level in reversed(app.GEO_LEVELS):
+            names.append(rollup[f'nodes_{level}'][node])
+            node = rollup[f'parent_{level}'][node]
+        cells = pd.DataFrame({'dates': rollup['dates'], 'path': ['/'.join(p) for p in zip(*reversed(names))],
+                              **{measure: rollup[measure] for measure in app.GEO_MEASURES}})
+        return cells.groupby(['dates', 'path']).sum()
+
+    pd.testing.assert_frame_equal(_cells(merged), _cells(full))
+
+
+def test_missing_source_does_not_force_a_rebuild(brand_exports, tmp_path):
+    sources = brand_exports + [{'path': str(tmp_path / "Reebok.csv"), 'type': 'csv', 'brand': 'Reebok'}]
+    partition_dir = str(tmp_path / "partitions")
+    first = app.build_partitions(sources, partition_dir)
+    write_source(make_mentions('Nike', days=5, start='2025-03-01', seed=9, tag='new'), tmp_path / "Nike.csv", 'csv', append=True)
+    appended = app.build_partitions(sources, partition_dir)
+    assert appended['delta']['base_version'] == first['version']
+    assert appended['delta']['brands'] == ['Nike']
@@ -0,0 +1,56 @@
+"""Background cache warm-up progress and its readiness file."""
+
+import json
+import threading
+
+from conftest import app
+
+
+def read_status(partition_dir: str) -> dict:
+    with open(app.Path(partition_dir) / app.WARMUP_STATUS_FILE, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_write_warmup_status_reports_progress(tmp_path):
+    progress = app.WarmupProgress('v1', ['Nike', 'Puma'])
+    progress.done, progress.current = 1, 'Puma'
+    app.write_warmup_status(progress, str(tmp_path))
+
+    status = read_status(str(tmp_path))
+    assert {key: status[key] for key in ['version', 'ready', 'brands', 'done', 'current', 'error']} == {
+        'version': 'v1', 'ready': False, 'brands': 2, 'done': 1, 'current': 'Puma', 'error': None,
+    }
+    assert [path.name for path in tmp_path.iterdir()] == [app.WARMUP_STATUS_FILE]
+
+
+def test_concurrent_status_writes_do_not_collide(tmp_path):
+    progress = app.WarmupProgress('v1', ['Nike'])
+    errors = []
+
+    def _write():
+        try:
+            for _ in range(50):
+                app.write_warmup_status(progress, str(tmp_path))
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=_write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert read_status(str(tmp_path))['version'] == 'v1'
+    assert [path.name for path in tmp_path.iterdir()] == [app.WARMUP_STATUS_FILE]
+
+
+def test_warmup_stops_when_superseded(dataset):
+    manifest, partition_dir, _ = dataset
+    progress = app.WarmupProgress('stale-version', ['Nike', 'Adidas'])
+    app.warm_caches(progress, partition_dir)
+
+    assert progress.ready.is_set() and progress.done == 0
+    assert progress.error == "superseded by a newer dataset version"
+    status = read_status(partition_dir)
+    assert status['ready'] and status['error'] == progress.error and status['current'] is None
+    assert manifest['version'] != status['version']